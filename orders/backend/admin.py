@@ -1,5 +1,13 @@
-from django.contrib import admin
+import io
+from django import forms
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
 from .models import *
+from .forms import ProvisionAccountsForm
+from .provisioning import ProvisioningError, provision_accounts
 from django.db.models import QuerySet
 
 
@@ -9,12 +17,44 @@ class ShopAdmin(admin.ModelAdmin):
     Класс для регистрации модели Shop в админке джанго, настройки отображаемых и изменяемых полей, сортировки,
     пагинации, фильтрации и поиска
     """
-    list_display = ['id', 'name', 'url', 'seller', 'is_work']
-    list_editable = ['name', 'url', 'is_work']
+    list_display = ['id', 'name', 'url', 'seller', 'is_work', 'digest_window']
+    list_editable = ['name', 'url', 'is_work', 'digest_window']
     ordering = ['id']
     list_per_page = 10
     search_fields = ['name']
     list_filter = ['is_work', 'url']
+    change_list_template = 'admin/backend/shop/change_list.html'
+
+    def get_urls(self):
+        """
+        Метод для добавления страницы загрузки аккаунтов из CSV-файла к страницам модели
+        """
+        return [path('provision/', self.admin_site.admin_view(self.provision_view), name='backend_shop_provision')] + \
+            super().get_urls()
+
+    def provision_view(self, request):
+        """
+        Метод страницы загрузки пользователей, магазинов продавцов и контактов из CSV-файла (см.
+        backend.provisioning). При ошибках в файле аккаунты не создаются, ошибки выводятся сообщениями по строкам
+        файла
+        """
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+        form = ProvisionAccountsForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            stream = io.TextIOWrapper(form.cleaned_data['file'].file, encoding='utf-8-sig', newline='')
+            try:
+                created = provision_accounts(stream)
+            except ProvisioningError as error:
+                for message in error.errors:
+                    self.message_user(request, message, messages.ERROR)
+            else:
+                self.message_user(request, f'Создано пользователей: {created["users"]}, магазинов: '
+                                           f'{created["shops"]}, контактов: {created["contacts"]}', messages.SUCCESS)
+                return redirect('admin:backend_shop_changelist')
+        context = dict(self.admin_site.each_context(request), opts=self.model._meta, form=form,
+                       title='Загрузка аккаунтов из CSV-файла')
+        return TemplateResponse(request, 'admin/backend/shop/provision.html', context)
 
 
 @admin.register(Category)
@@ -102,13 +142,27 @@ class ContactAdmin(admin.ModelAdmin):
     list_filter = ['country', 'city']
 
 
+class OrderAdminForm(forms.ModelForm):
+    """
+    Класс формы заказа в админке django. Версия заказа передается скрытым полем, чтобы при сохранении обнаружить
+    изменение заказа другим пользователем после открытия формы
+    """
+
+    class Meta:
+        model = Order
+        fields = '__all__'
+        widgets = {'version': forms.HiddenInput()}
+
+
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     """
     Класс для регистрации модели Order в админке джанго, настройки отображаемых и изменяемых полей, сортировки,
-    пагинации, фильтрации и поиска
+    пагинации, фильтрации и поиска. Действия изменения статуса применяются только к заказам с допустимым переходом,
+    статус меняется с проверкой версии заказа (см. OrderQuerySet.transition)
     """
-    list_display = ['id', 'user', 'dt', 'status']
+    form = OrderAdminForm
+    list_display = ['id', 'user', 'dt', 'status', 'total_sum', 'items_count', 'version']
     list_editable = ['status']
     ordering = ['id', 'user', 'status']
     list_per_page = 10
@@ -116,60 +170,81 @@ class OrderAdmin(admin.ModelAdmin):
     search_fields = ['status', 'user']
     list_filter = ['status']
 
+    def save_model(self, request, obj, form, change):
+        """
+        Метод для сохранения заказа в админке django. Статус заказа меняется только при допустимом переходе
+        STATUS_TRANSITIONS и только если заказ не был изменен другим пользователем после открытия формы, при отмене
+        заказа зарезервированные товары возвращаются на склад. Остальные измененные поля сохраняются без поля status
+        и version. В форме списка заказов (list_editable) поля version нет, поэтому статус меняется без проверки версии
+        """
+        if not change:
+            super().save_model(request, obj, form, change)
+            return
+        status, versions = obj.status, None
+        obj.status = form.initial['status']
+        if 'version' in form.fields:
+            versions = {obj.id: form.cleaned_data.get('version', form.initial['version'])}
+            obj.version = form.initial['version']
+        fields = [field for field in form.changed_data if field not in ('status', 'version')]
+        if fields:
+            obj.save(update_fields=fields)
+        if 'status' not in form.changed_data:
+            return
+        if Order.objects.filter(id=obj.id).transition(status, versions):
+            obj.refresh_from_db(fields=['status', 'version'])
+        elif versions is None or Order.objects.filter(id=obj.id, version=versions[obj.id]).exists():
+            self.message_user(request, f"Недопустимое изменение статуса заказа {obj.id}", level=messages.ERROR)
+        else:
+            self.message_user(request, f"Заказ {obj.id} был изменен другим пользователем, статус не обновлен",
+                              level=messages.ERROR)
+
+    def _set_status(self, request, qs, status):
+        """
+        Метод для изменения статуса выбранных заказов. Сообщает количество обновленных и пропущенных заказов
+        """
+        count_selected = qs.count()
+        count_updated = len(qs.transition(status))
+        message = f"Было обновлено {count_updated} записей"
+        if count_selected > count_updated:
+            message += f", пропущено {count_selected - count_updated} записей (недопустимое изменение статуса или " \
+                       f"заказ изменен другим пользователем)"
+        self.message_user(request, message)
+
     @admin.action(description="Установить статус заказа Подтвержден")
     def set_confirmed(self, request, qs: QuerySet):
         """
         Метод для установки значения поля status confirmed выбранных записей в админке django
         """
-        count_updated = qs.update(status="confirmed")
-        self.message_user(
-            request,
-            f"Было обновлено {count_updated} записей"
-        )
+        self._set_status(request, qs, "confirmed")
 
     @admin.action(description="Установить статус заказа Собран")
     def set_assembled(self, request, qs: QuerySet):
         """
         Метод для установки значения поля status assembled выбранных записей в админке django
         """
-        count_updated = qs.update(status="assembled")
-        self.message_user(
-            request,
-            f"Было обновлено {count_updated} записей"
-        )
+        self._set_status(request, qs, "assembled")
 
     @admin.action(description="Установить статус заказа Отправлен")
     def set_sent(self, request, qs: QuerySet):
         """
         Метод для установки значения поля status sent выбранных записей в админке django
         """
-        count_updated = qs.update(status="sent")
-        self.message_user(
-            request,
-            f"Было обновлено {count_updated} записей"
-        )
+        self._set_status(request, qs, "sent")
 
     @admin.action(description="Установить статус заказа Доставлен")
     def set_delivered(self, request, qs: QuerySet):
         """
         Метод для установки значения поля status delivered выбранных записей в админке django
         """
-        count_updated = qs.update(status="delivered")
-        self.message_user(
-            request,
-            f"Было обновлено {count_updated} записей"
-        )
+        self._set_status(request, qs, "delivered")
 
     @admin.action(description="Установить статус заказа Отменен")
     def set_canceled(self, request, qs: QuerySet):
         """
-        Метод для установки значения поля status canceled выбранных записей в админке django
+        Метод для установки значения поля status canceled выбранных записей в админке django. Зарезервированные
+        товары возвращаются на склад
         """
-        count_updated = qs.update(status="canceled")
-        self.message_user(
-            request,
-            f"Было обновлено {count_updated} записей"
-        )
+        self._set_status(request, qs, "canceled")
 
 
 @admin.register(OrderItem)
@@ -184,3 +259,62 @@ class OrderItemAdmin(admin.ModelAdmin):
     list_per_page = 10
     search_fields = ['order', 'get_product_info']
 
+
+@admin.register(ShopSales)
+class ShopSalesAdmin(admin.ModelAdmin):
+    """
+    Класс для регистрации модели ShopSales в админке джанго, настройки отображаемых полей, сортировки и пагинации
+    """
+    list_display = ['id', 'shop', 'day', 'orders_count', 'units', 'revenue']
+    list_filter = ['shop']
+    ordering = ['-day']
+    list_per_page = 10
+
+
+@admin.register(ProductSales)
+class ProductSalesAdmin(admin.ModelAdmin):
+    """
+    Класс для регистрации модели ProductSales в админке джанго, настройки отображаемых полей, сортировки и
+    пагинации
+    """
+    list_display = ['id', 'shop', 'product_name', 'day', 'units', 'revenue']
+    list_filter = ['shop']
+    ordering = ['-day']
+    list_per_page = 10
+
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(admin.ModelAdmin):
+    """
+    Класс для регистрации модели ArchivedOrder в админке джанго, настройки отображаемых полей, сортировки,
+    пагинации и поиска
+    """
+    list_display = ['id', 'user', 'shop', 'dt', 'status', 'total_sum', 'file']
+    list_filter = ['status']
+    ordering = ['-dt']
+    list_per_page = 10
+    search_fields = ['id']
+
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    """
+    Класс для регистрации модели OutboxEvent в админке джанго, настройки отображаемых полей, сортировки и
+    пагинации
+    """
+    list_display = ['id', 'task', 'created_at', 'sent_at', 'processed_at', 'attempts']
+    list_filter = ['task']
+    ordering = ['-id']
+    list_per_page = 10
+
+
+@admin.register(DigestEvent)
+class DigestEventAdmin(admin.ModelAdmin):
+    """
+    Класс для регистрации модели DigestEvent в админке джанго, настройки отображаемых полей, сортировки и
+    пагинации
+    """
+    list_display = ['id', 'shop', 'order', 'status', 'created_at']
+    list_filter = ['shop']
+    ordering = ['-id']
+    list_per_page = 10
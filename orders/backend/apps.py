@@ -3,3 +3,9 @@ from django.apps import AppConfig
 
 class BackendConfig(AppConfig):
     name = 'backend'
+
+    def ready(self):
+        """
+        Метод для регистрации сигналов приложения
+        """
+        import backend.signals
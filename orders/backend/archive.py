@@ -0,0 +1,101 @@
+import fcntl
+import gzip
+import json
+import os
+from datetime import timedelta
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.utils import timezone
+from backend.models import Order, OrderItem, ArchivedOrder
+
+ARCHIVE_STATUSES = ('delivered', 'canceled')
+
+
+def archive_file(dt):
+    """
+    Функция для получения имени файла архива по дате заказа
+    """
+    return f'orders-{dt:%Y-%m}.jsonl.gz'
+
+
+def _append(file_name, records):
+    """
+    Функция для дозаписи заказов records в файл архива отдельным сжатым блоком. Файл остается корректным gzip-файлом
+    из нескольких блоков. Возвращает смещение и размер записанного блока
+    """
+    os.makedirs(settings.ORDER_ARCHIVE_ROOT, exist_ok=True)
+    data = gzip.compress(''.join(json.dumps(record, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+                                 for record in records).encode())
+    with open(os.path.join(settings.ORDER_ARCHIVE_ROOT, file_name), 'ab') as file:
+        fcntl.flock(file, fcntl.LOCK_EX)
+        try:
+            offset = file.seek(0, os.SEEK_END)
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        finally:
+            fcntl.flock(file, fcntl.LOCK_UN)
+    return offset, len(data)
+
+
+def archive_orders(days=None, batch_size=None):
+    """
+    Функция для переноса доставленных и отмененных заказов старше days дней (по умолчанию ORDER_ARCHIVE_AFTER_DAYS)
+    в архив. Заказы обрабатываются пакетами по batch_size (по умолчанию ORDER_ARCHIVE_BATCH_SIZE): каждый пакет
+    записывается в файлы архива по месяцам, после чего в одной транзакции создаются указатели ArchivedOrder, а заказы
+    и их позиции удаляются. Заблокированные другим процессом заказы пропускаются. Возвращает количество
+    перенесенных заказов
+    """
+    before = timezone.now() - timedelta(days=settings.ORDER_ARCHIVE_AFTER_DAYS if days is None else days)
+    batch_size = batch_size or settings.ORDER_ARCHIVE_BATCH_SIZE
+    archived = 0
+    while True:
+        with transaction.atomic():
+            orders = list(Order.objects.select_for_update(skip_locked=True).filter(
+                status__in=ARCHIVE_STATUSES, dt__lt=before).order_by('id').values(
+                'id', 'user_id', 'shop_id', 'dt', 'status', 'total_sum', 'items_count')[:batch_size])
+            if not orders:
+                return archived
+            order_ids = [order['id'] for order in orders]
+            items = {}
+            for item in OrderItem.objects.filter(order_id__in=order_ids).order_by('id').values(
+                    'order_id', 'product_info_id', 'quantity', 'price', 'product_name', 'shop_id'):
+                items.setdefault(item.pop('order_id'), []).append(item)
+            months = {}
+            for order in orders:
+                order['ordered_items'] = items.get(order['id'], [])
+                months.setdefault(archive_file(order['dt']), []).append(order)
+            pointers = []
+            for file_name, records in months.items():
+                offset, length = _append(file_name, records)
+                pointers += [ArchivedOrder(id=record['id'], user_id=record['user_id'], shop_id=record['shop_id'],
+                                           dt=record['dt'], status=record['status'], total_sum=record['total_sum'],
+                                           file=file_name, offset=offset, length=length) for record in records]
+            ArchivedOrder.objects.bulk_create(pointers)
+            # позиции удаляются одним запросом DELETE в обход ORM: QuerySet.delete() загрузил бы каждую позицию и
+            # отправил post_delete, пересчитывающий суммы удаляемых заказов. У позиций нет зависимых записей, поэтому
+            # пропуск каскадов ничего не оставляет в базе данных
+            with connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM {OrderItem._meta.db_table} WHERE order_id = ANY(%s)', [order_ids])
+            Order.objects.filter(id__in=order_ids).delete()
+        archived += len(orders)
+
+
+def find_archived_order(order_id, **lookup):
+    """
+    Функция для получения заказа из архива по id. lookup - дополнительные условия отбора указателя ArchivedOrder,
+    например user_id. Распаковывается только блок файла архива, содержащий заказ. Возвращает словарь с данными
+    заказа или None, если заказ не найден
+    """
+    pointer = ArchivedOrder.objects.filter(id=order_id, **lookup).first()
+    if pointer is None:
+        return None
+    with open(os.path.join(settings.ORDER_ARCHIVE_ROOT, pointer.file), 'rb') as file:
+        file.seek(pointer.offset)
+        data = gzip.decompress(file.read(pointer.length))
+    for line in data.decode().splitlines():
+        record = json.loads(line)
+        if record['id'] == pointer.id:
+            return record
+    return None
@@ -0,0 +1,106 @@
+import json
+import logging
+import redis
+from datetime import timedelta
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from backend.models import User
+from backend.redis_store import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+def token_cache_key(key):
+    """
+    Функция для получения ключа кеша пользователя по токену аутентификации
+    """
+    return f'auth:token:{key}'
+
+
+def token_to_cache(token):
+    """
+    Функция для преобразования токена и его пользователя в строку JSON для кеша
+    """
+    return json.dumps({'created': token.created,
+                       'user': [getattr(token.user, field.attname) for field in User._meta.concrete_fields]},
+                      cls=DjangoJSONEncoder)
+
+
+def token_from_cache(key, data):
+    """
+    Функция для восстановления токена key и его пользователя из строки JSON, полученной функцией token_to_cache
+    """
+    data = json.loads(data)
+    fields = User._meta.concrete_fields
+    values = [field.to_python(value) for field, value in zip(fields, data['user'])]
+    user = User.from_db('default', [field.attname for field in fields], values)
+    token = Token(key=key, user=user, created=parse_datetime(data['created']))
+    token._state.adding = False
+    return token
+
+
+def token_expires(token):
+    """
+    Функция для получения времени окончания действия токена аутентификации (через AUTH_TOKEN_TTL секунд после
+    создания)
+    """
+    return token.created + timedelta(seconds=settings.AUTH_TOKEN_TTL)
+
+
+def invalidate_tokens(keys):
+    """
+    Функция для удаления из кеша пользователей по токенам keys. Вызывается при выходе из аккаунта, смене пароля,
+    деактивации и любом другом изменении пользователя
+    """
+    if not keys:
+        return
+    try:
+        get_redis().delete(*[token_cache_key(key) for key in keys])
+    except redis.RedisError as error:
+        logger.warning('Не удалось удалить токены из кеша аутентификации: %s', error)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Класс аутентификации по токену с кешированием пользователя в Redis на AUTH_TOKEN_CACHE_TTL секунд. Запрос к
+    таблицам токенов и пользователей выполняется только при отсутствии токена в кеше. Кеш пользователя удаляется
+    сигналами при удалении токена и изменении пользователя (см. backend.signals), поэтому выход из аккаунта, смена
+    пароля и деактивация действуют сразу. При недоступности Redis пользователь загружается из базы данных. Заменяет
+    TokenAuthentication в DEFAULT_AUTHENTICATION_CLASSES и authentication_classes представлений. Токены старше
+    AUTH_TOKEN_TTL секунд отклоняются
+    """
+
+    def authenticate_credentials(self, key):
+        """
+        Метод для получения пользователя и токена по ключу токена key
+        """
+        cache_key = token_cache_key(key)
+        try:
+            cached = get_redis().get(cache_key)
+        except redis.RedisError as error:
+            logger.warning('Кеш аутентификации недоступен: %s', error)
+            user, token = super().authenticate_credentials(key)
+        else:
+            if cached is not None:
+                token = token_from_cache(key, cached)
+            else:
+                try:
+                    token = Token.objects.select_related('user').get(key=key)
+                except Token.DoesNotExist:
+                    raise exceptions.AuthenticationFailed(_('Invalid token.'))
+                try:
+                    get_redis().set(cache_key, token_to_cache(token), ex=settings.AUTH_TOKEN_CACHE_TTL)
+                except redis.RedisError as error:
+                    logger.warning('Кеш аутентификации недоступен: %s', error)
+            user = token.user
+            if not user.is_active:
+                raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        if token_expires(token) <= timezone.now():
+            raise exceptions.AuthenticationFailed('Token has expired.')
+        return user, token
@@ -0,0 +1,332 @@
+from functools import partial
+from itertools import chain
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from rest_framework import serializers
+from backend.models import Order, OrderItem, ShopProduct
+from backend.redis_store import get_redis
+from backend.serializers import OrderSerializer, ShopProductSerializer
+
+# Первый ключ рекомендательной блокировки PostgreSQL для оформления корзины в Redis, второй ключ - id пользователя
+BASKET_LOCK_NAMESPACE = 50
+
+
+class DatabaseBasketStore:
+    """
+    Класс хранилища корзины в базе данных. Корзина - объект класса Order со статусом 'basket', товары в корзине -
+    объекты класса OrderItem. Методы класса - queryset, get, add, update, remove, checkout
+    """
+
+    @staticmethod
+    def queryset(user_id):
+        """
+        Метод для получения корзины пользователя
+        """
+        return Order.objects.filter(user_id=user_id, status='basket').with_item_details()
+
+    def get(self, user_id):
+        """
+        Метод для получения сериализованного содержимого корзины пользователя
+        """
+        return OrderSerializer(self.queryset(user_id), many=True).data
+
+    def add(self, user_id, items):
+        """
+        Метод для добавления товаров в корзину. items - список пар (id товара в магазине, количество). Количество
+        товара, уже находящегося в корзине, увеличивается. Возвращает количество добавленных позиций
+        """
+        order, _ = Order.objects.get_or_create(user_id=user_id, status='basket')
+        quantities = item_quantities([{'product_info_id': product_id, 'quantity': quantity}
+                                      for product_id, quantity in items])
+        with transaction.atomic():
+            in_basket = set(OrderItem.objects.select_for_update().filter(
+                order_id=order.id, product_info_id__in=quantities).values_list('product_info_id', flat=True))
+            for product_id in in_basket:
+                OrderItem.objects.filter(order_id=order.id, product_info_id=product_id).update(
+                    quantity=F('quantity') + quantities[product_id])
+            OrderItem.objects.bulk_create([OrderItem(order_id=order.id, product_info_id=product_id, quantity=quantity)
+                                           for product_id, quantity in quantities.items()
+                                           if product_id not in in_basket])
+            Order.objects.filter(id=order.id).recalculate_totals()
+        return len(items)
+
+    def update(self, user_id, items):
+        """
+        Метод для изменения количества товаров в корзине. Возвращает количество обновленных позиций
+        """
+        basket, _ = Order.objects.get_or_create(user_id=user_id, status='basket')
+        objects_updated = 0
+        for product_id, quantity in items:
+            objects_updated += OrderItem.objects.filter(order_id=basket.id,
+                                                        product_info_id=product_id).update(quantity=quantity)
+        if objects_updated:
+            Order.objects.filter(id=basket.id).recalculate_totals()
+        return objects_updated
+
+    def remove(self, user_id, product_ids):
+        """
+        Метод для удаления товаров из корзины. Возвращает количество удаленных позиций
+        """
+        basket, _ = Order.objects.get_or_create(user_id=user_id, status='basket')
+        return OrderItem.objects.filter(order_id=basket.id, product_info_id__in=product_ids).delete()[0]
+
+    def checkout(self, user_id, basket_id):
+        """
+        Метод для оформления заказа из корзины. Товары корзины резервируются на складе, корзина с id basket_id
+        разделяется на заказы по магазинам со статусом 'new': заказ первого магазина сохраняет id корзины, для
+        остальных магазинов создаются новые заказы, в которые переносятся их позиции. В позиции заказов копируются
+        цена, название товара и магазин. При нехватке товара возникает исключение OutOfStock. Возвращает список
+        заказов по магазинам (см. split_by_shop) или None, если корзина не найдена или пуста
+        """
+        with transaction.atomic():
+            basket = Order.objects.select_for_update().filter(id=basket_id, user_id=user_id, status='basket').first()
+            if basket is None:
+                return None
+            rows = list(OrderItem.objects.filter(order_id=basket.id).order_by('id').values(
+                'id', 'quantity', 'product_info_id', 'product_info__shop', 'product_info__price',
+                'product_info__product__name', shop_name=F('product_info__shop__name'),
+                seller_id=F('product_info__shop__seller')))
+            if not rows:
+                return None
+            # имена shop_id, price и product_name заняты полями позиции заказа, поэтому значения из прайса магазина
+            # выбираются по полному пути и переименовываются
+            for row in rows:
+                row['shop_id'] = row.pop('product_info__shop')
+                row['price'] = row.pop('product_info__price')
+                row['product_name'] = row.pop('product_info__product__name')
+            ShopProduct.objects.reserve(item_quantities(rows))
+            sub_orders = split_by_shop(rows)
+            Order.objects.filter(id=basket.id).update(status='new', shop_id=sub_orders[0]['shop_id'])
+            sub_orders[0]['order_id'] = basket.id
+            created = Order.objects.bulk_create([Order(user_id=user_id, status='new', shop_id=sub_order['shop_id'])
+                                                 for sub_order in sub_orders[1:]])
+            for order, sub_order in zip(created, sub_orders[1:]):
+                sub_order['order_id'] = order.id
+                OrderItem.objects.filter(id__in=sub_order.pop('item_ids')).update(order_id=order.id)
+            sub_orders[0].pop('item_ids')
+            orders = Order.objects.filter(id__in=[sub_order['order_id'] for sub_order in sub_orders])
+            orders.snapshot_prices()
+            orders.recalculate_totals()
+            orders.update_sales()
+        return sub_orders
+
+
+class RedisBasketStore:
+    """
+    Класс хранилища корзины в Redis. Корзина пользователя хранится в хеше basket:<id пользователя>: поля id и dt
+    содержат номер и дату создания корзины, поля item:<id товара в магазине> - количество товара, поле checkout - id
+    транзакции, оформляющей корзину. Объекты классов Order и OrderItem создаются только при оформлении заказа. Время
+    жизни корзины задается настройкой BASKET_TTL
+    """
+    item_prefix = 'item:'
+
+    def __init__(self):
+        self.redis = get_redis()
+
+    @staticmethod
+    def queryset(user_id):
+        """
+        Метод для получения корзины пользователя в виде объектов класса Order. Корзина в Redis не хранится в базе
+        данных, поэтому возвращается пустой набор
+        """
+        return Order.objects.none()
+
+    @staticmethod
+    def _key(user_id):
+        return f'basket:{user_id}'
+
+    def _items(self, data):
+        """
+        Метод для получения словаря {id товара в магазине: количество} из содержимого хеша корзины
+        """
+        return {int(field[len(self.item_prefix):]): int(value) for field, value in data.items()
+                if field.startswith(self.item_prefix)}
+
+    def _touch(self, user_id):
+        """
+        Метод для создания корзины при ее отсутствии и продления времени ее жизни
+        """
+        key = self._key(user_id)
+        if not self.redis.hget(key, 'id'):
+            self.redis.hsetnx(key, 'id', self.redis.incr('basket:sequence'))
+            self.redis.hsetnx(key, 'dt', serializers.DateTimeField().to_representation(timezone.now()))
+        self.redis.expire(key, settings.BASKET_TTL)
+        return key
+
+    def get(self, user_id):
+        """
+        Метод для получения содержимого корзины пользователя в том же формате, что и у DatabaseBasketStore
+        """
+        data = self.redis.hgetall(self._key(user_id))
+        if not data:
+            return []
+        items = self._items(data)
+        products = ShopProduct.objects.filter(id__in=items).select_related(
+            'shop__seller', 'product__category').prefetch_related('product__product_inf__parameter')
+        ordered_items = [{'product_info': ShopProductSerializer(product).data, 'quantity': items[product.id]}
+                         for product in products]
+        total_sum = sum(product.price * items[product.id] for product in products)
+        return [{'id': int(data['id']), 'user': user_id, 'dt': data['dt'], 'status': 'basket',
+                 'ordered_items': ordered_items, 'total_sum': total_sum, 'items_count': len(ordered_items)}]
+
+    def add(self, user_id, items):
+        """
+        Метод для добавления товаров в корзину. Количество уже добавленного товара увеличивается
+        """
+        key = self._touch(user_id)
+        for product_id, quantity in items:
+            self.redis.hincrby(key, f'{self.item_prefix}{product_id}', quantity)
+        return len(items)
+
+    def update(self, user_id, items):
+        """
+        Метод для изменения количества товаров, уже находящихся в корзине
+        """
+        key = self._touch(user_id)
+        objects_updated = 0
+        for product_id, quantity in items:
+            field = f'{self.item_prefix}{product_id}'
+            if self.redis.hexists(key, field):
+                self.redis.hset(key, field, quantity)
+                objects_updated += 1
+        return objects_updated
+
+    def remove(self, user_id, product_ids):
+        """
+        Метод для удаления товаров из корзины. Возвращает количество удаленных позиций
+        """
+        key = self._touch(user_id)
+        return self.redis.hdel(key, *[f'{self.item_prefix}{product_id}' for product_id in product_ids])
+
+    def checkout(self, user_id, basket_id):
+        """
+        Метод для оформления заказа из корзины. Товары корзины резервируются на складе, содержимое корзины
+        записывается в заказы по магазинам (объекты классов Order и OrderItem) вместе с ценой, названием товара и
+        магазином. Оформления корзины пользователя выполняются по очереди под рекомендательной блокировкой
+        PostgreSQL до конца транзакции, оформляющая транзакция отмечается в корзине полем checkout, поэтому
+        корзина, уже оформленная другой транзакцией, повторно не оформляется. Корзина удаляется из Redis после
+        фиксации транзакции, при откате транзакции корзина сохраняется.
+        При нехватке товара возникает исключение OutOfStock. Возвращает список заказов по магазинам (см. split_by_shop)
+        или None, если корзина не найдена, пуста или уже оформлена
+        """
+        key = self._key(user_id)
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_xact_lock(%s, %s), txid_current()', [BASKET_LOCK_NAMESPACE, user_id])
+                txid = cursor.fetchone()[1]
+                data = self.redis.hgetall(key)
+                if data.get('id') != str(basket_id):
+                    return None
+                if data.get('checkout'):
+                    cursor.execute('SELECT txid_status(%s)', [int(data['checkout'])])
+                    if int(data['checkout']) == txid or cursor.fetchone()[0] == 'committed':
+                        return None
+            items = self._items(data)
+            # товары, удаленные из прайса магазина после добавления в корзину, не попадают в заказ
+            rows = list(ShopProduct.objects.filter(id__in=items).order_by('id').values(
+                'shop_id', 'price', product_info_id=F('id'), shop_name=F('shop__name'), seller_id=F('shop__seller'),
+                product_name=F('product__name')))
+            if not rows:
+                return None
+            for row in rows:
+                row['quantity'] = items[row['product_info_id']]
+            ShopProduct.objects.reserve(item_quantities(rows))
+            sub_orders = split_by_shop(rows)
+            created = Order.objects.bulk_create([Order(user_id=user_id, status='new', shop_id=sub_order['shop_id'])
+                                                 for sub_order in sub_orders])
+            order_items = []
+            for order, sub_order in zip(created, sub_orders):
+                sub_order['order_id'] = order.id
+                sub_order.pop('item_ids')
+                order_items += [OrderItem(order_id=order.id, product_info_id=item['product_info_id'],
+                                          quantity=item['quantity'], price=item['price'],
+                                          product_name=item['product_name'], shop_id=sub_order['shop_id'])
+                                for item in sub_order['items']]
+            OrderItem.objects.bulk_create(order_items)
+            orders = Order.objects.filter(id__in=[order.id for order in created])
+            orders.recalculate_totals()
+            orders.update_sales()
+            self.redis.hset(key, 'checkout', txid)
+            transaction.on_commit(partial(self.redis.delete, key))
+        return sub_orders
+
+
+def item_quantities(rows):
+    """
+    Функция для получения словаря {id товара в магазине: количество} по позициям корзины
+    """
+    quantities = {}
+    for row in rows:
+        quantities[row['product_info_id']] = quantities.get(row['product_info_id'], 0) + row['quantity']
+    return quantities
+
+
+def split_by_shop(rows):
+    """
+    Функция для разделения позиций корзины по магазинам. Возвращает список словарей с ключами shop_id, shop_name,
+    seller_id, item_ids (id позиций корзины) и items - список позиций магазина с ключами product_info_id, product_name,
+    quantity, price. Магазины упорядочены по первой позиции корзины
+    """
+    sub_orders = {}
+    for row in rows:
+        sub_order = sub_orders.setdefault(row['shop_id'], {'shop_id': row['shop_id'], 'shop_name': row['shop_name'],
+                                                           'seller_id': row['seller_id'], 'item_ids': [],
+                                                           'items': []})
+        if 'id' in row:
+            sub_order['item_ids'].append(row['id'])
+        sub_order['items'].append({'product_info_id': row['product_info_id'], 'product_name': row['product_name'],
+                                   'quantity': row['quantity'], 'price': row['price']})
+    return list(sub_orders.values())
+
+
+def create_orders(user_id, orders):
+    """
+    Функция для оформления нескольких заказов без корзины. orders - список заказов, словарей с ключами contact (id
+    контакта для доставки) и items (список словарей с ключами product_info, quantity). Товары всех заказов
+    резервируются на складе одним запросом, каждый заказ разделяется на заказы по магазинам со статусом 'new', все
+    объекты классов Order и OrderItem создаются массовой вставкой в одной транзакции. При нехватке товара возникает
+    исключение OutOfStock, и ни один заказ не создается. Возвращает для каждого заказа orders список заказов по
+    магазинам (см. split_by_shop)
+    """
+    product_ids = {item['product_info'] for order in orders for item in order['items']}
+    products = {row['product_info_id']: row for row in ShopProduct.objects.filter(id__in=product_ids).values(
+        'shop_id', 'price', product_info_id=F('id'), shop_name=F('shop__name'), seller_id=F('shop__seller'),
+        product_name=F('product__name'))}
+    results = []
+    for order in orders:
+        quantities = item_quantities([{'product_info_id': item['product_info'], 'quantity': item['quantity']}
+                                      for item in order['items']])
+        sub_orders = split_by_shop([dict(products[product_id], quantity=quantity)
+                                    for product_id, quantity in quantities.items()])
+        for sub_order in sub_orders:
+            sub_order.pop('item_ids')
+            sub_order['contact_id'] = order['contact']
+        results.append(sub_orders)
+    sub_orders = list(chain.from_iterable(results))
+    with transaction.atomic():
+        ShopProduct.objects.reserve(item_quantities([item for sub_order in sub_orders
+                                                     for item in sub_order['items']]))
+        created = Order.objects.bulk_create([Order(user_id=user_id, status='new', shop_id=sub_order['shop_id'],
+                                                   contact_id=sub_order['contact_id']) for sub_order in sub_orders])
+        order_items = []
+        for order, sub_order in zip(created, sub_orders):
+            sub_order['order_id'] = order.id
+            order_items += [OrderItem(order_id=order.id, product_info_id=item['product_info_id'],
+                                      quantity=item['quantity'], price=item['price'],
+                                      product_name=item['product_name'], shop_id=sub_order['shop_id'])
+                            for item in sub_order['items']]
+        OrderItem.objects.bulk_create(order_items, batch_size=1000)
+        orders = Order.objects.filter(id__in=[order.id for order in created])
+        orders.recalculate_totals()
+        orders.update_sales()
+    return results
+
+
+def get_basket_store():
+    """
+    Функция для получения хранилища корзины, указанного в настройке BASKET_STORE
+    """
+    return import_string(settings.BASKET_STORE)()
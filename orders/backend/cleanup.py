@@ -0,0 +1,54 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from backend.authentication import invalidate_tokens
+from backend.models import User, ConfirmEmailToken
+
+
+def _delete_in_batches(queryset, batch_size, raw=False):
+    """
+    Функция для удаления записей queryset пакетами по batch_size. Каждый пакет удаляется отдельным запросом в
+    отдельной транзакции, поэтому таблица не блокируется на время всей очистки. При raw=True записи удаляются без
+    сигналов и каскадов одним запросом DELETE в обход ORM, что допустимо только для моделей без зависимых записей.
+    Возвращает генератор списков первичных ключей удаленных пакетов
+    """
+    model = queryset.model
+    while True:
+        pks = list(queryset.values_list('pk', flat=True).distinct()[:batch_size])
+        if not pks:
+            return
+        if raw:
+            # QuerySet.delete() загрузил бы каждую запись для отправки post_delete
+            with connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM {model._meta.db_table} WHERE {model._meta.pk.column} = ANY(%s)', [pks])
+        else:
+            model.objects.filter(pk__in=pks).delete()
+        yield pks
+
+
+def cleanup_auth(batch_size=None):
+    """
+    Функция для очистки устаревших данных аутентификации пакетами по batch_size (по умолчанию
+    AUTH_CLEANUP_BATCH_SIZE): токенов аутентификации старше AUTH_TOKEN_TTL секунд, неподтвержденных пользователей,
+    токен подтверждения email которых старше CONFIRM_EMAIL_TOKEN_TTL секунд, и оставшихся устаревших токенов
+    подтверждения email. Пользователи, деактивированные администратором, не имеют токена подтверждения и не
+    удаляются. Возвращает словарь с количеством удаленных записей
+    """
+    batch_size = batch_size or settings.AUTH_CLEANUP_BATCH_SIZE
+    now = timezone.now()
+    deleted = {'tokens': 0, 'users': 0, 'confirm_email_tokens': 0}
+    # токены удаляются без сигнала post_delete, кеш аутентификации очищается одним вызовом на пакет
+    for keys in _delete_in_batches(Token.objects.filter(created__lt=now - timedelta(seconds=settings.AUTH_TOKEN_TTL)),
+                                   batch_size, raw=True):
+        invalidate_tokens(keys)
+        deleted['tokens'] += len(keys)
+    confirm_before = now - timedelta(seconds=settings.CONFIRM_EMAIL_TOKEN_TTL)
+    for ids in _delete_in_batches(User.objects.filter(is_active=False,
+                                                      confirm_email_tokens__created_at__lt=confirm_before), batch_size):
+        deleted['users'] += len(ids)
+    for ids in _delete_in_batches(ConfirmEmailToken.objects.filter(created_at__lt=confirm_before), batch_size,
+                                  raw=True):
+        deleted['confirm_email_tokens'] += len(ids)
+    return deleted
@@ -0,0 +1,65 @@
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+from backend.mail import MAIL_ERRORS, defer, send_messages, render_message
+from backend.models import Shop, DigestEvent
+
+logger = logging.getLogger(__name__)
+
+
+def buffer_events(shop_id, orders):
+    """
+    Функция для накопления оповещений продавца для сводки. orders - список пар (id заказа, статус заказа)
+    """
+    DigestEvent.objects.bulk_create([DigestEvent(shop_id=shop_id, order_id=order_id, status=status)
+                                     for order_id, status in orders])
+
+
+def build_digest(shop, events):
+    """
+    Функция для формирования письма-сводки продавцу магазина shop по накопленным оповещениям events
+    """
+    context = {'shop': shop, 'new_orders': [event.order for event in events if event.status == 'new'],
+               'changes': [event for event in events if event.status != 'new']}
+    return render_message('seller_digest', context, [shop.seller.email], shop.seller.language)
+
+
+def send_digests():
+    """
+    Функция для отправки сводок продавцам, у которых с последней сводки прошло digest_window минут. Первая сводка
+    отправляется через digest_window минут после первого накопленного оповещения, оповещения, накопленные до
+    отключения сводок (digest_window = 0), отправляются при ближайшей проверке. Накопленные оповещения и их заказы
+    читаются одним запросом на магазин. Строка магазина блокируется на время чтения и удаления оповещений, поэтому
+    одновременно запущенные задачи не отправляют одну сводку дважды. Письма отправляются одним пакетом после
+    фиксации транзакций, при ошибке почтового сервера откладываются в celery task send_email_task. Возвращает
+    количество отправленных сводок
+    """
+    now = timezone.now()
+    messages = []
+    candidates = Shop.objects.filter(seller__isnull=False).annotate(
+        first_event_at=Min('digest_events__created_at')).filter(first_event_at__isnull=False). \
+        values_list('id', 'digest_window', 'digest_sent_at', 'first_event_at')
+    for shop_id, window, sent_at, first_event_at in candidates:
+        if window and (sent_at or first_event_at) > now - timedelta(minutes=window):
+            continue
+        with transaction.atomic():
+            shop = Shop.objects.select_for_update(skip_locked=True, of=('self',)).select_related('seller'). \
+                filter(id=shop_id).first()
+            if shop is None:
+                continue
+            events = list(DigestEvent.objects.filter(shop_id=shop_id).select_related('order').order_by('id'))
+            if not events:
+                continue
+            messages.append(build_digest(shop, events))
+            DigestEvent.objects.filter(id__in=[event.id for event in events]).delete()
+            Shop.objects.filter(id=shop_id).update(digest_sent_at=now)
+    if messages:
+        try:
+            send_messages(messages)
+        except MAIL_ERRORS:
+            logger.warning('Ошибка почтового сервера, отправка %s сводок отложена', len(messages), exc_info=True)
+            defer(messages, settings.MAIL_RETRY_DELAY)
+    return len(messages)
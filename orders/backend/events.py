@@ -0,0 +1,235 @@
+import asyncio
+import json
+import logging
+import threading
+from urllib.parse import parse_qs
+import redis
+import redis.asyncio
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from rest_framework.authtoken.models import Token
+from backend.models import Order
+from backend.redis_store import get_redis
+
+logger = logging.getLogger(__name__)
+
+_layers = {}
+
+
+def user_group(user_id):
+    """
+    Функция для получения имени группы событий пользователя
+    """
+    return f'events:user:{user_id}'
+
+
+class InMemorySubscription:
+    """
+    Класс подписки на группу событий InMemoryChannelLayer. Методы класса - get, close
+    """
+
+    def __init__(self, layer, group):
+        self.layer = layer
+        self.group = group
+        self.queue = asyncio.Queue()
+        self.loop = asyncio.get_running_loop()
+
+    async def get(self, timeout):
+        """
+        Метод для получения следующего события группы. Возвращает None, если за timeout секунд событий не было
+        """
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def close(self):
+        """
+        Метод для отмены подписки
+        """
+        self.layer.unsubscribe(self)
+
+
+class InMemoryChannelLayer:
+    """
+    Класс канального уровня, передающего события подписчикам в пределах одного процесса. Используется в тестах и при
+    локальной разработке, когда в настройке REDIS_URL указано значение 'memory://'. Методы класса - publish,
+    subscribe, unsubscribe
+    """
+
+    def __init__(self):
+        self._groups = {}
+        self._lock = threading.Lock()
+
+    def publish(self, group, message):
+        """
+        Метод для отправки события message всем подписчикам группы group. Может вызываться из любого потока
+        """
+        with self._lock:
+            subscriptions = list(self._groups.get(group, ()))
+        for subscription in subscriptions:
+            subscription.loop.call_soon_threadsafe(subscription.queue.put_nowait, message)
+
+    async def subscribe(self, group):
+        """
+        Метод для подписки на события группы group. Возвращает объект InMemorySubscription
+        """
+        subscription = InMemorySubscription(self, group)
+        with self._lock:
+            self._groups.setdefault(group, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """
+        Метод для отмены подписки subscription
+        """
+        with self._lock:
+            subscriptions = self._groups.get(subscription.group, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self._groups.pop(subscription.group, None)
+
+
+class RedisSubscription:
+    """
+    Класс подписки на канал Redis Pub/Sub. Методы класса - get, close
+    """
+
+    def __init__(self, client, pubsub):
+        self.client = client
+        self.pubsub = pubsub
+
+    async def get(self, timeout):
+        """
+        Метод для получения следующего события канала. Возвращает None, если за timeout секунд событий не было
+        """
+        message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+        return json.loads(message['data']) if message else None
+
+    async def close(self):
+        """
+        Метод для отмены подписки и закрытия соединения с Redis
+        """
+        await self.pubsub.close()
+        await self.client.close()
+
+
+class RedisChannelLayer:
+    """
+    Класс канального уровня на основе Redis Pub/Sub. Передает события между процессами, например из celery worker и
+    WSGI-процессов в процессы ASGI-сервера. Методы класса - publish, subscribe
+    """
+
+    def publish(self, group, message):
+        """
+        Метод для отправки события message всем подписчикам группы group
+        """
+        get_redis().publish(group, json.dumps(message))
+
+    async def subscribe(self, group):
+        """
+        Метод для подписки на события группы group. Возвращает объект RedisSubscription
+        """
+        client = redis.asyncio.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+        pubsub = client.pubsub()
+        await pubsub.subscribe(group)
+        return RedisSubscription(client, pubsub)
+
+
+def get_channel_layer():
+    """
+    Функция для получения канального уровня по адресу из настройки REDIS_URL. Для адреса 'memory://' возвращается
+    экземпляр InMemoryChannelLayer. Канальные уровни кешируются на уровне процесса
+    """
+    url = settings.REDIS_URL
+    if url not in _layers:
+        _layers[url] = InMemoryChannelLayer() if url.startswith('memory://') else RedisChannelLayer()
+    return _layers[url]
+
+
+def publish_order_status(order_ids, status):
+    """
+    Функция для отправки события об изменении статуса заказов order_ids на status покупателям и продавцам
+    магазинов этих заказов. Ошибка соединения с Redis не прерывает изменение статуса: клиент получит актуальный
+    статус при следующем запросе списка заказов
+    """
+    layer = get_channel_layer()
+    try:
+        for order in Order.objects.filter(id__in=order_ids).values('id', 'user_id', 'shop__seller_id'):
+            message = {'event': 'order_status', 'order_id': order['id'], 'status': status}
+            for user_id in {order['user_id'], order['shop__seller_id']} - {None}:
+                layer.publish(user_group(user_id), message)
+    except redis.RedisError as error:
+        logger.warning('Не удалось отправить событие изменения статуса заказов %s: %s', order_ids, error)
+
+
+@sync_to_async
+def _authenticate(key):
+    """
+    Функция для получения id пользователя по токену аутентификации. Возвращает None для неизвестного токена или
+    неактивного пользователя
+    """
+    token = Token.objects.select_related('user').filter(key=key).first()
+    return token.user_id if token and token.user.is_active else None
+
+
+def _token(scope):
+    """
+    Функция для получения токена из заголовка Authorization или параметра запроса token. Параметр запроса нужен
+    браузерному EventSource, который не передает заголовки
+    """
+    headers = dict(scope['headers'])
+    authorization = headers.get(b'authorization', b'').decode()
+    if authorization.startswith('Token '):
+        return authorization[len('Token '):]
+    return parse_qs(scope['query_string'].decode()).get('token', [None])[0]
+
+
+async def _send_json(send, status, data):
+    """
+    Функция для отправки ответа с ошибкой в формате JSON
+    """
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'application/json')]})
+    await send({'type': 'http.response.body', 'body': json.dumps(data, ensure_ascii=False).encode()})
+
+
+async def order_events_app(scope, receive, send):
+    """
+    ASGI-приложение для потока событий об изменении статуса заказов пользователя (server-sent events). Пользователь
+    определяется по токену аутентификации. Каждое событие передается строкой data в формате JSON, при отсутствии
+    событий каждые EVENTS_KEEPALIVE секунд передается комментарий для поддержания соединения. Поток завершается при
+    отключении клиента
+    """
+    key = _token(scope)
+    user_id = await _authenticate(key) if key else None
+    if user_id is None:
+        await _send_json(send, 401, {'Status': False, 'Error': 'Log in required'})
+        return
+
+    async def wait_disconnect():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    subscription = await get_channel_layer().subscribe(user_group(user_id))
+    watcher = asyncio.create_task(wait_disconnect())
+    try:
+        await send({'type': 'http.response.start', 'status': 200,
+                    'headers': [(b'content-type', b'text/event-stream'), (b'cache-control', b'no-cache'),
+                                (b'x-accel-buffering', b'no')]})
+        await send({'type': 'http.response.body', 'body': b': connected\n\n', 'more_body': True})
+        while True:
+            getter = asyncio.create_task(subscription.get(settings.EVENTS_KEEPALIVE))
+            await asyncio.wait({getter, watcher}, return_when=asyncio.FIRST_COMPLETED)
+            if watcher.done():
+                getter.cancel()
+                break
+            message = getter.result()
+            if message is None:
+                body = b': keepalive\n\n'
+            else:
+                body = f'event: {message["event"]}\ndata: {json.dumps(message)}\n\n'.encode()
+            await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+    finally:
+        watcher.cancel()
+        await subscription.close()
@@ -21,4 +21,11 @@ class SocialSignupForm(SignupForm):
         user = super(SocialSignupForm, self).save(request)
         user.is_active = True
         user.save()
-        return user
\ No newline at end of file
+        return user
+
+
+class ProvisionAccountsForm(forms.Form):
+    """
+    Класс формы загрузки аккаунтов из CSV-файла в админке django (см. backend.provisioning)
+    """
+    file = forms.FileField(label='CSV-файл')
@@ -0,0 +1,65 @@
+import hashlib
+import json
+from functools import wraps
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from backend.redis_store import get_redis
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+IN_PROGRESS = 'in-progress'
+
+
+def _fingerprint(request):
+    """
+    Функция для получения отпечатка запроса. Используется для проверки, что ключ идемпотентности не используется
+    повторно с другим содержимым запроса
+    """
+    return hashlib.sha256(request.body).hexdigest()
+
+
+def idempotent(view_method):
+    """
+    Декоратор для методов представлений, изменяющих данные. При наличии заголовка Idempotency-Key ответ на запрос
+    сохраняется в Redis на время IDEMPOTENCY_TTL, а повторный запрос с тем же ключом получает сохраненный ответ без
+    повторного выполнения метода. Пока первый запрос выполняется, повторный запрос получает ошибку со статусом 409.
+    Ответы со статусом 5xx не сохраняются, чтобы запрос можно было повторить
+    """
+
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+
+        redis = get_redis()
+        fingerprint = _fingerprint(request)
+        storage_key = f'idempotency:{request.user.id}:{request.method}:{request.path}:{key}'
+        if not redis.set(storage_key, IN_PROGRESS, ex=settings.IDEMPOTENCY_LOCK_TTL, nx=True):
+            stored = redis.get(storage_key)
+            if stored is None or stored == IN_PROGRESS:
+                return JsonResponse({'Status': False, 'Error': 'Запрос с этим ключом идемпотентности уже выполняется'},
+                                    status=409)
+            stored = json.loads(stored)
+            if stored['fingerprint'] != fingerprint:
+                return JsonResponse({'Status': False,
+                                     'Error': 'Ключ идемпотентности использован с другими данными запроса'},
+                                    status=422)
+            response = HttpResponse(stored['content'], status=stored['status'], content_type=stored['content_type'])
+            response['Idempotent-Replayed'] = 'true'
+            return response
+
+        try:
+            response = view_method(self, request, *args, **kwargs)
+        except Exception:
+            redis.delete(storage_key)
+            raise
+        if response.status_code >= 500:
+            redis.delete(storage_key)
+        else:
+            redis.set(storage_key, json.dumps({'fingerprint': fingerprint, 'status': response.status_code,
+                                               'content': response.content.decode(),
+                                               'content_type': response['Content-Type']}),
+                      ex=settings.IDEMPOTENCY_TTL)
+        return response
+
+    return wrapper
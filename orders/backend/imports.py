@@ -0,0 +1,57 @@
+import logging
+import redis
+from django.db import connection
+from backend.redis_store import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Первый ключ рекомендательной блокировки PostgreSQL для загрузки прайсов, второй ключ - id продавца
+IMPORT_LOCK_NAMESPACE = 49
+
+
+def import_sequence_key(seller_id):
+    """
+    Функция для получения ключа номера последней загрузки прайса продавца
+    """
+    return f'import:sequence:{seller_id}'
+
+
+def enqueue_import(shop_file, seller_id):
+    """
+    Функция для постановки загрузки прайса shop_file продавца seller_id в очередь celery. Каждой загрузке
+    присваивается следующий номер продавца, по которому celery task handle_uploaded_file_task пропускает загрузки,
+    замененные более новым файлом. При недоступности Redis загрузка ставится в очередь без номера и не пропускается
+    """
+    from backend.tasks import handle_uploaded_file_task
+    try:
+        sequence = get_redis().incr(import_sequence_key(seller_id))
+    except redis.RedisError as error:
+        logger.warning('Не удалось получить номер загрузки прайса: %s', error)
+        sequence = None
+    handle_uploaded_file_task.delay(shop_file, seller_id, sequence)
+
+
+def is_superseded(seller_id, sequence):
+    """
+    Функция для проверки, поставлена ли после загрузки прайса с номером sequence более новая загрузка продавца
+    seller_id
+    """
+    if sequence is None:
+        return False
+    try:
+        latest = get_redis().get(import_sequence_key(seller_id))
+    except redis.RedisError as error:
+        logger.warning('Не удалось получить номер загрузки прайса: %s', error)
+        return False
+    return latest is not None and int(latest) > sequence
+
+
+def acquire_import_lock(seller_id):
+    """
+    Функция для получения рекомендательной блокировки PostgreSQL загрузки прайса продавца seller_id (у продавца
+    один магазин, поэтому блокировка действует на магазин). Блокировка снимается при завершении транзакции, поэтому
+    функция вызывается внутри transaction.atomic. Возвращает False, если блокировку удерживает другая загрузка
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_try_advisory_xact_lock(%s, %s)', [IMPORT_LOCK_NAMESPACE, seller_id])
+        return cursor.fetchone()[0]
@@ -0,0 +1,240 @@
+import logging
+import math
+import os
+import smtplib
+import threading
+import time
+from functools import lru_cache, partial
+from celery.signals import worker_process_shutdown
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import connection, transaction
+from django.template import Context, Engine
+from backend.ratelimit import get_rate_limiter, mail_buckets
+
+logger = logging.getLogger(__name__)
+
+# Ошибки отправки, после которых celery task оповещения повторяется с экспоненциальной задержкой
+MAIL_ERRORS = (smtplib.SMTPException, ConnectionError, TimeoutError)
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+
+_dispatchers = {}
+_dispatchers_lock = threading.Lock()
+
+
+class MailDispatcher:
+    """
+    Класс для отправки писем через постоянное соединение с почтовым сервером. Соединение открывается при первой
+    отправке и используется всеми задачами процесса celery worker, поэтому рукопожатие SMTP и TLS выполняется один
+    раз, а не для каждого письма. Соединение переоткрывается после MAIL_CONNECTION_MAX_MESSAGES писем (ограничение
+    почтовых провайдеров), проверяется командой NOOP после простоя дольше MAIL_CONNECTION_MAX_IDLE секунд и
+    переоткрывается при разрыве. Методы класса - send, close
+    """
+
+    def __init__(self, backend=None, **kwargs):
+        self.connection = get_connection(backend, fail_silently=False, **kwargs)
+        self.is_open = False
+        self.sent = 0
+        self.last_used = 0
+        self._lock = threading.Lock()
+
+    def _open(self):
+        """
+        Метод для открытия соединения с почтовым сервером
+        """
+        self.connection.open()
+        self.is_open = True
+        self.sent = 0
+
+    def _ensure_open(self):
+        """
+        Метод для проверки соединения перед отправкой. Соединение, отправившее MAIL_CONNECTION_MAX_MESSAGES писем,
+        закрывается, соединение после долгого простоя проверяется командой NOOP
+        """
+        if self.is_open and self.sent >= settings.MAIL_CONNECTION_MAX_MESSAGES:
+            self._close()
+        if self.is_open and time.monotonic() - self.last_used > settings.MAIL_CONNECTION_MAX_IDLE:
+            smtp = getattr(self.connection, 'connection', None)
+            try:
+                if smtp is not None and smtp.noop()[0] != 250:
+                    self._close()
+            except (smtplib.SMTPException, OSError):
+                self._close()
+        if not self.is_open:
+            self._open()
+
+    def _close(self):
+        """
+        Метод для закрытия соединения. Ошибки закрытия разорванного соединения игнорируются
+        """
+        try:
+            self.connection.close()
+        except (smtplib.SMTPException, OSError):
+            pass
+        self.is_open = False
+
+    def send(self, messages):
+        """
+        Метод для отправки списка писем messages через постоянное соединение. При разрыве соединения оно
+        переоткрывается, и отправка продолжается с письма, на котором произошел разрыв. Возвращает количество
+        отправленных писем
+        """
+        count = 0
+        with self._lock:
+            for message in messages:
+                self._ensure_open()
+                try:
+                    count += self.connection.send_messages([message])
+                except (smtplib.SMTPServerDisconnected, ConnectionError):
+                    logger.info('Соединение с почтовым сервером разорвано, повторное подключение')
+                    self._close()
+                    self._open()
+                    count += self.connection.send_messages([message])
+                self.sent += 1
+                self.last_used = time.monotonic()
+        return count
+
+    def close(self):
+        """
+        Метод для закрытия соединения с почтовым сервером
+        """
+        with self._lock:
+            if self.is_open:
+                self._close()
+
+
+def get_dispatcher():
+    """
+    Функция для получения отправителя писем текущего процесса. Отправители кешируются по процессу и почтовому
+    бэкенду, поэтому дочерние процессы celery worker не используют соединение, открытое до fork
+    """
+    key = (os.getpid(), settings.EMAIL_BACKEND, settings.EMAIL_HOST, settings.EMAIL_PORT)
+    with _dispatchers_lock:
+        if key not in _dispatchers:
+            _dispatchers[key] = MailDispatcher()
+        return _dispatchers[key]
+
+
+def message_to_dict(message):
+    """
+    Функция для преобразования письма в словарь, который можно передать в celery task в формате JSON
+    """
+    return {'subject': message.subject, 'body': message.body, 'from_email': message.from_email, 'to': message.to,
+            'cc': message.cc, 'bcc': message.bcc, 'alternatives': [list(item) for item in message.alternatives]}
+
+
+def message_from_dict(data):
+    """
+    Функция для восстановления письма из словаря, полученного функцией message_to_dict
+    """
+    return EmailMultiAlternatives(data['subject'], data['body'], data['from_email'], data['to'], cc=data['cc'],
+                                  bcc=data['bcc'], alternatives=[tuple(item) for item in data['alternatives']])
+
+
+def defer(messages, countdown):
+    """
+    Функция для отправки писем messages отдельным celery task send_email_task через countdown секунд. В транзакции
+    celery task ставится в очередь после ее фиксации, при откате транзакции письма не отправляются
+    """
+    from backend.tasks import send_email_task
+    deferred = partial(send_email_task.apply_async, ([message_to_dict(message) for message in messages],),
+                       countdown=countdown)
+    if connection.in_atomic_block:
+        transaction.on_commit(deferred)
+    else:
+        deferred()
+
+
+def send_messages(messages):
+    """
+    Функция для отправки писем messages через постоянное соединение процесса с учетом ограничения частоты отправки
+    провайдеру и каждому получателю (см. backend.ratelimit). Если до появления токенов нужно ждать не дольше
+    MAIL_RATE_LIMIT_MAX_WAIT секунд, отправка ждет, иначе оставшиеся письма откладываются в celery task
+    send_email_task. В транзакции (например, при выполнении исходящего события) отправка не ждет, чтобы не удерживать
+    блокировки строк, и оставшиеся письма откладываются сразу. Ошибка почтового сервера на первом письме передается
+    вызывающему celery task для повторной попытки с экспоненциальной задержкой, после отправки части писем
+    оставшиеся письма откладываются, чтобы повторная попытка не отправила письма дважды. Возвращает количество
+    отправленных писем
+    """
+    limiter = get_rate_limiter()
+    dispatcher = get_dispatcher()
+    sent = 0
+    for index, message in enumerate(messages):
+        wait = limiter.acquire(mail_buckets(message))
+        while wait:
+            if wait > settings.MAIL_RATE_LIMIT_MAX_WAIT or connection.in_atomic_block:
+                logger.info('Превышена частота отправки писем, отправка отложена на %.1f с', wait)
+                defer(messages[index:], math.ceil(wait))
+                return sent
+            time.sleep(wait)
+            wait = limiter.acquire(mail_buckets(message))
+        try:
+            sent += dispatcher.send([message])
+        except MAIL_ERRORS:
+            if index == 0:
+                raise
+            logger.warning('Ошибка почтового сервера, отправка %s писем отложена', len(messages) - index,
+                           exc_info=True)
+            defer(messages[index:], settings.MAIL_RETRY_DELAY)
+            return sent
+    return sent
+
+
+@worker_process_shutdown.connect
+def close_connections(**kwargs):
+    """
+    Функция для закрытия соединений с почтовым сервером при остановке процесса celery worker
+    """
+    with _dispatchers_lock:
+        dispatchers = [dispatcher for (pid, *_), dispatcher in _dispatchers.items() if pid == os.getpid()]
+    for dispatcher in dispatchers:
+        dispatcher.close()
+
+
+@lru_cache(maxsize=None)
+def get_engine():
+    """
+    Функция для получения движка шаблонов писем. Шаблоны компилируются один раз и кешируются загрузчиком
+    cached.Loader на время жизни процесса celery worker
+    """
+    return Engine(dirs=[TEMPLATES_DIR], loaders=[
+        ('django.template.loaders.cached.Loader', ['django.template.loaders.filesystem.Loader'])])
+
+
+@lru_cache(maxsize=None)
+def get_templates(name, language):
+    """
+    Функция для получения скомпилированных шаблонов письма name на языке language: текстового (первая строка -
+    тема письма) и HTML. Для языка без шаблонов используются шаблоны языка EMAIL_DEFAULT_LANGUAGE
+    """
+    if language not in settings.EMAIL_LANGUAGES:
+        language = settings.EMAIL_DEFAULT_LANGUAGE
+    return (get_engine().get_template(f'backend/email/{language}/{name}.txt'),
+            get_engine().get_template(f'backend/email/{language}/{name}.html'), language)
+
+
+def render_message(name, context, to, language=None):
+    """
+    Функция для формирования письма по шаблону name (см. backend/templates/backend/email) с текстовой и HTML
+    версиями. context - словарь переменных шаблона, to - список адресов, language - язык письма (по умолчанию
+    EMAIL_DEFAULT_LANGUAGE). Экранирование HTML применяется только к HTML-версии
+    """
+    text, html, language = get_templates(name, language or settings.EMAIL_DEFAULT_LANGUAGE)
+    context = dict(context, language=language)
+    subject, _, body = text.render(Context(context, autoescape=False)).strip().partition('\n')
+    message = EmailMultiAlternatives(subject.strip(), body.strip() + '\n', settings.EMAIL_HOST_USER, to)
+    message.attach_alternative(html.render(Context(context)), 'text/html')
+    return message
+
+
+def render_for_users(name, context, users):
+    """
+    Функция для формирования писем по шаблону name пользователям users: по одному письму на каждый язык
+    оповещений пользователей
+    """
+    languages = {}
+    for user in users:
+        language = user.language if user.language in settings.EMAIL_LANGUAGES else settings.EMAIL_DEFAULT_LANGUAGE
+        languages.setdefault(language, []).append(user.email)
+    return [render_message(name, context, emails, language) for language, emails in languages.items()]
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from backend.archive import archive_orders
+
+
+class Command(BaseCommand):
+    """
+    Класс команды для переноса старых доставленных и отмененных заказов в архив
+    """
+    help = 'Переносит доставленные и отмененные заказы старше ORDER_ARCHIVE_AFTER_DAYS дней в файлы архива'
+
+    def add_arguments(self, parser):
+        """
+        Метод для добавления аргументов команды
+        """
+        parser.add_argument('--days', type=int, help='Возраст заказа в днях')
+        parser.add_argument('--batch-size', type=int, help='Количество заказов в пакете')
+
+    def handle(self, *args, **options):
+        """
+        Метод для запуска переноса заказов в архив
+        """
+        archived = archive_orders(days=options['days'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Перенесено заказов: {archived}'))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from backend.provisioning import ProvisioningError, provision_accounts
+
+
+class Command(BaseCommand):
+    """
+    Класс команды для создания пользователей, магазинов продавцов и контактов из CSV-файла
+    """
+    help = 'Создает пользователей, магазины продавцов и контакты из CSV-файла и отправляет токены подтверждения email'
+
+    def add_arguments(self, parser):
+        """
+        Метод для добавления аргументов команды
+        """
+        parser.add_argument('path', help='Путь к CSV-файлу с заголовком')
+        parser.add_argument('--workers', type=int, help='Количество процессов хеширования паролей')
+
+    def handle(self, *args, **options):
+        """
+        Метод для запуска загрузки аккаунтов. При ошибках в файле аккаунты не создаются
+        """
+        with open(options['path'], encoding='utf-8-sig', newline='') as stream:
+            try:
+                created = provision_accounts(stream, workers=options['workers'])
+            except ProvisioningError as error:
+                raise CommandError(f'Аккаунты не созданы:\n{error}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано пользователей: {created["users"]}, магазинов: {created["shops"]}, '
+            f'контактов: {created["contacts"]}'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from backend.models import rebuild_sales
+
+
+class Command(BaseCommand):
+    """
+    Класс команды для полного пересчета сводных таблиц продаж ShopSales и ProductSales по заказам
+    """
+    help = 'Пересчитывает сводные таблицы продаж магазинов и товаров по дням'
+
+    def handle(self, *args, **options):
+        """
+        Метод для запуска пересчета сводных таблиц продаж
+        """
+        shops, products = rebuild_sales()
+        self.stdout.write(self.style.SUCCESS(f'Продажи магазинов: {shops}, продажи товаров: {products}'))
@@ -0,0 +1,39 @@
+from django.db import migrations, models
+from django.db.models import Sum, Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_order_totals(apps, schema_editor):
+    """
+    Функция для заполнения общей суммы и количества позиций существующих заказов
+    """
+    Order = apps.get_model('backend', 'Order')
+    OrderItem = apps.get_model('backend', 'OrderItem')
+    items = OrderItem.objects.filter(order=OuterRef('pk')).order_by().values('order')
+    Order.objects.update(
+        total_sum=Coalesce(Subquery(items.annotate(
+            total=Sum(F('quantity') * F('product_info__price'))).values('total')), 0,
+            output_field=models.PositiveBigIntegerField()),
+        items_count=Coalesce(Subquery(items.annotate(count=Count('id')).values('count')), 0,
+                             output_field=models.PositiveIntegerField()))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='items_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Количество позиций'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='total_sum',
+            field=models.PositiveBigIntegerField(default=0, verbose_name='Сумма заказа'),
+        ),
+        migrations.RunPython(fill_order_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+
+def fill_order_shop(apps, schema_editor):
+    """
+    Функция для заполнения магазина у оформленных заказов по магазину первой позиции заказа
+    """
+    Order = apps.get_model('backend', 'Order')
+    OrderItem = apps.get_model('backend', 'OrderItem')
+    first_item = OrderItem.objects.filter(order=OuterRef('pk')).order_by('id')
+    Order.objects.exclude(status='basket').update(shop=Subquery(first_item.values('product_info__shop')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0002_order_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='shop',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE,
+                                    related_name='orders', to='backend.shop', verbose_name='Магазин'),
+        ),
+        migrations.RunPython(fill_order_shop, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+from django.db import migrations
+from django.db.models import Count, Max, Min, Sum
+
+
+def merge_duplicates(apps, schema_editor):
+    """
+    Функция для объединения дублирующихся записей перед добавлением ограничений уникальности: параметров с
+    одинаковым названием, информации о товаре с одинаковой парой товар-параметр, товаров магазина с одинаковым
+    внешним ИД (остается последний загруженный) и позиций заказа с одинаковым товаром (количество суммируется)
+    """
+    Parameter = apps.get_model('backend', 'Parameter')
+    ProductInf = apps.get_model('backend', 'ProductInf')
+    ShopProduct = apps.get_model('backend', 'ShopProduct')
+    OrderItem = apps.get_model('backend', 'OrderItem')
+
+    for row in Parameter.objects.order_by().values('name').annotate(count=Count('id'), first=Min('id')). \
+            filter(count__gt=1):
+        duplicates = Parameter.objects.filter(name=row['name']).exclude(id=row['first'])
+        ProductInf.objects.filter(parameter__in=duplicates).update(parameter_id=row['first'])
+        duplicates.delete()
+
+    for row in ProductInf.objects.order_by().values('product', 'parameter').annotate(count=Count('id'),
+                                                                                   last=Max('id')). \
+            filter(count__gt=1):
+        ProductInf.objects.filter(product=row['product'], parameter=row['parameter']).exclude(id=row['last']).delete()
+
+    for row in ShopProduct.objects.order_by().values('shop', 'ext_id').annotate(count=Count('id'), last=Max('id')). \
+            filter(count__gt=1):
+        duplicates = ShopProduct.objects.filter(shop=row['shop'], ext_id=row['ext_id']).exclude(id=row['last'])
+        OrderItem.objects.filter(product_info__in=duplicates).update(product_info_id=row['last'])
+        duplicates.delete()
+
+    for row in OrderItem.objects.order_by().values('order', 'product_info').annotate(
+            count=Count('id'), first=Min('id'), total=Sum('quantity')).filter(count__gt=1):
+        OrderItem.objects.filter(id=row['first']).update(quantity=row['total'])
+        OrderItem.objects.filter(order=row['order'], product_info=row['product_info']).exclude(id=row['first']). \
+            delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0003_order_shop'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,67 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0004_merge_duplicates'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='shop',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='orders', to='backend.shop', verbose_name='Магазин'),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='user',
+            field=models.ForeignKey(blank=True, db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='orders', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.AlterField(
+            model_name='orderitem',
+            name='order',
+            field=models.ForeignKey(blank=True, db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='ordered_items', to='backend.order', verbose_name='Заказ'),
+        ),
+        migrations.AlterField(
+            model_name='parameter',
+            name='name',
+            field=models.CharField(max_length=64, unique=True, verbose_name='Название парамметра'),
+        ),
+        migrations.AlterField(
+            model_name='productinf',
+            name='product',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='product_inf', to='backend.product', verbose_name='Товар'),
+        ),
+        migrations.AlterField(
+            model_name='shopproduct',
+            name='shop',
+            field=models.ForeignKey(blank=True, db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='product_in_shop', to='backend.shop', verbose_name='Магазин'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', 'status'], name='order_user_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['shop', 'status'], name='order_shop_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['name', 'model'], name='product_name_model_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='orderitem',
+            constraint=models.UniqueConstraint(fields=('order', 'product_info'), name='unique_order_item'),
+        ),
+        migrations.AddConstraint(
+            model_name='productinf',
+            constraint=models.UniqueConstraint(fields=('product', 'parameter'), name='unique_product_parameter'),
+        ),
+        migrations.AddConstraint(
+            model_name='shopproduct',
+            constraint=models.UniqueConstraint(fields=('shop', 'ext_id'), name='unique_shop_product_ext_id'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+
+def fill_order_item_snapshot(apps, schema_editor):
+    """
+    Функция для заполнения цены, названия товара и магазина в позициях оформленных заказов. Для существующих заказов
+    цена на момент заказа не сохранялась, поэтому используется текущая цена товара
+    """
+    OrderItem = apps.get_model('backend', 'OrderItem')
+    ShopProduct = apps.get_model('backend', 'ShopProduct')
+    product_info = ShopProduct.objects.filter(id=OuterRef('product_info'))
+    OrderItem.objects.exclude(order__status='basket').update(
+        price=Subquery(product_info.values('price')[:1]),
+        product_name=Subquery(product_info.values('product__name')[:1]),
+        shop=Subquery(product_info.values('shop')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0005_indexes_and_constraints'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='price',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Цена на момент заказа'),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='product_name',
+            field=models.CharField(blank=True, max_length=64, verbose_name='Название продукта'),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='shop',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ordered_items', to='backend.shop', verbose_name='Магазин'),
+        ),
+        migrations.RunPython(fill_order_item_snapshot, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,75 @@
+from django.db import migrations, models
+from django.db.models import Count, F, Max, Sum
+from django.db.models.functions import TruncDate
+import django.db.models.deletion
+
+
+def fill_sales(apps, schema_editor):
+    """
+    Функция для заполнения сводных таблиц продаж по существующим заказам. Группировка повторяет shop_sales и
+    product_sales из backend.models на исторических моделях миграции
+    """
+    OrderItem = apps.get_model('backend', 'OrderItem')
+    ShopSales = apps.get_model('backend', 'ShopSales')
+    ProductSales = apps.get_model('backend', 'ProductSales')
+    items = OrderItem.objects.exclude(order__status__in=('basket', 'canceled')).exclude(shop=None).order_by()
+    revenue = Sum(F('quantity') * F('price'))
+    shop_rows = items.values('shop_id', day=TruncDate('order__dt')).annotate(
+        orders_count=Count('order', distinct=True), units=Sum('quantity'), revenue=revenue)
+    ShopSales.objects.bulk_create([ShopSales(**row) for row in shop_rows], batch_size=1000)
+    product_rows = items.values('shop_id', 'product_info_id', day=TruncDate('order__dt')).annotate(
+        name=Max('product_name'), units=Sum('quantity'), revenue=revenue)
+    ProductSales.objects.bulk_create([ProductSales(product_name=row.pop('name'), **row) for row in product_rows],
+                                     batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0006_order_item_snapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShopSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+                ('orders_count', models.IntegerField(default=0, verbose_name='Количество заказов')),
+                ('units', models.IntegerField(default=0, verbose_name='Продано единиц товара')),
+                ('revenue', models.BigIntegerField(default=0, verbose_name='Выручка')),
+                ('shop', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='sales', to='backend.shop', verbose_name='Магазин')),
+            ],
+            options={
+                'verbose_name': 'Продажи магазина за день',
+                'verbose_name_plural': 'Продажи магазинов по дням',
+                'ordering': ('-day',),
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+                ('product_name', models.CharField(blank=True, max_length=64, verbose_name='Название продукта')),
+                ('units', models.IntegerField(default=0, verbose_name='Продано единиц товара')),
+                ('revenue', models.BigIntegerField(default=0, verbose_name='Выручка')),
+                ('product_info', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales', to='backend.shopproduct', verbose_name='Информация о продукте')),
+                ('shop', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='product_sales', to='backend.shop', verbose_name='Магазин')),
+            ],
+            options={
+                'verbose_name': 'Продажи товара за день',
+                'verbose_name_plural': 'Продажи товаров по дням',
+                'ordering': ('-day',),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='shopsales',
+            constraint=models.UniqueConstraint(fields=('shop', 'day'), name='unique_shop_sales_day'),
+        ),
+        migrations.AddConstraint(
+            model_name='productsales',
+            constraint=models.UniqueConstraint(fields=('shop', 'day', 'product_info'), name='unique_product_sales_day'),
+        ),
+        migrations.RunPython(fill_sales, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+from django.conf import settings
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0007_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='id заказа')),
+                ('dt', models.DateTimeField(verbose_name='Дата заказа')),
+                ('status', models.CharField(choices=[('basket', 'В корзине'), ('new', 'Новый'), ('confirmed', 'Подтвержден'), ('assembled', 'Собран'), ('sent', 'Отправлен'), ('delivered', 'Доставлен'), ('canceled', 'Отменен')], max_length=16, verbose_name='Статус заказа')),
+                ('total_sum', models.PositiveBigIntegerField(default=0, verbose_name='Сумма заказа')),
+                ('file', models.CharField(max_length=64, verbose_name='Файл архива')),
+                ('offset', models.BigIntegerField(verbose_name='Смещение блока')),
+                ('length', models.PositiveIntegerField(verbose_name='Размер блока')),
+            ],
+            options={
+                'verbose_name': 'Архивный заказ',
+                'verbose_name_plural': 'Архив заказов',
+                'ordering': ('-dt',),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=django.contrib.postgres.indexes.BrinIndex(fields=['dt'], name='order_dt_brin'),
+        ),
+        migrations.AddField(
+            model_name='archivedorder',
+            name='shop',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_orders', to='backend.shop', verbose_name='Магазин'),
+        ),
+        migrations.AddField(
+            model_name='archivedorder',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_orders', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+    ]
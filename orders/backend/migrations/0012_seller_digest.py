@@ -0,0 +1,37 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0011_order_contact'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shop',
+            name='digest_sent_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Сводка отправлена'),
+        ),
+        migrations.AddField(
+            model_name='shop',
+            name='digest_window',
+            field=models.PositiveIntegerField(default=0, verbose_name='Интервал сводки оповещений, мин'),
+        ),
+        migrations.CreateModel(
+            name='DigestEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('basket', 'В корзине'), ('new', 'Новый'), ('confirmed', 'Подтвержден'), ('assembled', 'Собран'), ('sent', 'Отправлен'), ('delivered', 'Доставлен'), ('canceled', 'Отменен')], max_length=16, verbose_name='Статус заказа')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='digest_events', to='backend.order', verbose_name='Заказ')),
+                ('shop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='digest_events', to='backend.shop', verbose_name='Магазин')),
+            ],
+            options={
+                'verbose_name': 'Оповещение для сводки',
+                'verbose_name_plural': 'Оповещения для сводки',
+                'ordering': ('id',),
+            },
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0012_seller_digest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='language',
+            field=models.CharField(choices=[('ru', 'Русский'), ('en', 'English')], default='ru', max_length=8, verbose_name='Язык оповещений'),
+        ),
+    ]
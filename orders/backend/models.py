@@ -1,4 +1,9 @@
-from django.db import models
+from functools import partial
+from django.db import models, transaction
+from django.db.models import Sum, Count, Max, F, Q, OuterRef, Subquery, Case, When, Prefetch
+from django.db.models.functions import Coalesce, TruncDate
+from django.contrib.postgres.indexes import BrinIndex
+from django.core.serializers.json import DjangoJSONEncoder
 from django.contrib.auth.base_user import BaseUserManager
 from django.contrib.auth.models import AbstractUser
 from django.utils.translation import gettext_lazy as _
@@ -10,6 +15,11 @@ USER_TYPE_CHOICES = (
     ('buyer', 'Покупатель'),
 )
 
+LANGUAGE_CHOICES = (
+    ('ru', 'Русский'),
+    ('en', 'English'),
+)
+
 STATUS_CHOICES = (
     ('basket', 'В корзине'),
     ('new', 'Новый'),
@@ -20,6 +30,18 @@ STATUS_CHOICES = (
     ('canceled', 'Отменен'),
 )
 
+# Допустимые переходы между статусами заказа: статус - кортеж статусов, в которые заказ может перейти. Корзина
+# переходит в статус 'new' только при оформлении заказа покупателем (см. backend.basket)
+STATUS_TRANSITIONS = {
+    'basket': (),
+    'new': ('confirmed', 'canceled'),
+    'confirmed': ('assembled', 'canceled'),
+    'assembled': ('sent', 'canceled'),
+    'sent': ('delivered',),
+    'delivered': (),
+    'canceled': (),
+}
+
 
 class CustomUser(BaseUserManager):
     """
@@ -71,7 +93,7 @@ class User(AbstractUser):
     переназначено на email. Поле type можем быть только одним из значений переменной USER_TYPE_CHOICES
     Поля в модели:
     email - EmailField, company - CharField, position - CharField, username - CharField, - is_active  - BooleanField,
-    type - CharField
+    type - CharField, language - CharField (язык писем-оповещений, одно из значений переменной LANGUAGE_CHOICES)
     """
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = []
@@ -94,6 +116,7 @@ class User(AbstractUser):
                                         'Unselect this instead of deleting accounts.'
                                     ))
     type = models.CharField(verbose_name='Тип пользователя', choices=USER_TYPE_CHOICES, max_length=16, default='buyer')
+    language = models.CharField(verbose_name='Язык оповещений', choices=LANGUAGE_CHOICES, max_length=8, default='ru')
 
     def __str__(self):
         """
@@ -114,14 +137,18 @@ class User(AbstractUser):
 
 class Shop(models.Model):
     """
-    Класс для создания модели магазина. Поля в модели:
-    name - CharField, url - URLField, seller - OneToOneField (User), is_work - BooleanField
+    Класс для создания модели магазина. При ненулевом поле digest_window оповещения продавца о новых заказах и
+    изменениях статуса накапливаются и отправляются одним письмом-сводкой не чаще раза в digest_window минут
+    (см. backend.digest). Поля в модели: name - CharField, url - URLField, seller - OneToOneField (User),
+    is_work - BooleanField, digest_window - PositiveIntegerField, digest_sent_at - DateTimeField
     """
     name = models.CharField(max_length=64, verbose_name='Название магазина', unique=True)
     url = models.URLField(blank=True, null=True, verbose_name='Ссылка')
     seller = models.OneToOneField(User, verbose_name='Продавец', blank=True, null=True,
                                   on_delete=models.CASCADE)
     is_work = models.BooleanField(verbose_name='Доступность', default=True)
+    digest_window = models.PositiveIntegerField(verbose_name='Интервал сводки оповещений, мин', default=0)
+    digest_sent_at = models.DateTimeField(verbose_name='Сводка отправлена', blank=True, null=True)
 
     class Meta:
         """
@@ -191,6 +218,9 @@ class Product(models.Model):
         verbose_name = 'Продукт'
         verbose_name_plural = "Список продуктов"
         ordering = ('-name',)
+        indexes = [
+            models.Index(fields=['name', 'model'], name='product_name_model_idx'),
+        ]
 
     def __str__(self):
         """
@@ -199,6 +229,61 @@ class Product(models.Model):
         return self.name
 
 
+class OutOfStock(Exception):
+    """
+    Исключение, возникающее при недостаточном количестве товара в магазине для оформления заказа. Атрибут
+    product_ids содержит id товаров в магазине, которых не хватает
+    """
+
+    def __init__(self, product_ids):
+        self.product_ids = product_ids
+        super().__init__(f'Недостаточно товаров на складе: {product_ids}')
+
+
+class ShopProductQuerySet(models.QuerySet):
+    """
+    Класс набора товаров в магазине. Методы класса - reserve, release
+    """
+
+    def _lock(self, product_ids):
+        """
+        Метод для блокировки строк товаров одним запросом SELECT ... FOR UPDATE в порядке возрастания id, что
+        исключает взаимные блокировки параллельных оформлений заказов. Возвращает словарь {id: количество на складе}
+        """
+        return dict(self.model.objects.select_for_update().filter(id__in=product_ids).order_by('id').
+                    values_list('id', 'quantity'))
+
+    def _change_quantity(self, quantities, sign):
+        """
+        Метод для изменения количества товаров на складе одним запросом UPDATE
+        """
+        self.model.objects.filter(id__in=quantities).update(quantity=Case(
+            *[When(id=product_id, then=F('quantity') + sign * quantity)
+              for product_id, quantity in quantities.items()]))
+
+    def reserve(self, quantities):
+        """
+        Метод для резервирования товаров при оформлении заказа. quantities - словарь {id товара в магазине:
+        количество}. Строки товаров блокируются, после чего количество на складе уменьшается одним запросом. При
+        нехватке хотя бы одного товара ничего не списывается и возникает исключение OutOfStock
+        """
+        with transaction.atomic():
+            in_stock = self._lock(quantities)
+            shortage = [product_id for product_id, quantity in sorted(quantities.items())
+                        if in_stock.get(product_id, 0) < quantity]
+            if shortage:
+                raise OutOfStock(shortage)
+            self._change_quantity(quantities, -1)
+
+    def release(self, quantities):
+        """
+        Метод для возврата зарезервированных товаров на склад при отмене заказа
+        """
+        with transaction.atomic():
+            self._lock(quantities)
+            self._change_quantity(quantities, 1)
+
+
 class ShopProduct(models.Model):
     """
     Класс для создания модели товаров в конкретном магазине. Поля в модели:
@@ -206,13 +291,14 @@ class ShopProduct(models.Model):
     quantity - PositiveIntegerField, price - PositiveIntegerField, price_rrc - PositiveIntegerField
     """
     shop = models.ForeignKey(Shop, verbose_name='Магазин', related_name='product_in_shop', blank=True,
-                             on_delete=models.CASCADE)
+                             on_delete=models.CASCADE, db_index=False)
     product = models.ForeignKey(Product, verbose_name='Товар', related_name='product_in_shop', blank=True,
                                 on_delete=models.CASCADE)
     ext_id = models.PositiveIntegerField(verbose_name='Внешний ИД')
     quantity = models.PositiveIntegerField(verbose_name='Количество')
     price = models.PositiveIntegerField(verbose_name='Цена')
     price_rrc = models.PositiveIntegerField(verbose_name='Рекомендованная розничная цена')
+    objects = ShopProductQuerySet.as_manager()
 
     class Meta:
         """
@@ -222,6 +308,9 @@ class ShopProduct(models.Model):
         """
         verbose_name = 'Продукт в магазине'
         verbose_name_plural = 'Список продуктов в магазине'
+        constraints = [
+            models.UniqueConstraint(fields=['shop', 'ext_id'], name='unique_shop_product_ext_id'),
+        ]
 
 
 class Parameter(models.Model):
@@ -230,7 +319,7 @@ class Parameter(models.Model):
     name - CharField
     """
 
-    name = models.CharField(max_length=64, verbose_name='Название парамметра')
+    name = models.CharField(max_length=64, verbose_name='Название парамметра', unique=True)
 
     class Meta:
         """
@@ -255,7 +344,7 @@ class ProductInf(models.Model):
         product - ForeignKey(Product), parameter - ForeignKey(Parameter), value - CharField
     """
     product = models.ForeignKey(Product, verbose_name='Товар', related_name='product_inf', blank=True,
-                                null=True, on_delete=models.CASCADE)
+                                null=True, on_delete=models.CASCADE, db_index=False)
     parameter = models.ForeignKey(Parameter, verbose_name='Параметр', related_name='product_inf', blank=True,
                                   on_delete=models.CASCADE)
     value = models.CharField(max_length=128, blank=True, verbose_name='Значение')
@@ -268,6 +357,9 @@ class ProductInf(models.Model):
         """
         verbose_name = 'Информация о продукте'
         verbose_name_plural = 'Информацмя о продуктах'
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'parameter'], name='unique_product_parameter'),
+        ]
 
 
 class Contact(models.Model):
@@ -298,15 +390,130 @@ class Contact(models.Model):
         verbose_name_plural = "Список контактов пользователя"
 
 
+class OrderQuerySet(models.QuerySet):
+    """
+    Класс набора заказов. Методы класса - recalculate_totals, snapshot_prices, item_quantities, transition, cancel,
+    with_item_details, update_sales
+    """
+
+    def with_item_details(self):
+        """
+        Метод для загрузки позиций заказов вместе с товаром, магазином, продавцом, категорией и параметрами товара
+        фиксированным числом запросов, независимо от количества заказов и позиций
+        """
+        return self.prefetch_related(Prefetch('ordered_items', queryset=OrderItem.objects.select_related(
+            'product_info__shop__seller', 'product_info__product__category').prefetch_related(
+            'product_info__product__product_inf__parameter')))
+
+    def item_quantities(self):
+        """
+        Метод для получения словаря {id товара в магазине: количество} по всем позициям выбранных заказов
+        """
+        return dict(OrderItem.objects.filter(order__in=self).order_by().values('product_info_id').
+                    annotate(total=Sum('quantity')).values_list('product_info_id', 'total'))
+
+    def transition(self, status, versions=None):
+        """
+        Метод для изменения статуса выбранных заказов на status с учетом допустимых переходов STATUS_TRANSITIONS.
+        Заказы, для которых переход недопустим, пропускаются. Строки заказов блокируются, после чего статус меняется
+        одним условным запросом UPDATE, версия заказа при этом увеличивается на 1. versions - словарь
+        {id заказа: версия}, которую видел пользователь (compare-and-set): заказ, измененный другим пользователем
+        после чтения версии, пропускается. При отмене заказов зарезервированные товары возвращаются на склад. После
+        фиксации транзакции покупателям и продавцам отправляется событие об изменении статуса. Возвращает список id
+        заказов, статус которых изменен
+        """
+        from backend.events import publish_order_status
+        sources = [source for source, targets in STATUS_TRANSITIONS.items() if status in targets]
+        candidates = self.filter(status__in=sources)
+        if versions is not None:
+            condition = Q(pk__in=[])
+            for order_id, version in versions.items():
+                condition |= Q(id=order_id, version=version)
+            candidates = candidates.filter(condition)
+        with transaction.atomic():
+            order_ids = list(candidates.select_for_update(of=('self',)).order_by('id').values_list('id', flat=True))
+            if order_ids:
+                orders = Order.objects.filter(id__in=order_ids)
+                orders.update(status=status, version=F('version') + 1)
+                if status == 'canceled':
+                    quantities = orders.item_quantities()
+                    if quantities:
+                        ShopProduct.objects.release(quantities)
+                    orders.update_sales(-1)
+                transaction.on_commit(partial(publish_order_status, order_ids, status))
+        return order_ids
+
+    def cancel(self):
+        """
+        Метод для отмены выбранных заказов с возвратом зарезервированных товаров на склад. Заказы в корзине и уже
+        отмененные заказы пропускаются, поэтому повторная отмена не возвращает товары дважды.
+        Возвращает количество отмененных заказов
+        """
+        return len(self.transition('canceled'))
+
+    def update_sales(self, sign=1):
+        """
+        Метод для инкрементального обновления сводных таблиц продаж ShopSales и ProductSales по позициям выбранных
+        заказов. sign=1 добавляет продажи оформленных заказов, sign=-1 вычитает продажи отмененных заказов
+        """
+        items = OrderItem.objects.filter(order__in=self)
+        with transaction.atomic():
+            for model, rows in ((ShopSales, shop_sales(items)), (ProductSales, product_sales(items))):
+                for row in rows:
+                    keys = {key: row.pop(key) for key in model.rollup_keys}
+                    defaults = {'product_name': row.pop('product_name')} if 'product_name' in row else {}
+                    model.objects.get_or_create(**keys, defaults=defaults)
+                    model.objects.filter(**keys).update(**{field: F(field) + sign * value
+                                                           for field, value in row.items()})
+
+    def snapshot_prices(self):
+        """
+        Метод для копирования цены, названия товара и магазина в позиции выбранных заказов одним запросом UPDATE
+        """
+        product_info = ShopProduct.objects.filter(id=OuterRef('product_info'))
+        OrderItem.objects.filter(order__in=self).update(
+            price=Subquery(product_info.values('price')[:1]),
+            product_name=Subquery(product_info.values('product__name')[:1]),
+            shop=Subquery(product_info.values('shop')[:1]))
+
+    def recalculate_totals(self):
+        """
+        Метод для пересчета общей суммы и количества позиций выбранных заказов одним запросом UPDATE. Для позиций
+        оформленных заказов используется цена на момент заказа, для позиций корзины - текущая цена товара.
+        Возвращает количество обновленных заказов
+        """
+        items = OrderItem.objects.filter(order=OuterRef('pk')).order_by().values('order')
+        return self.update(
+            total_sum=Coalesce(Subquery(items.annotate(
+                total=Sum(F('quantity') * Coalesce('price', 'product_info__price'))).values('total')), 0,
+                output_field=models.PositiveBigIntegerField()),
+            items_count=Coalesce(Subquery(items.annotate(count=Count('id')).values('count')), 0,
+                                 output_field=models.PositiveIntegerField()))
+
+
 class Order(models.Model):
     """
     Класс для создания модели заказов. Поле status принимает только значения из перемененной STATUS_CHOICES.
-    Поля в модели: user - ForeignKey(User), dt - DateTimeField, status - CharField
+    Поля total_sum и items_count хранят общую сумму и количество позиций заказа и пересчитываются методом
+    recalculate_totals при изменении позиций заказа или цен товаров. При оформлении корзина разделяется на заказы по
+    магазинам, магазин заказа хранится в поле shop (у корзины поле не заполнено). Поле version увеличивается при
+    каждом изменении статуса и используется для обнаружения одновременных изменений (см. OrderQuerySet.transition).
+    Поля в модели: user - ForeignKey(User), shop - ForeignKey(Shop), dt - DateTimeField, status - CharField,
+    total_sum - PositiveBigIntegerField, items_count - PositiveIntegerField, version - PositiveIntegerField,
+    contact - ForeignKey(Contact) (контакт для доставки оптового заказа)
     """
     user = models.ForeignKey(User, verbose_name='Пользователь', related_name='orders',
-                             blank=True, on_delete=models.CASCADE)
+                             blank=True, on_delete=models.CASCADE, db_index=False)
+    shop = models.ForeignKey(Shop, verbose_name='Магазин', related_name='orders', blank=True, null=True,
+                             on_delete=models.CASCADE, db_index=False)
     dt = models.DateTimeField(auto_now_add=True, verbose_name="Дата заказа")
     status = models.CharField(verbose_name='Статус заказа', choices=STATUS_CHOICES, max_length=16)
+    total_sum = models.PositiveBigIntegerField(verbose_name='Сумма заказа', default=0)
+    items_count = models.PositiveIntegerField(verbose_name='Количество позиций', default=0)
+    version = models.PositiveIntegerField(verbose_name='Версия', default=0)
+    contact = models.ForeignKey(Contact, verbose_name='Контакт', related_name='orders', blank=True, null=True,
+                                on_delete=models.SET_NULL)
+    objects = OrderQuerySet.as_manager()
 
     class Meta:
         """
@@ -317,6 +524,11 @@ class Order(models.Model):
         verbose_name = 'Заказ'
         verbose_name_plural = 'Список заказов'
         ordering = ('-dt',)
+        indexes = [
+            models.Index(fields=['user', 'status'], name='order_user_status_idx'),
+            models.Index(fields=['shop', 'status'], name='order_shop_status_idx'),
+            BrinIndex(fields=['dt'], name='order_dt_brin'),
+        ]
 
     def __str__(self):
         """
@@ -327,14 +539,21 @@ class Order(models.Model):
 
 class OrderItem(models.Model):
     """
-    Класс для создания модели товаров в заказе.
-    Поля в модели: order - ForeignKey(Order), product_info - ForeignKey(ShopProduct), quantity - PositiveIntegerField
+    Класс для создания модели товаров в заказе. При оформлении заказа в позицию копируются цена товара, его название и
+    магазин, поэтому сумма оформленного заказа не меняется при обновлении прайса магазина. У позиций корзины эти поля
+    не заполнены.
+    Поля в модели: order - ForeignKey(Order), product_info - ForeignKey(ShopProduct), quantity - PositiveIntegerField,
+    price - PositiveIntegerField, product_name - CharField, shop - ForeignKey(Shop)
     """
     order = models.ForeignKey(Order, verbose_name='Заказ', related_name='ordered_items', blank=True,
-                              on_delete=models.CASCADE)
+                              on_delete=models.CASCADE, db_index=False)
     product_info = models.ForeignKey(ShopProduct, verbose_name='Информация о продукте', related_name='ordered_items',
                                      on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(verbose_name='Количество')
+    price = models.PositiveIntegerField(verbose_name='Цена на момент заказа', blank=True, null=True)
+    product_name = models.CharField(max_length=64, verbose_name='Название продукта', blank=True)
+    shop = models.ForeignKey(Shop, verbose_name='Магазин', related_name='ordered_items', blank=True, null=True,
+                             on_delete=models.SET_NULL)
 
     class Meta:
         """
@@ -344,6 +563,9 @@ class OrderItem(models.Model):
         """
         verbose_name = 'Заказанная позиция'
         verbose_name_plural = 'Список заказанных позиций'
+        constraints = [
+            models.UniqueConstraint(fields=['order', 'product_info'], name='unique_order_item'),
+        ]
 
     def get_product_info(self):
         """
@@ -352,6 +574,189 @@ class OrderItem(models.Model):
         return "\n".join([self.product_info.product.name])
 
 
+def shop_sales(items):
+    """
+    Функция для группировки позиций заказов items по магазину и дню заказа. Возвращает набор словарей с ключами
+    shop_id, day, orders_count, units, revenue
+    """
+    return items.exclude(shop=None).order_by().values('shop_id', day=TruncDate('order__dt')).annotate(
+        orders_count=Count('order', distinct=True), units=Sum('quantity'), revenue=Sum(F('quantity') * F('price')))
+
+
+def product_sales(items):
+    """
+    Функция для группировки позиций заказов items по магазину, товару и дню заказа. Возвращает набор словарей с
+    ключами shop_id, product_info_id, day, product_name, units, revenue
+    """
+    rows = list(items.exclude(shop=None).order_by().values(
+        'shop_id', 'product_info_id', day=TruncDate('order__dt')).annotate(
+        name=Max('product_name'), units=Sum('quantity'), revenue=Sum(F('quantity') * F('price'))))
+    for row in rows:
+        row['product_name'] = row.pop('name')
+    return rows
+
+
+class ShopSales(models.Model):
+    """
+    Класс для создания сводной таблицы продаж магазина по дням. Таблица обновляется при оформлении и отмене заказов
+    методом OrderQuerySet.update_sales и может быть пересчитана командой rebuild_sales.
+    Поля в модели: shop - ForeignKey(Shop), day - DateField, orders_count - IntegerField, units - IntegerField,
+    revenue - BigIntegerField
+    """
+    rollup_keys = ('shop_id', 'day')
+
+    shop = models.ForeignKey(Shop, verbose_name='Магазин', related_name='sales', on_delete=models.CASCADE,
+                             db_index=False)
+    day = models.DateField(verbose_name='День')
+    orders_count = models.IntegerField(verbose_name='Количество заказов', default=0)
+    units = models.IntegerField(verbose_name='Продано единиц товара', default=0)
+    revenue = models.BigIntegerField(verbose_name='Выручка', default=0)
+
+    class Meta:
+        """
+        Класс для корректного отображения модели в админке django.
+        Отвечает за название модели в единственном и множественном числе, а так же за стандартную сортировку
+        продаж в админке django
+        """
+        verbose_name = 'Продажи магазина за день'
+        verbose_name_plural = 'Продажи магазинов по дням'
+        ordering = ('-day',)
+        constraints = [
+            models.UniqueConstraint(fields=['shop', 'day'], name='unique_shop_sales_day'),
+        ]
+
+
+class ProductSales(models.Model):
+    """
+    Класс для создания сводной таблицы продаж товаров магазина по дням. Таблица обновляется при оформлении и отмене
+    заказов методом OrderQuerySet.update_sales и может быть пересчитана командой rebuild_sales.
+    Поля в модели: shop - ForeignKey(Shop), product_info - ForeignKey(ShopProduct), day - DateField,
+    product_name - CharField, units - IntegerField, revenue - BigIntegerField
+    """
+    rollup_keys = ('shop_id', 'product_info_id', 'day')
+
+    shop = models.ForeignKey(Shop, verbose_name='Магазин', related_name='product_sales', on_delete=models.CASCADE,
+                             db_index=False)
+    product_info = models.ForeignKey(ShopProduct, verbose_name='Информация о продукте', related_name='sales',
+                                     on_delete=models.CASCADE)
+    day = models.DateField(verbose_name='День')
+    product_name = models.CharField(max_length=64, verbose_name='Название продукта', blank=True)
+    units = models.IntegerField(verbose_name='Продано единиц товара', default=0)
+    revenue = models.BigIntegerField(verbose_name='Выручка', default=0)
+
+    class Meta:
+        """
+        Класс для корректного отображения модели в админке django.
+        Отвечает за название модели в единственном и множественном числе, а так же за стандартную сортировку
+        продаж в админке django
+        """
+        verbose_name = 'Продажи товара за день'
+        verbose_name_plural = 'Продажи товаров по дням'
+        ordering = ('-day',)
+        constraints = [
+            models.UniqueConstraint(fields=['shop', 'day', 'product_info'], name='unique_product_sales_day'),
+        ]
+
+
+def rebuild_sales():
+    """
+    Функция для полного пересчета сводных таблиц продаж ShopSales и ProductSales по оформленным и не отмененным
+    заказам. Возвращает количество строк в таблицах ShopSales и ProductSales
+    """
+    items = OrderItem.objects.exclude(order__status__in=('basket', 'canceled'))
+    with transaction.atomic():
+        ShopSales.objects.all().delete()
+        ProductSales.objects.all().delete()
+        shops = ShopSales.objects.bulk_create([ShopSales(**row) for row in shop_sales(items)], batch_size=1000)
+        products = ProductSales.objects.bulk_create([ProductSales(**row) for row in product_sales(items)],
+                                                    batch_size=1000)
+    return len(shops), len(products)
+
+
+class ArchivedOrder(models.Model):
+    """
+    Класс для создания модели указателя на заказ, перенесенный в архив. Архив - файлы orders-ГГГГ-ММ.jsonl.gz в
+    каталоге ORDER_ARCHIVE_ROOT по месяцу заказа, состоящие из сжатых блоков. Поля offset и length указывают на блок
+    файла, содержащий заказ, поэтому для поиска заказа по id распаковывается только этот блок.
+    Поля в модели: id - BigIntegerField (id заказа), user - ForeignKey(User), shop - ForeignKey(Shop),
+    dt - DateTimeField, status - CharField, total_sum - PositiveBigIntegerField, file - CharField,
+    offset - BigIntegerField, length - PositiveIntegerField
+    """
+    id = models.BigIntegerField(primary_key=True, verbose_name='id заказа')
+    user = models.ForeignKey(User, verbose_name='Пользователь', related_name='archived_orders',
+                             on_delete=models.CASCADE)
+    shop = models.ForeignKey(Shop, verbose_name='Магазин', related_name='archived_orders', blank=True, null=True,
+                             on_delete=models.SET_NULL)
+    dt = models.DateTimeField(verbose_name="Дата заказа")
+    status = models.CharField(verbose_name='Статус заказа', choices=STATUS_CHOICES, max_length=16)
+    total_sum = models.PositiveBigIntegerField(verbose_name='Сумма заказа', default=0)
+    file = models.CharField(max_length=64, verbose_name='Файл архива')
+    offset = models.BigIntegerField(verbose_name='Смещение блока')
+    length = models.PositiveIntegerField(verbose_name='Размер блока')
+
+    class Meta:
+        """
+        Класс для корректного отображения модели в админке django.
+        Отвечает за название модели в единственном и множественном числе, а так же за стандартную сортировку
+        заказов в админке django
+        """
+        verbose_name = 'Архивный заказ'
+        verbose_name_plural = 'Архив заказов'
+        ordering = ('-dt',)
+
+
+class OutboxEvent(models.Model):
+    """
+    Класс для создания модели исходящего события (transactional outbox). Событие записывается в одной транзакции с
+    изменением заказа и передается в celery пакетами задачей relay_outbox_task, поэтому время ответа не зависит от
+    брокера, а при откате транзакции оповещение не отправляется.
+    Поля в модели: task - CharField (имя celery task), kwargs - JSONField (аргументы celery task),
+    created_at - DateTimeField, sent_at - DateTimeField (передано в celery), processed_at - DateTimeField (выполнено),
+    attempts - PositiveIntegerField (количество передач в celery)
+    """
+    task = models.CharField(max_length=128, verbose_name='Celery task')
+    kwargs = models.JSONField(verbose_name='Аргументы', default=dict, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Создано')
+    sent_at = models.DateTimeField(verbose_name='Передано в очередь', blank=True, null=True)
+    processed_at = models.DateTimeField(verbose_name='Выполнено', blank=True, null=True)
+    attempts = models.PositiveIntegerField(verbose_name='Передано раз', default=0)
+
+    class Meta:
+        """
+        Класс для корректного отображения модели в админке django.
+        Отвечает за название модели в единственном и множественном числе, а так же за стандартную сортировку
+        событий в админке django
+        """
+        verbose_name = 'Исходящее событие'
+        verbose_name_plural = 'Исходящие события'
+        ordering = ('id',)
+        indexes = [
+            models.Index(fields=['sent_at'], condition=Q(processed_at__isnull=True), name='outbox_unprocessed_idx'),
+        ]
+
+
+class DigestEvent(models.Model):
+    """
+    Класс для создания модели накопленного оповещения продавца для сводки. Поле status - статус заказа на момент
+    события, для нового заказа - 'new'.
+    Поля в модели: shop - ForeignKey(Shop), order - ForeignKey(Order), status - CharField, created_at - DateTimeField
+    """
+    shop = models.ForeignKey(Shop, verbose_name='Магазин', related_name='digest_events', on_delete=models.CASCADE)
+    order = models.ForeignKey(Order, verbose_name='Заказ', related_name='digest_events', on_delete=models.CASCADE)
+    status = models.CharField(verbose_name='Статус заказа', choices=STATUS_CHOICES, max_length=16)
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Создано')
+
+    class Meta:
+        """
+        Класс для корректного отображения модели в админке django.
+        Отвечает за название модели в единственном и множественном числе, а так же за стандартную сортировку
+        оповещений в админке django
+        """
+        verbose_name = 'Оповещение для сводки'
+        verbose_name_plural = 'Оповещения для сводки'
+        ordering = ('id',)
+
+
 class ShopFiles(models.Model):
     """
     Класс для создания модели для работы с файлами прайсов магазина.
@@ -0,0 +1,68 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from backend.models import OutboxEvent
+
+
+def enqueue(task, **kwargs):
+    """
+    Функция для записи вызова celery task task с аргументами kwargs в таблицу исходящих событий. Вызывается в
+    транзакции изменения заказа: при откате транзакции событие не сохраняется и celery task не выполняется
+    """
+    return OutboxEvent.objects.create(task=task.name, kwargs=kwargs)
+
+
+def relay(batch_size=None):
+    """
+    Функция для передачи невыполненных исходящих событий в celery пакетами по batch_size (по умолчанию
+    OUTBOX_BATCH_SIZE). Передаются неотправленные события и события, переданные раньше OUTBOX_VISIBILITY_TIMEOUT
+    секунд назад, но так и не выполненные (celery task завершился ошибкой после всех повторов или процесс celery
+    worker остановился). Событие передается не более OUTBOX_MAX_ATTEMPTS раз, после чего остается в таблице для
+    разбора вручную. Строки событий блокируются, заблокированные другим процессом события пропускаются, поэтому
+    несколько одновременно запущенных relay не передают одно событие дважды. Возвращает количество переданных
+    событий
+    """
+    from backend.tasks import process_outbox_event_task
+    batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+    relayed = 0
+    while True:
+        now = timezone.now()
+        with transaction.atomic():
+            event_ids = list(OutboxEvent.objects.select_for_update(skip_locked=True).filter(
+                Q(sent_at__isnull=True) | Q(sent_at__lt=now - timedelta(seconds=settings.OUTBOX_VISIBILITY_TIMEOUT)),
+                processed_at__isnull=True, attempts__lt=settings.OUTBOX_MAX_ATTEMPTS,
+            ).order_by('id').values_list('id', flat=True)[:batch_size])
+            if not event_ids:
+                return relayed
+            for event_id in event_ids:
+                process_outbox_event_task.delay(event_id)
+            OutboxEvent.objects.filter(id__in=event_ids).update(sent_at=now, attempts=F('attempts') + 1)
+        relayed += len(event_ids)
+
+
+def process(event_id):
+    """
+    Функция для выполнения celery task исходящего события. Строка события блокируется до конца выполнения, а
+    выполненное событие помечается полем processed_at, поэтому повторно переданное событие не выполняется дважды.
+    Возвращает True, если событие выполнено
+    """
+    from orders.celery import app
+    with transaction.atomic():
+        event = OutboxEvent.objects.select_for_update().filter(id=event_id, processed_at__isnull=True).first()
+        if event is None:
+            return False
+        app.tasks[event.task](**event.kwargs)
+        event.processed_at = timezone.now()
+        event.save(update_fields=['processed_at'])
+    return True
+
+
+def purge(days=None):
+    """
+    Функция для удаления выполненных исходящих событий старше days дней (по умолчанию OUTBOX_RETENTION_DAYS).
+    Возвращает количество удаленных событий
+    """
+    before = timezone.now() - timedelta(days=settings.OUTBOX_RETENTION_DAYS if days is None else days)
+    return OutboxEvent.objects.filter(processed_at__lt=before).delete()[0]
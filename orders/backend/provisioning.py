@@ -0,0 +1,149 @@
+import csv
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.password_validation import validate_password
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from backend.models import User, Shop, Contact, ConfirmEmailToken
+
+USER_FIELDS = ('email', 'first_name', 'last_name', 'company', 'position', 'type', 'language')
+CONTACT_FIELDS = ('country', 'region', 'zip', 'city', 'street', 'house', 'building', 'apartment', 'phone')
+OPTIONAL_CONTACT_FIELDS = ('house', 'building', 'apartment')
+
+
+class ProvisioningError(Exception):
+    """
+    Класс ошибки загрузки аккаунтов. Атрибут errors - список строк с номером строки файла и описанием ошибки
+    """
+
+    def __init__(self, errors):
+        super().__init__('\n'.join(errors))
+        self.errors = errors
+
+
+def _messages(error):
+    """
+    Функция для преобразования ValidationError в список строк вида 'поле: ошибка'
+    """
+    if hasattr(error, 'message_dict'):
+        return [f'{field}: {message}' for field, messages in error.message_dict.items() for message in messages]
+    return list(error.messages)
+
+
+def _duplicates(values, existing, message):
+    """
+    Функция для поиска повторяющихся значений. values - словарь значение - список номеров строк, existing -
+    значения, уже имеющиеся в базе данных. Возвращает список кортежей (номер строки, ошибка)
+    """
+    errors = []
+    for value, lines in values.items():
+        if value in existing:
+            errors += [(line, f'{message} {value} уже существует') for line in lines]
+        else:
+            errors += [(line, f'{message} {value} повторяется в файле') for line in lines[1:]]
+    return errors
+
+
+def parse_accounts(stream):
+    """
+    Функция для чтения и проверки аккаунтов из CSV-файла stream с заголовком. Колонки пользователя - email,
+    password, first_name, last_name, company, position, type, language; магазина продавца - shop, shop_url;
+    контакта - country, region, zip, city, street, house, building, apartment, phone (контакт создается, если
+    заполнена хотя бы одна из его колонок). Данные проверяются валидаторами полей моделей и validate_password,
+    уникальность email и названий магазинов проверяется одним запросом для всего файла. Возвращает список кортежей
+    (пользователь, пароль, магазин или None, контакт или None), при ошибках вызывает ProvisioningError
+    """
+    errors, accounts = [], []
+    emails, shop_names = {}, {}
+    for line, row in enumerate(csv.DictReader(stream), start=2):
+        row = {key.strip(): (value or '').strip() for key, value in row.items() if key}
+        user = User(**{field: row[field] for field in USER_FIELDS if row.get(field)}, is_active=False)
+        user.email = User.objects.normalize_email(user.email)
+        user.username = user.email
+        shop = contact = None
+        row_errors = []
+        try:
+            user.full_clean(exclude=['password'], validate_unique=False)
+        except ValidationError as error:
+            row_errors += _messages(error)
+        try:
+            validate_password(row.get('password', ''), user)
+        except ValidationError as error:
+            row_errors += [f'password: {message}' for message in error.messages]
+        if row.get('shop'):
+            if user.type != 'seller':
+                row_errors.append('shop: магазин можно указать только для продавца')
+            shop = Shop(name=row['shop'], url=row.get('shop_url') or None)
+            try:
+                shop.full_clean(exclude=['seller'], validate_unique=False)
+            except ValidationError as error:
+                row_errors += _messages(error)
+            shop_names.setdefault(shop.name, []).append(line)
+        if any(row.get(field) for field in CONTACT_FIELDS):
+            contact = Contact(**{field: row.get(field) or None for field in CONTACT_FIELDS})
+            try:
+                contact.full_clean(exclude=['user', *[field for field in OPTIONAL_CONTACT_FIELDS
+                                                      if not row.get(field)]])
+            except ValidationError as error:
+                row_errors += _messages(error)
+        emails.setdefault(user.email, []).append(line)
+        errors += [(line, message) for message in row_errors]
+        accounts.append((user, row.get('password', ''), shop, contact))
+    errors += _duplicates(emails, set(User.objects.filter(email__in=list(emails)).values_list('email', flat=True)),
+                          'email: пользователь')
+    errors += _duplicates(shop_names, set(Shop.objects.filter(name__in=list(shop_names)).values_list('name',
+                                                                                                     flat=True)),
+                          'shop: магазин')
+    if errors:
+        raise ProvisioningError([f'Строка {line}: {message}' for line, message in sorted(errors)])
+    return accounts
+
+
+def hash_passwords(passwords, workers=None):
+    """
+    Функция для хеширования паролей passwords в workers процессах (по умолчанию PROVISION_HASH_WORKERS).
+    Хеширование намеренно медленное и занимает процессор, поэтому выполняется параллельно в отдельных процессах.
+    Возвращает список хешей в порядке паролей
+    """
+    workers = workers or settings.PROVISION_HASH_WORKERS
+    if workers <= 1 or len(passwords) <= 1:
+        return [make_password(password) for password in passwords]
+    with ProcessPoolExecutor(max_workers=min(workers, len(passwords))) as executor:
+        return list(executor.map(make_password, passwords, chunksize=max(1, len(passwords) // (workers * 4))))
+
+
+def provision_accounts(stream, workers=None):
+    """
+    Функция для создания пользователей, магазинов продавцов и контактов из CSV-файла stream (см. parse_accounts).
+    Пароли хешируются параллельно функцией hash_passwords, записи создаются в одной транзакции вставками пакетами
+    по PROVISION_BATCH_SIZE. Пользователи создаются неактивными, токены подтверждения email отправляются после
+    фиксации транзакции одним celery task new_users_registered_task. Возвращает словарь с количеством созданных
+    записей, при ошибках вызывает ProvisioningError
+    """
+    from backend.tasks import new_users_registered_task
+    accounts = parse_accounts(stream)
+    for (user, _, _, _), password in zip(accounts, hash_passwords([account[1] for account in accounts], workers)):
+        user.password = password
+    batch_size = settings.PROVISION_BATCH_SIZE
+    try:
+        with transaction.atomic():
+            users = User.objects.bulk_create([account[0] for account in accounts], batch_size=batch_size)
+            shops, contacts = [], []
+            for user, _, shop, contact in accounts:
+                if shop is not None:
+                    shop.seller = user
+                    shops.append(shop)
+                if contact is not None:
+                    contact.user = user
+                    contacts.append(contact)
+            Shop.objects.bulk_create(shops, batch_size=batch_size)
+            Contact.objects.bulk_create(contacts, batch_size=batch_size)
+            ConfirmEmailToken.objects.bulk_create([ConfirmEmailToken(user=user, key=ConfirmEmailToken.generate_key())
+                                                   for user in users], batch_size=batch_size)
+            user_ids = [user.id for user in users]
+            transaction.on_commit(partial(new_users_registered_task.delay, user_ids))
+    except IntegrityError as error:
+        raise ProvisioningError([f'Ошибка сохранения: {error}'])
+    return {'users': len(users), 'shops': len(shops), 'contacts': len(contacts)}
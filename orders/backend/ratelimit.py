@@ -0,0 +1,122 @@
+import math
+import threading
+import time
+from django.conf import settings
+from backend.redis_store import get_redis
+
+_limiters = {}
+
+# KEYS - ключи корзин токенов, ARGV - пары (емкость, скорость пополнения в токенах в секунду) для каждого ключа.
+# Токен списывается из всех корзин, только если он есть в каждой из них. Возвращает время ожидания в секундах
+# (0, если токены списаны). Время берется с сервера Redis, поэтому не зависит от часов celery worker
+TOKEN_BUCKET_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local wait = 0
+local levels = {}
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[2 * i - 1])
+    local rate = tonumber(ARGV[2 * i])
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    levels[i] = tokens
+    if tokens < 1 then
+        wait = math.max(wait, (1 - tokens) / rate)
+    end
+end
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[2 * i - 1])
+    local rate = tonumber(ARGV[2 * i])
+    local tokens = levels[i]
+    if wait == 0 then
+        tokens = tokens - 1
+    end
+    redis.call('HSET', key, 'tokens', tostring(tokens), 'ts', tostring(now))
+    redis.call('EXPIRE', key, math.ceil(capacity / rate) + 1)
+end
+return tostring(wait)
+"""
+
+
+class InMemoryTokenBucket:
+    """
+    Класс ограничителя частоты отправки на основе корзин токенов, хранящихся в InMemoryRedis. Используется в тестах
+    и при локальной разработке, когда в настройке REDIS_URL указано значение 'memory://'. Повторяет алгоритм
+    TOKEN_BUCKET_SCRIPT. Методы класса - acquire
+    """
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self._lock = threading.Lock()
+
+    def acquire(self, buckets):
+        """
+        Метод для списания токена из каждой корзины buckets - списка кортежей (ключ, емкость, скорость пополнения в
+        токенах в секунду). Токены списываются, только если они есть во всех корзинах. Возвращает время ожидания в
+        секундах до появления токенов (0, если токены списаны)
+        """
+        redis = get_redis()
+        with self._lock:
+            now = self.clock()
+            wait = 0
+            levels = []
+            for key, capacity, rate in buckets:
+                state = redis.hgetall(key)
+                tokens = float(state.get('tokens', capacity))
+                updated = float(state.get('ts', now))
+                tokens = min(capacity, tokens + max(0, now - updated) * rate)
+                levels.append(tokens)
+                if tokens < 1:
+                    wait = max(wait, (1 - tokens) / rate)
+            for (key, capacity, rate), tokens in zip(buckets, levels):
+                redis.hset(key, mapping={'tokens': tokens if wait else tokens - 1, 'ts': now})
+                redis.expire(key, math.ceil(capacity / rate) + 1)
+            return wait
+
+
+class RedisTokenBucket:
+    """
+    Класс ограничителя частоты отправки на основе корзин токенов в Redis. Проверка и списание токенов выполняются
+    атомарно скриптом TOKEN_BUCKET_SCRIPT, поэтому ограничение общее для всех процессов celery worker. Методы
+    класса - acquire
+    """
+
+    def __init__(self):
+        self.script = get_redis().register_script(TOKEN_BUCKET_SCRIPT)
+
+    def acquire(self, buckets):
+        """
+        Метод для списания токена из каждой корзины buckets (см. InMemoryTokenBucket.acquire). Возвращает время
+        ожидания в секундах до появления токенов (0, если токены списаны)
+        """
+        args = []
+        for _, capacity, rate in buckets:
+            args += [capacity, rate]
+        return float(self.script(keys=[key for key, _, _ in buckets], args=args))
+
+
+def get_rate_limiter():
+    """
+    Функция для получения ограничителя частоты отправки по адресу из настройки REDIS_URL. Для адреса 'memory://'
+    возвращается экземпляр InMemoryTokenBucket. Ограничители кешируются на уровне процесса
+    """
+    url = settings.REDIS_URL
+    if url not in _limiters:
+        _limiters[url] = InMemoryTokenBucket() if url.startswith('memory://') else RedisTokenBucket()
+    return _limiters[url]
+
+
+def mail_buckets(message):
+    """
+    Функция для получения корзин токенов письма message: общей корзины почтового провайдера (EMAIL_HOST) с лимитом
+    MAIL_PROVIDER_RATE_LIMIT и корзины каждого получателя у этого провайдера с лимитом MAIL_RECIPIENT_RATE_LIMIT
+    """
+    provider = settings.MAIL_PROVIDER_RATE_LIMIT
+    recipient = settings.MAIL_RECIPIENT_RATE_LIMIT
+    buckets = [(f'ratelimit:mail:{settings.EMAIL_HOST}', provider['capacity'], provider['per_second'])]
+    for address in sorted(set(message.recipients())):
+        buckets.append((f'ratelimit:mail:{settings.EMAIL_HOST}:{address.lower()}', recipient['capacity'],
+                        recipient['per_second']))
+    return buckets
@@ -0,0 +1,154 @@
+import threading
+import time
+import redis
+from django.conf import settings
+
+_clients = {}
+
+
+class InMemoryRedis:
+    """
+    Класс-заменитель клиента Redis, хранящий данные в памяти процесса. Используется в тестах и при локальной
+    разработке, когда в настройке REDIS_URL указано значение 'memory://'. Поддерживает только те команды Redis,
+    которые используются в проекте. Значения возвращаются строками, как у клиента с decode_responses=True
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._expires = {}
+        self._lock = threading.RLock()
+
+    def _purge(self, key):
+        """
+        Метод для удаления ключа с истекшим временем жизни
+        """
+        expire_at = self._expires.get(key)
+        if expire_at is not None and expire_at <= time.monotonic():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+
+    def _hash(self, name, create=False):
+        """
+        Метод для получения хеша по ключу name. При create=True отсутствующий хеш создается
+        """
+        self._purge(name)
+        if create:
+            return self._data.setdefault(name, {})
+        return self._data.get(name, {})
+
+    def exists(self, *names):
+        with self._lock:
+            count = 0
+            for name in names:
+                self._purge(name)
+                count += name in self._data
+            return count
+
+    def delete(self, *names):
+        with self._lock:
+            count = 0
+            for name in names:
+                self._purge(name)
+                if self._data.pop(name, None) is not None:
+                    count += 1
+                self._expires.pop(name, None)
+            return count
+
+    def expire(self, name, seconds):
+        with self._lock:
+            self._purge(name)
+            if name not in self._data:
+                return False
+            self._expires[name] = time.monotonic() + seconds
+            return True
+
+    def get(self, name):
+        with self._lock:
+            self._purge(name)
+            return self._data.get(name)
+
+    def set(self, name, value, ex=None, nx=False):
+        with self._lock:
+            self._purge(name)
+            if nx and name in self._data:
+                return None
+            self._data[name] = str(value)
+            self._expires.pop(name, None)
+            if ex is not None:
+                self._expires[name] = time.monotonic() + ex
+            return True
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            self._purge(name)
+            value = int(self._data.get(name, 0)) + amount
+            self._data[name] = str(value)
+            return value
+
+    def hget(self, name, key):
+        with self._lock:
+            return self._hash(name).get(key)
+
+    def hgetall(self, name):
+        with self._lock:
+            return dict(self._hash(name))
+
+    def hexists(self, name, key):
+        with self._lock:
+            return key in self._hash(name)
+
+    def hset(self, name, key=None, value=None, mapping=None):
+        with self._lock:
+            items = dict(mapping or {})
+            if key is not None:
+                items[key] = value
+            data = self._hash(name, create=True)
+            added = len([field for field in items if field not in data])
+            data.update({field: str(field_value) for field, field_value in items.items()})
+            return added
+
+    def hsetnx(self, name, key, value):
+        with self._lock:
+            data = self._hash(name, create=True)
+            if key in data:
+                return False
+            data[key] = str(value)
+            return True
+
+    def hincrby(self, name, key, amount=1):
+        with self._lock:
+            data = self._hash(name, create=True)
+            value = int(data.get(key, 0)) + amount
+            data[key] = str(value)
+            return value
+
+    def hdel(self, name, *keys):
+        with self._lock:
+            data = self._hash(name)
+            count = 0
+            for key in keys:
+                if data.pop(key, None) is not None:
+                    count += 1
+            if name in self._data and not data:
+                self.delete(name)
+            return count
+
+    def flushdb(self):
+        with self._lock:
+            self._data.clear()
+            self._expires.clear()
+            return True
+
+
+def get_redis():
+    """
+    Функция для получения клиента Redis по адресу из настройки REDIS_URL. Для адреса 'memory://' возвращается
+    экземпляр InMemoryRedis. Клиенты кешируются на уровне процесса
+    """
+    url = settings.REDIS_URL
+    if url not in _clients:
+        if url.startswith('memory://'):
+            _clients[url] = InMemoryRedis()
+        else:
+            _clients[url] = redis.Redis.from_url(url, decode_responses=True)
+    return _clients[url]
@@ -32,14 +32,15 @@ class ContactSerializer(serializers.ModelSerializer):
 class UserSerializer(serializers.ModelSerializer):
     """
     Класс для сериализации данных пользователя и его контактных данных. Обслуживаемая модель - User. Обслуживаемые поля
-    - id, first_name, last_name, email, company, position, contacts, password, type. За  сериализацию данных поля
-    contacts отвечает класс ContactSerializer
+    - id, first_name, last_name, email, company, position, contacts, password, type, language. За  сериализацию
+    данных поля contacts отвечает класс ContactSerializer
     """
     contacts = ContactSerializer(read_only=True)
 
     class Meta:
         model = User
-        fields = ('id', 'first_name', 'last_name', 'email', 'company', 'position', 'contacts', 'password', 'type')
+        fields = ('id', 'first_name', 'last_name', 'email', 'company', 'position', 'contacts', 'password', 'type',
+                  'language')
         read_only_fields = ('id',)
         extra_kwargs = {"password": {"write_only": True}}
 
@@ -47,11 +48,12 @@ class UserSerializer(serializers.ModelSerializer):
 class AccountDetailSerializer(serializers.ModelSerializer):
     """
     Класс для сериализации данных пользователя. Обслуживаемая модель - User. Обслуживаемые поля - id, first_name,
-    last_name, email, company, position, password, type, is_staff.
+    last_name, email, company, position, password, type, is_staff, language.
     """
     class Meta:
         model = User
-        fields = ('id', 'first_name', 'last_name', 'email', 'company', 'position', 'password', 'type', "is_staff")
+        fields = ('id', 'first_name', 'last_name', 'email', 'company', 'position', 'password', 'type', "is_staff",
+                  'language')
         read_only_fields = ('id',)
         extra_kwargs = {"password": {"write_only": True}}
 
@@ -183,23 +185,54 @@ class OrderItemSerializer(serializers.ModelSerializer):
 class BasketViewSerializer(serializers.ModelSerializer):
     """
     Класс для cериализации данных о товарах в корзине. Обслуживаемая модель - OrderItem. Обслуживаемые поля -
-    product_info, quantity. За сериализацию данных поля product_info отвечает класс ShopProductSerializer
+    product_info, quantity, price, product_name, shop. За сериализацию данных поля product_info отвечает класс
+    ShopProductSerializer. Поля price, product_name, shop заполнены у позиций оформленных заказов
     """
     product_info = ShopProductSerializer(many=False)
 
     class Meta:
         model = OrderItem
-        fields = ('product_info', 'quantity')
+        fields = ('product_info', 'quantity', 'price', 'product_name', 'shop')
 
 
 class OrderSerializer(serializers.ModelSerializer):
     """
     Класс для cериализации данных о заказах. Обслуживаемая модель - Order. Обслуживаемые поля - id, user, status,
-    ordered_items, total_sum. За сериализацию данных поля ordered_items отвечает класс BasketViewSerializer
+    ordered_items, total_sum, items_count, version. За сериализацию данных поля ordered_items отвечает класс
+    BasketViewSerializer
     """
     ordered_items = BasketViewSerializer(many=True, required=False)
-    total_sum = serializers.IntegerField(required=False)
 
     class Meta:
         model = Order
-        fields = ('id', 'user', 'dt', 'status', 'ordered_items', 'total_sum')
+        fields = ('id', 'user', 'dt', 'status', 'ordered_items', 'total_sum', 'items_count', 'version')
+        read_only_fields = ('total_sum', 'items_count', 'version')
+
+
+class OrderSummarySerializer(serializers.ModelSerializer):
+    """
+    Класс для cериализации краткой информации о заказах в списках заказов. Обслуживаемая модель - Order. Обслуживаемые
+    поля - id, dt, status, total_sum, items_count, version. Позиции заказа не сериализуются
+    """
+
+    class Meta:
+        model = Order
+        fields = ('id', 'dt', 'status', 'total_sum', 'items_count', 'version')
+        read_only_fields = fields
+
+
+class BulkOrderItemSerializer(serializers.Serializer):
+    """
+    Класс для валидации позиции оптового заказа. Обслуживаемые поля - product_info (id товара в магазине), quantity
+    """
+    product_info = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(min_value=1, error_messages={'min_value': 'Нельзя заказать менее 1 ед!'})
+
+
+class BulkOrderSerializer(serializers.Serializer):
+    """
+    Класс для валидации оптового заказа. Обслуживаемые поля - contact (id контакта пользователя для доставки), items.
+    За валидацию данных поля items отвечает класс BulkOrderItemSerializer
+    """
+    contact = serializers.IntegerField(min_value=1)
+    items = BulkOrderItemSerializer(many=True, allow_empty=False)
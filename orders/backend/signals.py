@@ -0,0 +1,55 @@
+from functools import partial
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django_rest_passwordreset.signals import reset_password_token_created
+from rest_framework.authtoken.models import Token
+from backend.authentication import invalidate_tokens
+from backend.models import User, Order, OrderItem, ShopProduct
+from backend.tasks import password_reset_token_created_task
+
+
+@receiver([post_save, post_delete], sender=OrderItem)
+def order_item_changed(sender, instance, **kwargs):
+    """
+    Сигнал для пересчета суммы заказа при создании, изменении или удалении позиции заказа
+    """
+    Order.objects.filter(id=instance.order_id).recalculate_totals()
+
+
+@receiver(post_save, sender=ShopProduct)
+def shop_product_changed(sender, instance, created, **kwargs):
+    """
+    Сигнал для пересчета суммы корзин, содержащих товар, при изменении его цены. Суммы оформленных заказов
+    рассчитаны по цене на момент заказа и не меняются
+    """
+    if not created:
+        Order.objects.filter(status='basket', id__in=OrderItem.objects.filter(
+            product_info_id=instance.id).values('order_id')).recalculate_totals()
+
+
+@receiver(reset_password_token_created)
+def password_reset_token_created(sender, instance, reset_password_token, **kwargs):
+    """
+    Сигнал для отправки токена сброса пароля пользователю. В celery task передается только id токена
+    """
+    transaction.on_commit(partial(password_reset_token_created_task.delay, reset_password_token.id))
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    """
+    Сигнал для удаления пользователя из кеша аутентификации при удалении токена (выход из аккаунта, удаление
+    пользователя)
+    """
+    invalidate_tokens([instance.key])
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, created, **kwargs):
+    """
+    Сигнал для удаления пользователя из кеша аутентификации при изменении пользователя (смена пароля,
+    деактивация, изменение данных аккаунта)
+    """
+    if not created:
+        invalidate_tokens(list(Token.objects.filter(user_id=instance.id).values_list('key', flat=True)))
@@ -1,175 +1,238 @@
+import logging
 from django.conf import settings
-from django.core.mail import EmailMultiAlternatives
-from django_rest_passwordreset.signals import reset_password_token_created
+from django.db import transaction
 from orders.celery import app
-from backend.models import ConfirmEmailToken, User, Shop, Contact, Order, Product, Parameter, Category, ShopProduct, \
-    ProductInf
+from backend.mail import MAIL_ERRORS, send_messages, render_message, render_for_users, message_from_dict
+from backend.digest import buffer_events
+from backend.imports import is_superseded, acquire_import_lock
+from backend.models import ConfirmEmailToken, User, Shop, Contact, Order, OrderItem, Product, Parameter, Category, \
+    ShopProduct, ProductInf
 import yaml
 from django.http import JsonResponse
 
+logger = logging.getLogger(__name__)
 
-@app.task
-def password_reset_token_created_task(reset_password_token, **kwargs):
+# Параметры celery task, отправляющих письма: повтор при ошибках почтового сервера с экспоненциальной задержкой
+MAIL_TASK_OPTIONS = {'autoretry_for': MAIL_ERRORS, 'retry_backoff': True, 'retry_jitter': True,
+                     'retry_backoff_max': settings.MAIL_RETRY_BACKOFF_MAX, 'max_retries': settings.MAIL_MAX_RETRIES}
+
+
+@app.task(**MAIL_TASK_OPTIONS)
+def password_reset_token_created_task(reset_password_token_id, **kwargs):
     """
-    Celery task для отправки токена сброса пароля пользователю
+    Celery task для отправки токена сброса пароля пользователю. Функция принимает аргумент reset_password_token_id
+    (id токена сброса пароля), токен и пользователь загружаются одним запросом
     """
+    from django_rest_passwordreset.models import ResetPasswordToken
+    reset_password_token = ResetPasswordToken.objects.select_related('user').filter(
+        id=reset_password_token_id).first()
+    if reset_password_token is None:
+        return
     # send an e-mail to the user
-
-    msg = EmailMultiAlternatives(
-        # title:
-        f"Password Reset Token for {reset_password_token.user}",
-        # message:
-        reset_password_token.key,
-        # from:
-        settings.EMAIL_HOST_USER,
-        # to:
-        [reset_password_token.user.email]
-    )
-    msg.send()
+    user = reset_password_token.user
+    send_messages([render_message('password_reset', {'user': user, 'key': reset_password_token.key}, [user.email],
+                                  user.language)])
 
 
-@app.task
+@app.task(**MAIL_TASK_OPTIONS)
 def new_user_registered_task(user_id, **kwargs):
     """
-    Celery task для отправки токена подтверждения почты пользователю
+    Celery task для отправки токена подтверждения почты пользователю. Существующий токен загружается вместе с
+    пользователем одним запросом
     """
     # send an e-mail to the user
-    token, _ = ConfirmEmailToken.objects.get_or_create(user_id=user_id)
+    token = ConfirmEmailToken.objects.select_related('user').filter(user_id=user_id).first()
+    if token is None:
+        token = ConfirmEmailToken.objects.create(user=User.objects.get(id=user_id))
+    send_messages([render_message('confirm_email', {'user': token.user, 'key': token.key}, [token.user.email],
+                                  token.user.language)])
 
-    msg = EmailMultiAlternatives(
-        # title:
-        f"Token for confirm registration {token.user.email}",
-        # message:
-        token.key,
-        # from:
-        settings.EMAIL_HOST_USER,
-        # to:
-        [token.user.email]
-    )
-    msg.send()
 
+@app.task(**MAIL_TASK_OPTIONS)
+def new_users_registered_task(user_ids):
+    """
+    Celery task для отправки токенов подтверждения почты пользователям, созданным загрузкой аккаунтов (см.
+    backend.provisioning). Токены загружаются вместе с пользователями одним запросом, письма отправляются через одно
+    соединение с почтовым сервером
+    """
+    tokens = ConfirmEmailToken.objects.select_related('user').filter(user_id__in=user_ids).order_by('id')
+    send_messages([render_message('confirm_email', {'user': token.user, 'key': token.key}, [token.user.email],
+                                  token.user.language) for token in tokens])
 
-@app.task
+
+@app.task(**MAIL_TASK_OPTIONS)
 def new_order_task(user_id, **kwargs):
     """
     Celery task для отправки информации о новом заказе пользователю. Функция принимает аргументы user_id(id покупателя)
-    и order_id
+    и order_ids (список id заказов по магазинам) или order_id
     """
     # send an e-mail to the user
     user = User.objects.get(id=user_id)
-
-    msg = EmailMultiAlternatives(
-        # title:
-        "Cпасибо за заказ",
-        # message:
-        f'Номер вашего заказа: {kwargs["order_id"]}\n'
-        f'Наш оператор свяжется с Вами в ближайшее время для уточнения деталей заказа.'
-        f'Статус заказов вы можете посмотреть в разделе "Заказы"'
-        ,
-        # from:
-        settings.EMAIL_HOST_USER,
-        # to:
-        [user.email]
-    )
-    msg.send()
+    order_ids = kwargs.get('order_ids') or [kwargs['order_id']]
+    send_messages([render_message('new_order', {'user': user, 'order_ids': order_ids}, [user.email], user.language)])
 
 
-@app.task
-def new_order_for_seller_task(user_id, **kwargs):
+@app.task(**MAIL_TASK_OPTIONS)
+def new_order_for_seller_task(user_id, order_id, **kwargs):
     """
-    Celery task для отправки информации о новом заказе продавцу. Функция принимает аргументы user_id (id продавца),
-    order_id, buyer_id
+    Celery task для отправки информации о новом заказе продавцу. Функция принимает аргументы user_id (id продавца) и
+    order_id. Позиции заказа загружаются одним запросом вместе с заказом, покупателем, контактом доставки и
+    магазином с продавцом. Если у магазина включены сводки оповещений, заказ добавляется в сводку
     """
+    items = list(OrderItem.objects.filter(order_id=order_id).select_related(
+        'order__user', 'order__contact', 'order__shop__seller').order_by('id'))
+    if not items:
+        return
+    order = items[0].order
+    if order.shop.digest_window:
+        buffer_events(order.shop_id, [(order.id, 'new')])
+        return
     # send an e-mail to the user
-    user = User.objects.get(id=user_id)
-    shop = Shop.objects.get(seller_id=user_id)
-    buyer = User.objects.get(id=kwargs["buyer_id"])
-    buyer_contacts = Contact.objects.get(user_id=kwargs["buyer_id"])
-    msg = EmailMultiAlternatives(
-        # title:
-        f'Новый заказ {kwargs["order_id"]}',
-        # message:
-        f'В магазине {shop.name} оформлен новый заказ номер {kwargs["order_id"]}\n'
-        f'Свяжитесь с покупателем уточнения деталей заказа.'
-        f'Контактная информация: {buyer.first_name} {buyer.last_name}'
-        f'Телефон: {buyer_contacts.phone}'
-        f'Адресс доставки: Страна {buyer_contacts.country},{buyer_contacts.region} область, почтовый индекс {buyer_contacts.zip}, '
-        f'город {buyer_contacts.city}, улица {buyer_contacts.street}, дом {buyer_contacts.house}, строение {buyer_contacts.building},'
-        f'квартира {buyer_contacts.apartment}\n'
-        f'Статус заказов вы можете посмотреть в разделе "Заказы"'
-        ,
-        # from:
-        settings.EMAIL_HOST_USER,
-        # to:
-        [user.email]
-    )
-    msg.send()
+    # контакт доставки сохраняется в заказе при оформлении, для старых заказов берется первый контакт покупателя
+    contact = order.contact or Contact.objects.filter(user_id=order.user_id).first()
+    seller = order.shop.seller
+    send_messages([render_message('new_order_for_seller', {'order': order, 'items': items, 'contact': contact},
+                                  [seller.email], seller.language)])
 
 
-@app.task
-def order_status_change_task(user_id, **kwargs):
+@app.task(**MAIL_TASK_OPTIONS)
+def order_status_change_task(user_id, order_id, **kwargs):
     """
-    Celery task для отправки информации о изменении статуса заказа. Функция принимает аргументы user_id (id продавца),
-    order_id, buyer_id
+    Celery task для отправки информации о изменении статуса заказа. Функция принимает аргументы user_id (id продавца)
+    и order_id. Заказ загружается одним запросом вместе с покупателем и магазином с продавцом. Если у магазина
+    включены сводки оповещений, изменение добавляется в сводку, а письмо отправляется только покупателю
     """
-    # send an e-mail to the user
-    user = User.objects.get(id=user_id)
-
-    buyer = User.objects.get(id=kwargs["buyer_id"])
+    orders_status_change_task(user_id, [order_id])
 
-    order = Order.objects.get(id=kwargs["order_id"])
 
-    msg = EmailMultiAlternatives(
-        # title:
-        f'Изменения статуса заказа {kwargs["order_id"]}',
-        # message:
-        f'Статус заказа: {kwargs["order_id"]} изменен на {order.status}\n'
-        f'Статус заказов вы можете посмотреть в разделе "Заказы"'
-        ,
-        # from:
-        settings.EMAIL_HOST_USER,
-        # to:
-        [user.email, buyer.email]
-    )
-    msg.send()
+@app.task(**MAIL_TASK_OPTIONS)
+def orders_status_change_task(user_id, order_ids, **kwargs):
+    """
+    Celery task для отправки информации о изменении статуса нескольких заказов. Функция принимает аргументы user_id
+    (id продавца) и order_ids (список id заказов). Заказы, покупатели и магазины с продавцами загружаются одним
+    запросом, письма формируются по шаблону order_status на языке получателей и отправляются одним пакетом через
+    постоянное соединение с почтовым сервером. Если у магазина включены сводки оповещений, изменения добавляются в
+    сводку, а письма отправляются только покупателям
+    """
+    orders = list(Order.objects.filter(id__in=order_ids).select_related('user', 'shop__seller').order_by('id'))
+    digest = [order for order in orders if order.shop and order.shop.digest_window]
+    for shop_id in {order.shop_id for order in digest}:
+        buffer_events(shop_id, [(order.id, order.status) for order in digest if order.shop_id == shop_id])
+    messages = []
+    for order in orders:
+        recipients = [order.user]
+        if order.shop and order.shop.seller and not order.shop.digest_window:
+            recipients.insert(0, order.shop.seller)
+        messages += render_for_users('order_status', {'order': order}, recipients)
+    send_messages(messages)
+
+
+@app.task(**MAIL_TASK_OPTIONS)
+def send_email_task(messages, **kwargs):
+    """
+    Celery task для отправки писем, отложенных из-за ограничения частоты отправки или ошибки почтового сервера.
+    Функция принимает аргумент messages - список писем в виде словарей (см. backend.mail.message_to_dict)
+    """
+    send_messages([message_from_dict(message) for message in messages])
 
 
-@app.task
-def handle_uploaded_file_task(shop_file, user):
+@app.task(bind=True, max_retries=settings.IMPORT_MAX_RETRIES)
+def handle_uploaded_file_task(self, shop_file, user, sequence=None):
     """
-    Celery task для отправки информации для обновления прайса магазина
+    Celery task для отправки информации для обновления прайса магазина. Загрузки одного продавца выполняются по
+    очереди: прайс обновляется в одной транзакции под рекомендательной блокировкой продавца, а при занятой
+    блокировке task повторяется через IMPORT_LOCK_RETRY_DELAY секунд. Загрузка с номером sequence, замененная более
+    новой загрузкой того же продавца, пропускается (см. backend.imports). Магазин загрузки - магазин продавца,
+    загрузка с названием магазина другого продавца отклоняется
     """
-    shop = Shop()
-    with open(shop_file, 'r', encoding='utf8') as stream:
+    if is_superseded(user, sequence):
+        logger.info('Загрузка прайса %s заменена более новой загрузкой', shop_file)
+        return
+    with open(shop_file, 'r', encoding='utf8') as stream, transaction.atomic():
+        if not acquire_import_lock(user):
+            raise self.retry(countdown=settings.IMPORT_LOCK_RETRY_DELAY)
         try:
             shop_data = yaml.safe_load(stream)
-            shop.name = shop_data['shop']
             seller = User.objects.filter(id=user).first()
-            shop.seller = seller
-            shop.save()
+            # магазин определяется продавцом, название магазина другого продавца не принимается
+            if Shop.objects.filter(name=shop_data['shop']).exclude(seller=seller).exists():
+                logger.warning('Загрузка прайса %s отклонена: магазин %s принадлежит другому продавцу', shop_file,
+                               shop_data['shop'])
+                return {'Status': False, 'Error': 'Магазин с таким названием принадлежит другому продавцу'}
+            shop, _ = Shop.objects.update_or_create(seller=seller, defaults={'name': shop_data['shop']})
             for category in shop_data['categories']:
                 category_object, _ = Category.objects.get_or_create(id=category['id'], name=category['name'])
                 category_object.shops.add(shop)
-                category_object.save()
             for goods in shop_data['goods']:
                 category = Category.objects.get(id=goods['category'])
                 product_object, _ = Product.objects.get_or_create(name=goods['name'], model=goods['model'],
                                                                   category=category)
-                product_object.save()
-                prod_pk = Product.objects.filter(name=goods['name']).first()
-                shopproduct_object, _ = ShopProduct.objects.get_or_create(ext_id=goods['id'],
-                                                                          quantity=goods['quantity'],
-                                                                          price=goods['price'],
-                                                                          price_rrc=goods['price_rrc'],
-                                                                          product=prod_pk, shop=shop)
-                shopproduct_object.save()
+                # товар магазина определяется парой магазин - внешний ИД, цена и количество обновляются
+                ShopProduct.objects.update_or_create(shop=shop, ext_id=goods['id'],
+                                                     defaults={'quantity': goods['quantity'],
+                                                               'price': goods['price'],
+                                                               'price_rrc': goods['price_rrc'],
+                                                               'product': product_object})
                 for parameters, value in goods['parameters'].items():
                     parameter_object, _ = Parameter.objects.get_or_create(name=parameters)
-                    parameter_object.save()
-                    param_obj_pk = Parameter.objects.filter(name=parameters).first()
-                    product_inf_object, _ = ProductInf.objects.get_or_create(value=value,
-                                                                             parameter=param_obj_pk,
-                                                                             product=prod_pk)
-                    product_inf_object.save()
+                    ProductInf.objects.update_or_create(product=product_object, parameter=parameter_object,
+                                                        defaults={'value': value})
         except yaml.YAMLError as exc:
             return JsonResponse({'Status': False, 'Error': str(exc)})
+
+
+@app.task
+def archive_orders_task():
+    """
+    Celery task для переноса старых доставленных и отмененных заказов в архив. Запускается по расписанию
+    CELERY_BEAT_SCHEDULE
+    """
+    from backend.archive import archive_orders
+    return archive_orders()
+
+
+@app.task
+def cleanup_auth_task():
+    """
+    Celery task для удаления устаревших токенов аутентификации, токенов подтверждения email и неподтвержденных
+    пользователей. Запускается по расписанию CELERY_BEAT_SCHEDULE
+    """
+    from backend.cleanup import cleanup_auth
+    return cleanup_auth()
+
+
+@app.task
+def relay_outbox_task():
+    """
+    Celery task для передачи исходящих событий в очередь celery. Запускается по расписанию CELERY_BEAT_SCHEDULE
+    """
+    from backend.outbox import relay
+    return relay()
+
+
+@app.task(**MAIL_TASK_OPTIONS)
+def process_outbox_event_task(event_id):
+    """
+    Celery task для выполнения исходящего события с id event_id. При ошибке почтового сервера событие остается
+    невыполненным, и task повторяется с экспоненциальной задержкой
+    """
+    from backend.outbox import process
+    return process(event_id)
+
+
+@app.task
+def purge_outbox_task():
+    """
+    Celery task для удаления выполненных исходящих событий. Запускается по расписанию CELERY_BEAT_SCHEDULE
+    """
+    from backend.outbox import purge
+    return purge()
+
+
+@app.task
+def send_seller_digests_task():
+    """
+    Celery task для отправки сводок оповещений продавцам. Запускается по расписанию CELERY_BEAT_SCHEDULE
+    """
+    from backend.digest import send_digests
+    return send_digests()
@@ -0,0 +1,160 @@
+import logging
+import math
+import threading
+import time
+import redis
+from django.conf import settings
+from rest_framework import throttling
+from backend.redis_store import get_redis
+
+logger = logging.getLogger(__name__)
+
+_windows = {}
+
+# KEYS[1] - хеш окна ключа ограничения, ARGV - лимит запросов и длительность окна в секундах. Количество запросов
+# за последние duration секунд оценивается по счетчикам текущего и предыдущего окна: запросы предыдущего окна
+# учитываются пропорционально его доле в скользящем окне. Запрос засчитывается, только если оценка меньше лимита.
+# Возвращает время ожидания в секундах (0, если запрос разрешен). Время берется с сервера Redis
+SLIDING_WINDOW_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local limit = tonumber(ARGV[1])
+local duration = tonumber(ARGV[2])
+local window = math.floor(now / duration)
+local state = redis.call('HMGET', KEYS[1], 'window', 'current', 'previous')
+local current = tonumber(state[2]) or 0
+local previous = tonumber(state[3]) or 0
+local stored = tonumber(state[1]) or window
+if stored == window - 1 then
+    previous = current
+    current = 0
+elseif stored ~= window then
+    previous = 0
+    current = 0
+end
+local elapsed = now - window * duration
+local count = previous * (1 - elapsed / duration) + current
+if count >= limit then
+    local wait = duration - elapsed
+    if previous > 0 then
+        wait = math.min(wait, (count - limit + 1) * duration / previous)
+    end
+    return tostring(math.max(wait, 0.001))
+end
+redis.call('HSET', KEYS[1], 'window', window, 'current', current + 1, 'previous', previous)
+redis.call('EXPIRE', KEYS[1], math.ceil(duration * 2))
+return '0'
+"""
+
+
+class InMemorySlidingWindow:
+    """
+    Класс счетчиков запросов в скользящем окне, хранящихся в InMemoryRedis. Используется в тестах и при локальной
+    разработке, когда в настройке REDIS_URL указано значение 'memory://'. Повторяет алгоритм SLIDING_WINDOW_SCRIPT.
+    Методы класса - hit
+    """
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self._lock = threading.Lock()
+
+    def hit(self, key, limit, duration):
+        """
+        Метод для учета запроса по ключу key при лимите limit запросов за duration секунд. Возвращает время ожидания
+        в секундах до следующего разрешенного запроса (0, если запрос разрешен и засчитан)
+        """
+        redis_client = get_redis()
+        with self._lock:
+            now = self.clock()
+            window = math.floor(now / duration)
+            state = redis_client.hgetall(key)
+            current, previous = int(state.get('current', 0)), int(state.get('previous', 0))
+            stored = int(state.get('window', window))
+            if stored == window - 1:
+                previous, current = current, 0
+            elif stored != window:
+                previous, current = 0, 0
+            elapsed = now - window * duration
+            count = previous * (1 - elapsed / duration) + current
+            if count >= limit:
+                wait = duration - elapsed
+                if previous:
+                    wait = min(wait, (count - limit + 1) * duration / previous)
+                return max(wait, 0.001)
+            redis_client.hset(key, mapping={'window': window, 'current': current + 1, 'previous': previous})
+            redis_client.expire(key, math.ceil(duration * 2))
+            return 0
+
+
+class RedisSlidingWindow:
+    """
+    Класс счетчиков запросов в скользящем окне в Redis. Проверка и учет запроса выполняются атомарно скриптом
+    SLIDING_WINDOW_SCRIPT за постоянное время, поэтому лимит общий для всех процессов приложения. Методы класса - hit
+    """
+
+    def __init__(self):
+        self.script = get_redis().register_script(SLIDING_WINDOW_SCRIPT)
+
+    def hit(self, key, limit, duration):
+        """
+        Метод для учета запроса по ключу key (см. InMemorySlidingWindow.hit). Возвращает время ожидания в секундах
+        (0, если запрос разрешен и засчитан)
+        """
+        return float(self.script(keys=[key], args=[limit, duration]))
+
+
+def get_sliding_window():
+    """
+    Функция для получения счетчиков запросов по адресу из настройки REDIS_URL. Для адреса 'memory://' возвращается
+    экземпляр InMemorySlidingWindow. Счетчики кешируются на уровне процесса
+    """
+    url = settings.REDIS_URL
+    if url not in _windows:
+        _windows[url] = InMemorySlidingWindow() if url.startswith('memory://') else RedisSlidingWindow()
+    return _windows[url]
+
+
+class SlidingWindowThrottleMixin:
+    """
+    Класс-примесь для ограничения частоты запросов DRF по счетчикам скользящего окна в Redis (см.
+    get_sliding_window) вместо истории запросов в локальном кеше процесса. Лимит DEFAULT_THROTTLE_RATES соблюдается
+    для всех процессов приложения вместе, проверка выполняется за постоянное время. При недоступности Redis запросы
+    не ограничиваются
+    """
+    wait_time = None
+
+    def allow_request(self, request, view):
+        """
+        Метод для проверки, разрешен ли запрос request
+        """
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        try:
+            self.wait_time = get_sliding_window().hit(self.key, self.num_requests, self.duration)
+        except redis.RedisError as error:
+            logger.warning('Счетчики ограничения частоты запросов недоступны: %s', error)
+            return True
+        return not self.wait_time
+
+    def wait(self):
+        """
+        Метод для получения времени в секундах до следующего разрешенного запроса
+        """
+        return self.wait_time
+
+
+class SlidingWindowAnonRateThrottle(SlidingWindowThrottleMixin, throttling.AnonRateThrottle):
+    """
+    Класс ограничения частоты запросов анонимных пользователей по IP-адресу (лимит 'anon'). Заменяет AnonRateThrottle
+    в DEFAULT_THROTTLE_CLASSES
+    """
+
+
+class SlidingWindowUserRateThrottle(SlidingWindowThrottleMixin, throttling.UserRateThrottle):
+    """
+    Класс ограничения частоты запросов аутентифицированных пользователей (лимит 'user'). Заменяет UserRateThrottle
+    в DEFAULT_THROTTLE_CLASSES
+    """
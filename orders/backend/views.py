@@ -1,17 +1,18 @@
-from rest_framework.authentication import TokenAuthentication
+from backend.authentication import CachedTokenAuthentication, token_expires
 from .forms import UploadFileForm
 from django.http import JsonResponse
 from rest_framework.views import APIView
 from backend.models import Shop, Category, Product, ShopProduct, ProductInf, ConfirmEmailToken, \
-    Contact, Order, OrderItem
+    Contact, Order, OutOfStock, STATUS_TRANSITIONS, ShopSales, ProductSales
 from orders.settings import DATA_ROOT
 import os
+from datetime import date, timedelta
 from django.contrib.auth.password_validation import validate_password
 from backend.serializers import UserSerializer, CategorySerializer, ShopSerializer, ProductSerializer, \
     ShopProductSerializer, ProductInfSerializer, ContactSerializer, OrderSerializer, OrderItemSerializer, \
-    AccountDetailSerializer
+    AccountDetailSerializer, OrderSummarySerializer, BulkOrderSerializer
 from backend.tasks import new_user_registered_task, new_order_task, new_order_for_seller_task, \
-    order_status_change_task, handle_uploaded_file_task
+    orders_status_change_task
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
@@ -20,9 +21,19 @@ from rest_framework.viewsets import ModelViewSet
 from rest_framework import filters
 from rest_framework.decorators import action
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q, Sum, F
-from django.db import IntegrityError
+from django.db.models import Q, Sum
+from django.db import IntegrityError, transaction
 from drf_spectacular.utils import extend_schema
+from backend.basket import get_basket_store, create_orders
+from backend.idempotency import idempotent
+from backend.outbox import enqueue
+from backend.events import publish_order_status
+from functools import partial
+from backend.archive import find_archived_order
+from backend.imports import enqueue_import
+from django.http import Http404
+from django.conf import settings
+from django.utils import timezone
 
 
 class RegisterAccount(APIView):
@@ -71,12 +82,13 @@ class ConfirmAccount(APIView):
         """
         HTTP method post. В теле json-запроса должны присутствовать поля email, token. Токен направляется пользователю
         на email после регистрации. При соответствии пары email, token поле is_active в модели User устанавливается в
-        значение True, a токен удаляется
+        значение True, a токен удаляется. Токены старше CONFIRM_EMAIL_TOKEN_TTL секунд не принимаются
         """
         if {'email', 'token'}.issubset(request.data):
 
-            token = ConfirmEmailToken.objects.filter(user__email=request.data['email'],
-                                                     key=request.data['token']).first()
+            confirm_before = timezone.now() - timedelta(seconds=settings.CONFIRM_EMAIL_TOKEN_TTL)
+            token = ConfirmEmailToken.objects.filter(user__email=request.data['email'], key=request.data['token'],
+                                                     created_at__gte=confirm_before).first()
             if token:
                 token.user.is_active = True
                 token.user.save()
@@ -91,10 +103,10 @@ class ConfirmAccount(APIView):
 class AccountDetails(APIView):
     """
     Класс для просмотра информации об аккаунте и изменения данных пользователя. Доступен http method get, post. За
-    аутентификацию отвечает класс TokenAuthentication
+    аутентификацию отвечает класс CachedTokenAuthentication
     """
     serializer_class = UserSerializer
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
 
     @extend_schema(responses=AccountDetailSerializer,)
     def get(self, request, *args, **kwargs):
@@ -149,32 +161,55 @@ class LoginAccount(APIView):
         """
         HTTP method post. Метод для авторизации пользователя. В request.data проверяется наличие ключей 'email' и
         'password'. Авторизация просходит методом authentificate который возвращает объект класса User при совпадении
-        полей email и password. Если поле is_active=True то для объекта класса создается TokenAuthentication
+        полей email и password. Если поле is_active=True то для объекта класса создается TokenAuthentication. Токен
+        старше AUTH_TOKEN_ROTATE_AFTER секунд заменяется новым, в ответе возвращается время окончания действия токена
         """
         if {'email', 'password'}.issubset(request.data):
             user = authenticate(request, username=request.data['email'], password=request.data['password'])
             if user is not None:
                 if user.is_active:
+                    rotate_before = timezone.now() - timedelta(seconds=settings.AUTH_TOKEN_ROTATE_AFTER)
+                    Token.objects.filter(user=user, created__lt=rotate_before).delete()
                     token, _ = Token.objects.get_or_create(user=user)
-                    return JsonResponse({'Status': True, 'Token': token.key}, status=201)
+                    return JsonResponse({'Status': True, 'Token': token.key, 'Expires': token_expires(token)},
+                                        status=201)
 
             return JsonResponse({'Status': False, 'Error': 'Не удалось авторизовать'}, status=401)
 
         return JsonResponse({'Status': False, 'Error': 'Не указаны все необходимые аргументы'}, status=403)
 
 
+class LogoutAccount(APIView):
+    """
+    Класс для выхода пользователя из аккаунта. Доступен http method post. За аутентификацию отвечает класс
+    CachedTokenAuthentication
+    """
+    authentication_classes = (CachedTokenAuthentication,)
+
+    def post(self, request, *args, **kwargs):
+        """
+        HTTP method post. Метод для удаления токена пользователя. Вместе с токеном из кеша аутентификации удаляется
+        пользователь (см. backend.signals), поэтому токен перестает действовать сразу
+        """
+        if not request.user.is_authenticated:
+            return JsonResponse({'Status': False, 'Error': 'Log in required'}, status=403)
+        Token.objects.filter(key=request.auth.key).delete()
+        return JsonResponse({'Status': True})
+
+
 class ShopUpload(APIView):
     """
     Класс для обновления прайса магазина с помощью .yaml файла отправленного через http запрос. Доступен http method
-    post. За аутентификацию отвечает класс TokenAuthentication
+    post. За аутентификацию отвечает класс CachedTokenAuthentication
     """
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
 
     def post(self, request):
         """
         HTTP method post. Метод для загрузки прайса товаров из .yaml файла. После проверки методом is_authenticated
         проверяется тип пользователя. Файл из http запроса загружается в file_form модели ShopFile. После проверки
-        валидности формы вызывается celery task handle_uploaded_file_task отвечающий за обновление прайса товаров
+        валидности формы вызывается celery task handle_uploaded_file_task отвечающий за обновление прайса товаров.
+        Загрузки продавца нумеруются, поэтому из нескольких загрузок в очереди выполняется только последняя
         """
         if not request.user.is_authenticated:
             return JsonResponse({'Status': False, 'Error': 'Log in required'}, status=403)
@@ -185,7 +220,7 @@ class ShopUpload(APIView):
         if form.is_valid():
             form.save()
             file = request.FILES.popitem()
-            handle_uploaded_file_task.delay(os.path.join(DATA_ROOT, str(file[1][0])), request.user.id)
+            enqueue_import(os.path.join(DATA_ROOT, str(file[1][0])), request.user.id)
             return JsonResponse({'Status': True}, status=201)
         else:
             return JsonResponse({'Status': False}, status=400)
@@ -255,10 +290,10 @@ class ProductInfViewSet(ModelViewSet):
 class UserContact(APIView):
     """
     Класс для работы с контактной информацией пользователя. Доступен http method get, post, put, delete. За
-    аутентификацию отвечает класс TokenAuthentication
+    аутентификацию отвечает класс CachedTokenAuthentication
     """
     serializer_class = ContactSerializer
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
 
     @extend_schema(request=ContactSerializer, responses=ContactSerializer,)
     def get(self, request, *args, **kwargs):
@@ -346,11 +381,11 @@ class UserContact(APIView):
 class BasketViewSet(ModelViewSet):
     """
     Класс для работы с корзиной товаров пользователя. Доступен http method get, post, put, delete. За
-    аутентификацию отвечает класс TokenAuthentication
+    аутентификацию отвечает класс CachedTokenAuthentication
     """
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = [IsAuthenticated]
 
     #
@@ -358,67 +393,65 @@ class BasketViewSet(ModelViewSet):
         """
         HTTP method get. Метод для получения информации о товаре в корзине пользователя. После проверки методом
         is_authenticated возвращается экземлпяр класса Order с статусом 'basket' относящийся к пользователю выполневшему
-        запрос. За сериализацию данных отвечает класс OrderSerializer.
+        запрос, из хранилища, указанного в настройке BASKET_STORE. За сериализацию данных отвечает класс
+        OrderSerializer.
+        """
+        return get_basket_store().queryset(self.request.user.id)
+
+    def list(self, request, *args, **kwargs):
         """
-        queryset = Order.objects.filter(user_id=self.request.user.id, status='basket'). \
-            prefetch_related('ordered_items').annotate(
-            total_sum=Sum(F('ordered_items__quantity') * F('ordered_items__product_info__price'))).distinct()
-        return queryset
+        HTTP method get. Метод для получения содержимого корзины пользователя из хранилища, указанного в настройке
+        BASKET_STORE
+        """
+        return Response(get_basket_store().get(self.request.user.id))
 
     #
+    @idempotent
     def create(self, request, *args, **kwargs):
         """
         HTTP method post. Метод для создания корзины товаров пользователя. После проверки методом
-        is_authenticated создается объект класса Order. Товар и его количество сохраняется в объектах класса OrderItem.
-        За сериализацию данных отвечает класс OrderItemSerializer
+        is_authenticated все товары проходят валидацию, после чего товар и его количество сохраняются в хранилище
+        корзины. За сериализацию данных отвечает класс OrderItemSerializer. Поддерживается заголовок Idempotency-Key
         """
         if self.request.data:
             try:
-                objects_created = 0
-                order, _ = Order.objects.get_or_create(user_id=self.request.user.id, status='basket')
-                for items in self.request.data:
-                    serializer = OrderItemSerializer(data=items)
+                items = []
+                for item in self.request.data:
+                    serializer = OrderItemSerializer(data=item)
                     if serializer.is_valid():
-                        try:
-                            serializer.save(order_id=order.id)
-                            objects_created += 1
-                        except IntegrityError as err:
-                            return JsonResponse(err)
+                        items.append((serializer.validated_data['product_info'].id,
+                                      serializer.validated_data['quantity']))
                     else:
                         return JsonResponse({'Status': False, 'Возникла ошибка!': serializer.errors}, status=400)
+                try:
+                    objects_created = get_basket_store().add(self.request.user.id, items)
+                except IntegrityError as err:
+                    return JsonResponse({'Status': False, 'Error': str(err)}, status=400)
                 return JsonResponse({'Status': True, 'Добавлено объектов': objects_created}, status=201)
             except TypeError as error:
-                return JsonResponse({error})
+                return JsonResponse({'Status': False, 'Error': str(error)}, status=400)
         return JsonResponse({'Status': False, 'Возникла ошибка!': "Указаны не все аргументы"}, status=403)
 
     #
     @action(methods=['delete'], detail=False)
     def delete(self, request, *args, **kwargs):
         """
-        HTTP method delete. Метод для удаления контактной информации о пользователе. После проверки методом
-        is_authenticated проверяется наличие ключа 'items' в request.data. При нахождении записи в БД принадлежащей
-        пользователю выполневшему запрос c запрашиваемым id корзины и статусом 'basket', запись удаляется. За
-        сериализацию данных отвечает класс OrderItemSerializer
+        HTTP method delete. Метод для удаления товаров из корзины пользователя. После проверки методом
+        is_authenticated проверяется наличие ключа 'items' в request.data. Товары с запрашиваемыми id удаляются из
+        хранилища корзины
         """
         try:
             items_to_del = str(self.request.data['items']).split(',')
         except KeyError:
             return JsonResponse({'Status': False, 'Error': 'Не указаны все необходимые аргументы'}, status=403)
-        if items_to_del:
-            basket, _ = Order.objects.get_or_create(user_id=self.request.user.id, status='basket')
-            query = Q()
-            deleted_status = False
-            for order_item_id in items_to_del:
-                if order_item_id.isdigit():
-                    query = query | Q(order_id=basket.id, product_info_id=order_item_id)
-                    deleted_status = True
-            if deleted_status:
-                deleted_count = OrderItem.objects.filter(query).delete()[0]
-                if deleted_count != 0:
-                    return JsonResponse({'Status': True, 'Удалено объектов': deleted_count}, status=200)
-                else:
-                    return JsonResponse({'Status': False, 'Error': 'Укажите корректные товары для удаления'},
-                                        status=403)
+        product_ids = [int(order_item_id) for order_item_id in items_to_del if order_item_id.isdigit()]
+        if product_ids:
+            deleted_count = get_basket_store().remove(self.request.user.id, product_ids)
+            if deleted_count != 0:
+                return JsonResponse({'Status': True, 'Удалено объектов': deleted_count}, status=200)
+            else:
+                return JsonResponse({'Status': False, 'Error': 'Укажите корректные товары для удаления'},
+                                    status=403)
         return JsonResponse({'Status': False, 'Error': 'Не указаны все необходимые аргументы'}, status=403)
 
     #
@@ -426,129 +459,339 @@ class BasketViewSet(ModelViewSet):
     def put(self, request, *args, **kwargs):
         """
         HTTP method put. Метод для изменения cсодержимого корзины пользователя. После проверки методом
-        is_authenticated происходит валидация данных методом is_valid. При нахождении записи в БД с запрашиваемым
-        товаром и принадлежащей пользователю выполневшему запрос и статусом 'basket', обновляется количество товара. За
-        сериализацию данных отвечает класс OrderItemSerializer
+        is_authenticated происходит валидация данных методом is_valid. При нахождении в хранилище корзины
+        запрашиваемого товара обновляется его количество. За сериализацию данных отвечает класс OrderItemSerializer
         """
         if self.request.data:
             try:
-                objects_updated = 0
-                basket, _ = Order.objects.get_or_create(user_id=self.request.user.id, status='basket')
-                for items in self.request.data:
-                    items.update(order_id=basket.id)
-                    serializer = OrderItemSerializer(data=items)
+                items = []
+                for item in self.request.data:
+                    serializer = OrderItemSerializer(data=item)
                     if serializer.is_valid():
-                        if type(items['product_info']) == int and type(items['quantity']) == int:
-                            objects_updated += OrderItem.objects.filter(order_id=basket.id,
-                                                                        product_info_id=items['product_info']).update(
-                                quantity=items['quantity'])
+                        if type(item['product_info']) == int and type(item['quantity']) == int:
+                            items.append((item['product_info'], item['quantity']))
                     else:
                         return JsonResponse({'Status': False, 'Возникла ошибка!': serializer.errors}, status=403)
+                objects_updated = get_basket_store().update(self.request.user.id, items)
                 return JsonResponse({"Status": True, "Обновлено объектов": objects_updated}, status=200)
             except ValueError:
                 return JsonResponse({'Status': False, 'Возникла ошибка!': "Некорректный формат данных"})
         return JsonResponse({'Status': False, 'Error': 'Не указаны все необходимые аргументы'}, status=403)
 
 
-class OrderViewSet(ModelViewSet):
+class OrderListMixin:
+    """
+    Класс-примесь для представлений заказов. Список заказов по умолчанию сериализуется классом OrderSummarySerializer
+    без позиций заказа, полная информация о позициях возвращается при запросе конкретного заказа или при передаче
+    параметра запроса ?expand=items. Методы класса - expand_items, get_serializer_class, with_items
+    """
+
+    def expand_items(self):
+        """
+        Метод для проверки, нужна ли в ответе полная информация о позициях заказов
+        """
+        return self.action != 'list' or 'items' in self.request.query_params.get('expand', '').split(',')
+
+    def get_serializer_class(self):
+        """
+        Метод для выбора класса сериализации: OrderSerializer для полной информации, OrderSummarySerializer для
+        краткой
+        """
+        return OrderSerializer if self.expand_items() else OrderSummarySerializer
+
+    def with_items(self, queryset):
+        """
+        Метод для загрузки позиций заказов, только если они будут сериализованы
+        """
+        return queryset.with_item_details() if self.expand_items() else queryset
+
+
+class OrderViewSet(OrderListMixin, ModelViewSet):
     """
     Класс для работы с заказами пользователя. Доступен http method get, post. За аутентификацию отвечает класс
-    TokenAuthentication
+    CachedTokenAuthentication. Список заказов возвращается в кратком виде (см. OrderListMixin)
     """
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
         """
         HTTP method get. Метод для получения информации о заказах пользователя. После проверки методом
         is_authenticated возвращается экземлпяр класса Order с любым статусом, но не 'basket' относящийся к пользователю
-        выполневшему запрос. За сериализацию данных отвечает класс OrderSerializer.
+        выполневшему запрос. За сериализацию данных отвечает класс OrderSummarySerializer или OrderSerializer.
         """
-        queryset = Order.objects.filter(user_id=self.request.user.id).exclude(status='basket').prefetch_related(
-            'ordered_items').annotate(
-            total_sum=Sum(F('ordered_items__quantity') * F('ordered_items__product_info__price'))).distinct()
-        return queryset
+        queryset = Order.objects.filter(user_id=self.request.user.id).exclude(status='basket')
+        return self.with_items(queryset)
 
+    def retrieve(self, request, *args, **kwargs):
+        """
+        HTTP method get. Метод для получения информации о заказе пользователя по id. Заказ, перенесенный в архив,
+        возвращается из файла архива
+        """
+        try:
+            return super().retrieve(request, *args, **kwargs)
+        except Http404:
+            if not str(kwargs['pk']).isdigit():
+                raise
+            record = find_archived_order(int(kwargs['pk']), user_id=request.user.id)
+            if record is None:
+                raise
+            return Response(dict(record, archived=True))
+
+    @idempotent
     def create(self, request, *args, **kwargs):
         """
-        HTTP method post. Метод для создания корзины товаров пользователя. После проверки методом
-        is_authenticated статус объекта класса Order, относящего к пользователю выполневшему запрос, c id указанным в
-        запросе обновляется на 'new'. Далее при наличии контактной информации пользователя вызывается celery task
-        new_order_task и new_order_for_seller_task для оповещения продавца и покупателя о создании нового заказа.
+        HTTP method post. Метод для оформления заказа из корзины пользователя. После проверки методом
+        is_authenticated и наличия контактной информации пользователя корзина c id указанным в запросе оформляется в
+        заказы по магазинам со статусом 'new' хранилищем корзины, товары заказа резервируются на складе, в заказах
+        сохраняется контакт покупателя для доставки. При нехватке товара возвращается ошибка со статусом 409. В той же
+        транзакции в таблицу исходящих событий записываются celery task new_order_task для оповещения покупателя и по
+        одному celery task new_order_for_seller_task на каждый магазин для оповещения продавцов. Поддерживается
+        заголовок Idempotency-Key
         """
         if {'id'}.issubset(self.request.data):
             if self.request.data['id'].isdigit():
+                contacts = Contact.objects.filter(user_id=self.request.user.id).first()
+                if not contacts:
+                    return JsonResponse({'Status': False, 'Error': 'Не указаны контакты для связи'}, status=403)
                 try:
-                    is_updated = Order.objects.filter(id=self.request.data['id']).update(status='new')
+                    with transaction.atomic():
+                        sub_orders = get_basket_store().checkout(self.request.user.id, self.request.data['id'])
+                        if sub_orders:
+                            order_ids = [sub_order['order_id'] for sub_order in sub_orders]
+                            Order.objects.filter(id__in=order_ids).update(contact=contacts)
+                            enqueue(new_order_task, user_id=self.request.user.id, order_ids=order_ids)
+                            transaction.on_commit(partial(publish_order_status, order_ids, 'new'))
+                            for sub_order in sub_orders:
+                                if sub_order['seller_id']:
+                                    enqueue(new_order_for_seller_task, user_id=sub_order['seller_id'],
+                                            order_id=sub_order['order_id'])
                 except IntegrityError:
                     return JsonResponse({'Status': False, 'Error': 'Аргументы указаны неверно'})
+                except OutOfStock as error:
+                    return JsonResponse({'Status': False, 'Error': 'Недостаточно товара на складе',
+                                         'Товары': error.product_ids}, status=409)
                 else:
-                    if is_updated:
-                        contacts = Contact.objects.filter(user_id=self.request.user.id).first()
-                        if contacts:
-                            seller = Order.objects.filter(id=self.request.data['id']).prefetch_related(
-                                'ordered_items').all()[0].ordered_items.all()[0]
-                            new_order_task.delay(user_id=self.request.user.id,
-                                                 order_id=self.request.data['id'])
-                            new_order_for_seller_task.delay(user_id=seller.product_info.shop.seller.id,
-                                                            order_id=self.request.data['id'],
-                                                            buyer_id=self.request.user.id)
-
-                            return JsonResponse({'Status': True}, status=201)
-                        else:
-                            return JsonResponse({'Status': False, 'Error': 'Не указаны контакты для связи'},
-                                                status=403)
+                    if sub_orders:
+                        return JsonResponse({'Status': True, 'Заказы': order_ids}, status=201)
 
         return JsonResponse({'Status': False, 'Error': 'Не указаны все необходимые аргументы'}, status=403)
 
-
-class SellerOrderViewSet(ModelViewSet):
+    @action(methods=['post'], detail=False, url_path='bulk')
+    @idempotent
+    def bulk(self, request, *args, **kwargs):
+        """
+        HTTP method post. Метод для оптового оформления заказов без корзины. В поле orders передается список заказов
+        (не более BULK_ORDERS_MAX), каждый заказ - контакт пользователя для доставки и позиции заказа. Все заказы
+        проверяются вместе: при ошибке хотя бы в одном заказе ни один заказ не создается и возвращается ошибка со
+        статусом 400 с результатом проверки каждого заказа. Заказы разделяются на заказы по магазинам со статусом
+        'new' и создаются массовой вставкой в одной транзакции (см. create_orders), при нехватке товара возвращается
+        ошибка со статусом 409. Оповещения покупателю и продавцам записываются в таблицу исходящих событий в той же
+        транзакции. Возвращает для каждого заказа список id созданных заказов по магазинам. Поддерживается заголовок
+        Idempotency-Key
+        """
+        orders = request.data.get('orders') if isinstance(request.data, dict) else None
+        if not isinstance(orders, list) or not orders:
+            return JsonResponse({'Status': False, 'Error': 'Не указаны все необходимые аргументы'}, status=400)
+        if len(orders) > settings.BULK_ORDERS_MAX:
+            return JsonResponse({'Status': False,
+                                 'Error': f'Не более {settings.BULK_ORDERS_MAX} заказов в одном запросе'}, status=400)
+        order_serializers = [BulkOrderSerializer(data=order) for order in orders]
+        errors = [{} if serializer.is_valid() else dict(serializer.errors) for serializer in order_serializers]
+        valid = [(serializer.validated_data, error) for serializer, error in zip(order_serializers, errors)
+                 if not error]
+        contact_ids = set(Contact.objects.filter(user_id=request.user.id, id__in={
+            order['contact'] for order, _ in valid}).values_list('id', flat=True))
+        product_ids = set(ShopProduct.objects.filter(id__in={
+            item['product_info'] for order, _ in valid for item in order['items']}).values_list('id', flat=True))
+        for order, error in valid:
+            if order['contact'] not in contact_ids:
+                error['contact'] = ['Контакт не найден']
+            missing = sorted({item['product_info'] for item in order['items']} - product_ids)
+            if missing:
+                error['items'] = [f'Товары не найдены: {missing}']
+        if any(errors):
+            return JsonResponse({'Status': False, 'Error': 'Ошибка в данных заказов',
+                                 'Заказы': [{'index': index, 'Status': not error, 'Errors': error}
+                                            for index, error in enumerate(errors)]}, status=400)
+        try:
+            with transaction.atomic():
+                results = create_orders(request.user.id,
+                                        [serializer.validated_data for serializer in order_serializers])
+                sub_orders = [sub_order for result in results for sub_order in result]
+                order_ids = [sub_order['order_id'] for sub_order in sub_orders]
+                enqueue(new_order_task, user_id=request.user.id, order_ids=order_ids)
+                transaction.on_commit(partial(publish_order_status, order_ids, 'new'))
+                for sub_order in sub_orders:
+                    if sub_order['seller_id']:
+                        enqueue(new_order_for_seller_task, user_id=sub_order['seller_id'],
+                                order_id=sub_order['order_id'])
+        except OutOfStock as error:
+            return JsonResponse({'Status': False, 'Error': 'Недостаточно товара на складе',
+                                 'Товары': error.product_ids}, status=409)
+        return JsonResponse({'Status': True, 'Заказы': [
+            {'index': index, 'Status': True, 'Заказы': [sub_order['order_id'] for sub_order in result]}
+            for index, result in enumerate(results)]}, status=201)
+
+
+class SellerOrderViewSet(OrderListMixin, ModelViewSet):
     """
     Класс для продавцов для работы с заказами пользователей. Доступен http method get, put. За аутентификацию отвечает
-    класс TokenAuthentication
+    класс CachedTokenAuthentication. Список заказов возвращается в кратком виде (см. OrderListMixin)
     """
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
         """
         HTTP method get. Метод для получения информации о заказах пользователя. После проверки методом
         is_authenticated возвращается все экземлпяры класса Order с любым статусом, но не 'basket' относящиеся к
-        продавцу выполневшему запрос. За сериализацию данных отвечает класс OrderSerializer.
+        продавцу выполневшему запрос. За сериализацию данных отвечает класс OrderSummarySerializer или
+        OrderSerializer.
         """
         if self.request.user.type != 'seller':
             return JsonResponse({'Status': False, 'Error': 'Только для магазинов'}, status=403)
-        queryset = Order.objects.exclude(status='basket').prefetch_related(
-            'ordered_items').filter(ordered_items__product_info__shop__seller__id=self.request.user.id).annotate(
-            total_sum=Sum(F('ordered_items__quantity') * F('ordered_items__product_info__price'))).distinct()
-        return queryset
+        queryset = Order.objects.exclude(status='basket').filter(shop__seller_id=self.request.user.id)
+        return self.with_items(queryset)
+
+    def _change_status(self, order_ids, status, versions=None):
+        """
+        Метод для изменения статуса заказов магазина продавца, выполневшего запрос. Статус меняется только у заказов
+        магазина продавца, только при допустимом переходе STATUS_TRANSITIONS и только если заказ не был изменен
+        другим пользователем (versions - словарь {id заказа: версия}, см. OrderQuerySet.transition). Для заказов с
+        измененным статусом в той же транзакции в таблицу исходящих событий записывается один celery task
+        orders_status_change_task. Возвращает список id заказов с измененным статусом
+        """
+        with transaction.atomic():
+            updated_ids = Order.objects.filter(id__in=order_ids, shop__seller_id=self.request.user.id). \
+                transition(status, versions)
+            if updated_ids:
+                enqueue(orders_status_change_task, user_id=self.request.user.id, order_ids=updated_ids)
+        return updated_ids
 
     @action(methods=['put'], detail=False)
     def put(self, request, *args, **kwargs):
         """
         HTTP method put. Метод для изменения статуса заказа продавцом. После проверки методом
-        is_authenticated происходит проверка типа пользователя. При нахождении записи в БД с запрашиваемым
-        id обновляется статус заказа. После обновления статуса заказа вызывается celery task order_status_change_task
-        Для оповещения продавца и покупателя об изменении статуса заказа.
-        За сериализацию данных отвечает класс OrderItemSerializer
+        is_authenticated происходит проверка типа пользователя. При нахождении заказа магазина продавца с запрашиваемым
+        id и допустимом переходе обновляется статус заказа, при отмене заказа товары возвращаются на склад. После
+        обновления статуса заказа вызывается celery task orders_status_change_task для оповещения продавца и
+        покупателя об изменении статуса заказа. При недопустимом переходе возвращается ошибка со статусом 409.
+        Необязательное поле version - версия заказа, которую видел продавец: если заказ был изменен после ее
+        получения, возвращается ошибка со статусом 409 с текущими статусом и версией заказа
         """
         if request.user.type != 'seller':
             return JsonResponse({'Status': False, 'Error': 'Только для магазинов'}, status=403)
-        if 'id' and 'status' in self.request.data:
-            try:
-                order = Order.objects.filter(id=self.request.data['id']).update(status=self.request.
-                                                                                    data['status'])
-                buyer = Order.objects.filter(id=self.request.data['id']).first()
-                order_status_change_task.delay(user_id=self.request.user.id,
-                                                   order_id=self.request.data['id'],
-                                                   buyer_id=buyer.user_id)
-                return JsonResponse({"Status": True, "Статус заказа обновлен": self.request.data['status']}, status=201)
-            except IntegrityError:
-                return JsonResponse({'Status': False, 'Возникла ошибка!': "Некоректный формат данных"}, status=403)
+        if {'id', 'status'}.issubset(self.request.data) and str(self.request.data['id']).isdigit():
+            if self.request.data['status'] not in STATUS_TRANSITIONS:
+                return JsonResponse({'Status': False, 'Error': 'Недопустимый статус заказа'}, status=400)
+            order_id = int(self.request.data['id'])
+            versions = None
+            if 'version' in self.request.data:
+                if not str(self.request.data['version']).isdigit():
+                    return JsonResponse({'Status': False, 'Возникла ошибка!': "Некоректный формат данных"},
+                                        status=400)
+                versions = {order_id: int(self.request.data['version'])}
+            if self._change_status([order_id], self.request.data['status'], versions):
+                return JsonResponse({"Status": True, "Статус заказа обновлен": self.request.data['status'],
+                                     "Версия": Order.objects.get(id=order_id).version}, status=201)
+            order = Order.objects.filter(id=order_id, shop__seller_id=request.user.id).values('status', 'version').first()
+            if order and versions and order['version'] != versions[order_id]:
+                return JsonResponse({'Status': False, 'Error': 'Заказ был изменен другим пользователем',
+                                     'Статус': order['status'], 'Версия': order['version']}, status=409)
+            return JsonResponse({'Status': False, 'Error': 'Недопустимое изменение статуса заказа'}, status=409)
         else:
             return JsonResponse({'Status': False, 'Возникла ошибка!': "Некоректный формат данных"}, status=403)
 
+    @action(methods=['put'], detail=False, url_path='bulk')
+    def bulk(self, request, *args, **kwargs):
+        """
+        HTTP method put. Метод для массового изменения статуса заказов продавцом. В теле запроса должны присутствовать
+        поля ids (список id заказов или строка с id через запятую) и status. Статус меняется одним условным запросом
+        UPDATE у заказов магазина продавца, для которых переход допустим, остальные заказы пропускаются. Оповещения
+        об изменении статуса отправляются одним celery task orders_status_change_task
+        """
+        if request.user.type != 'seller':
+            return JsonResponse({'Status': False, 'Error': 'Только для магазинов'}, status=403)
+        if not {'ids', 'status'}.issubset(self.request.data):
+            return JsonResponse({'Status': False, 'Error': 'Не указаны все необходимые аргументы'}, status=403)
+        ids = self.request.data['ids']
+        if isinstance(ids, str):
+            ids = ids.split(',')
+        order_ids = [int(order_id) for order_id in ids if str(order_id).strip().isdigit()]
+        if not order_ids:
+            return JsonResponse({'Status': False, 'Error': 'Не указаны все необходимые аргументы'}, status=403)
+        if self.request.data['status'] not in STATUS_TRANSITIONS:
+            return JsonResponse({'Status': False, 'Error': 'Недопустимый статус заказа'}, status=400)
+        updated_ids = self._change_status(order_ids, self.request.data['status'])
+        return JsonResponse({'Status': True, 'Обновлено объектов': len(updated_ids), 'Заказы': updated_ids,
+                             'Пропущено': sorted(set(order_ids) - set(updated_ids))}, status=200)
+
+    @action(methods=['get', 'put'], detail=False, url_path='digest')
+    def digest(self, request, *args, **kwargs):
+        """
+        HTTP method get, put. Метод для просмотра и изменения режима сводок оповещений магазина продавца. Поле
+        digest_window - интервал сводки в минутах: оповещения о новых заказах и изменениях статуса накапливаются и
+        отправляются одним письмом не чаще раза в digest_window минут, значение 0 отключает сводки (уже накопленные
+        оповещения отправляются при ближайшей проверке сводок)
+        """
+        if request.user.type != 'seller':
+            return JsonResponse({'Status': False, 'Error': 'Только для магазинов'}, status=403)
+        shop = Shop.objects.filter(seller_id=request.user.id).first()
+        if shop is None:
+            return JsonResponse({'Status': False, 'Error': 'Магазин не найден'}, status=404)
+        if request.method == 'PUT':
+            window = str(self.request.data.get('digest_window', ''))
+            if not window.isdigit():
+                return JsonResponse({'Status': False, 'Возникла ошибка!': "Некоректный формат данных"}, status=400)
+            shop.digest_window = int(window)
+            shop.save(update_fields=['digest_window'])
+        return JsonResponse({'Status': True, 'digest_window': shop.digest_window,
+                             'digest_sent_at': shop.digest_sent_at}, status=200)
+
+
+class SellerAnalytics(APIView):
+    """
+    Класс для получения продавцом статистики продаж его магазинов. Доступен http method get. За аутентификацию
+    отвечает класс CachedTokenAuthentication. Данные читаются только из сводных таблиц ShopSales и ProductSales, поэтому
+    время ответа не зависит от количества заказов
+    """
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = [IsAuthenticated]
+    top_default = 10
+    top_max = 100
+
+    def get(self, request, *args, **kwargs):
+        """
+        HTTP method get. Метод для получения выручки, количества заказов и проданных единиц товара по дням и списка
+        самых продаваемых товаров по выручке. Параметры запроса: date_from, date_to - границы периода в формате
+        ГГГГ-ММ-ДД, shop - id магазина продавца, top - количество товаров в списке (по умолчанию 10, от 1 до 100)
+        """
+        if request.user.type != 'seller':
+            return JsonResponse({'Status': False, 'Error': 'Только для магазинов'}, status=403)
+        lookup = {'shop__seller_id': request.user.id}
+        try:
+            if request.query_params.get('date_from'):
+                lookup['day__gte'] = date.fromisoformat(request.query_params['date_from'])
+            if request.query_params.get('date_to'):
+                lookup['day__lte'] = date.fromisoformat(request.query_params['date_to'])
+            if request.query_params.get('shop'):
+                lookup['shop_id'] = int(request.query_params['shop'])
+            top = min(int(request.query_params.get('top', self.top_default)), self.top_max)
+            if top < 1:
+                raise ValueError(top)
+        except ValueError:
+            return JsonResponse({'Status': False, 'Error': 'Некорректный формат данных'}, status=400)
+        days = ShopSales.objects.filter(**lookup).order_by('day').values('day').annotate(
+            orders_count=Sum('orders_count'), units=Sum('units'), revenue=Sum('revenue'))
+        products = ProductSales.objects.filter(**lookup).order_by().values('product_info_id').annotate(
+            units=Sum('units'), revenue=Sum('revenue')).order_by('-revenue', 'product_info_id')[:top]
+        names = dict(ProductSales.objects.filter(**lookup, product_info_id__in=[
+            product['product_info_id'] for product in products]).values_list('product_info_id', 'product_name'))
+        return JsonResponse({'Status': True, 'Продажи по дням': list(days),
+                             'Топ товаров': [dict(product, product_name=names[product['product_info_id']])
+                                             for product in products]}, status=200)
@@ -13,4 +13,19 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'orders.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from backend.events import order_events_app  # noqa: E402 (модели доступны только после инициализации django)
+
+EVENTS_PATH = '/events/orders'
+
+
+async def application(scope, receive, send):
+    """
+    ASGI-приложение проекта. Запросы к EVENTS_PATH обслуживаются потоком событий об изменении статуса заказов
+    order_events_app, остальные запросы - приложением django
+    """
+    if scope['type'] == 'http' and scope['path'].rstrip('/') == EVENTS_PATH:
+        await order_events_app(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
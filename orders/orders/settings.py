@@ -174,7 +174,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 REST_FRAMEWORK = {
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'backend.authentication.CachedTokenAuthentication',
     ],
 
     'DEFAULT_FILTER_BACKENDS': [
@@ -182,8 +182,8 @@ REST_FRAMEWORK = {
         'rest_framework.filters.SearchFilter',
     ],
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.AnonRateThrottle',
-        'rest_framework.throttling.UserRateThrottle'
+        'backend.throttling.SlidingWindowAnonRateThrottle',
+        'backend.throttling.SlidingWindowUserRateThrottle'
     ],
 
     'DEFAULT_THROTTLE_RATES': {
@@ -222,4 +222,133 @@ CELERY_RESULT_BACKEND = 'redis://' + REDIS_HOST + ':' + REDIS_PORT + '/0'
 CELERY_ACCEPT_CONTENT = ['application/json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
+REDIS_URL = 'redis://' + REDIS_HOST + ':' + REDIS_PORT + '/1'
 
+# Basket settings
+# Хранилище корзины: backend.basket.DatabaseBasketStore (Order/OrderItem) или backend.basket.RedisBasketStore
+
+BASKET_STORE = 'backend.basket.DatabaseBasketStore'
+BASKET_TTL = 60 * 60 * 24 * 30
+
+# Idempotency settings
+# Время хранения ответов на запросы с заголовком Idempotency-Key и время блокировки выполняющегося запроса
+
+IDEMPOTENCY_TTL = 60 * 60
+IDEMPOTENCY_LOCK_TTL = 60
+
+# Archive settings
+# Доставленные и отмененные заказы старше ORDER_ARCHIVE_AFTER_DAYS дней переносятся в сжатые файлы каталога
+# ORDER_ARCHIVE_ROOT пакетами по ORDER_ARCHIVE_BATCH_SIZE заказов
+
+ORDER_ARCHIVE_ROOT = os.path.join(BASE_DIR, 'archive')
+ORDER_ARCHIVE_AFTER_DAYS = 365
+ORDER_ARCHIVE_BATCH_SIZE = 1000
+
+# Outbox settings
+# Исходящие события передаются в celery каждые OUTBOX_RELAY_INTERVAL секунд пакетами по OUTBOX_BATCH_SIZE,
+# выполненные события хранятся OUTBOX_RETENTION_DAYS дней. Событие, не выполненное за OUTBOX_VISIBILITY_TIMEOUT
+# секунд после передачи, передается повторно, но не более OUTBOX_MAX_ATTEMPTS раз
+
+OUTBOX_RELAY_INTERVAL = 2
+OUTBOX_BATCH_SIZE = 500
+OUTBOX_RETENTION_DAYS = 7
+OUTBOX_VISIBILITY_TIMEOUT = 60 * 60
+OUTBOX_MAX_ATTEMPTS = 5
+
+# Bulk orders settings
+# Максимальное количество заказов в одном запросе оптового оформления заказов order/customer/bulk/
+
+BULK_ORDERS_MAX = 100
+
+# Events settings
+# Интервал в секундах между комментариями, поддерживающими соединение потока событий /events/orders (ASGI)
+
+EVENTS_KEEPALIVE = 15
+
+# Mail settings
+# Количество писем, после отправки которых постоянное соединение с почтовым сервером переоткрывается, и время простоя
+# в секундах, после которого соединение проверяется командой NOOP перед отправкой (см. backend.mail)
+
+MAIL_CONNECTION_MAX_MESSAGES = 100
+MAIL_CONNECTION_MAX_IDLE = 30
+
+# Языки шаблонов писем-оповещений (backend/templates/backend/email) и язык по умолчанию
+
+EMAIL_LANGUAGES = ('ru', 'en')
+EMAIL_DEFAULT_LANGUAGE = 'ru'
+
+# Mail rate limit settings
+# Корзины токенов для ограничения частоты отправки писем: общая для почтового провайдера (EMAIL_HOST) и отдельная для
+# каждого получателя. capacity - допустимый всплеск писем, per_second - скорость пополнения в письмах в секунду.
+# Если до появления токена нужно ждать дольше MAIL_RATE_LIMIT_MAX_WAIT секунд, письма откладываются в send_email_task.
+# Celery task оповещений повторяются при ошибках почтового сервера до MAIL_MAX_RETRIES раз с экспоненциальной
+# задержкой не более MAIL_RETRY_BACKOFF_MAX секунд, письма, оставшиеся после ошибки, откладываются на
+# MAIL_RETRY_DELAY секунд
+
+MAIL_PROVIDER_RATE_LIMIT = {'capacity': 50, 'per_second': 10}
+MAIL_RECIPIENT_RATE_LIMIT = {'capacity': 20, 'per_second': 0.2}
+MAIL_RATE_LIMIT_MAX_WAIT = 2
+MAIL_MAX_RETRIES = 8
+MAIL_RETRY_BACKOFF_MAX = 600
+MAIL_RETRY_DELAY = 10
+
+# Digest settings
+# Интервал в секундах между проверками сводок оповещений продавцов (окно сводки задается в магазине, см.
+# Shop.digest_window)
+
+DIGEST_CHECK_INTERVAL = 60
+
+# Auth token cache settings
+# Время в секундах, на которое пользователь кешируется в Redis по токену аутентификации. Кеш удаляется сразу при
+# выходе из аккаунта, смене пароля и деактивации пользователя
+
+AUTH_TOKEN_CACHE_TTL = 60
+
+# Auth token expiry settings
+# Токен аутентификации действует AUTH_TOKEN_TTL секунд, при авторизации токен старше AUTH_TOKEN_ROTATE_AFTER
+# секунд заменяется новым. Токен подтверждения email действует CONFIRM_EMAIL_TOKEN_TTL секунд, после чего
+# неподтвержденный пользователь удаляется. Устаревшие записи удаляются каждые AUTH_CLEANUP_INTERVAL секунд пакетами по
+# AUTH_CLEANUP_BATCH_SIZE
+
+AUTH_TOKEN_TTL = 60 * 60 * 24 * 7
+AUTH_TOKEN_ROTATE_AFTER = 60 * 60 * 24
+CONFIRM_EMAIL_TOKEN_TTL = 60 * 60 * 24 * 3
+AUTH_CLEANUP_INTERVAL = 60 * 60
+AUTH_CLEANUP_BATCH_SIZE = 1000
+
+# Price import settings
+# Пока выполняется загрузка прайса продавца, следующая загрузка повторяется каждые IMPORT_LOCK_RETRY_DELAY секунд,
+# не более IMPORT_MAX_RETRIES раз
+
+IMPORT_LOCK_RETRY_DELAY = 5
+IMPORT_MAX_RETRIES = 120
+
+# Account provisioning settings
+# Пароли аккаунтов из CSV-файла хешируются в PROVISION_HASH_WORKERS процессах, записи вставляются пакетами по
+# PROVISION_BATCH_SIZE
+
+PROVISION_HASH_WORKERS = os.cpu_count() or 1
+PROVISION_BATCH_SIZE = 500
+
+CELERY_BEAT_SCHEDULE = {
+    'archive-orders': {
+        'task': 'backend.tasks.archive_orders_task',
+        'schedule': 60 * 60 * 24,
+    },
+    'relay-outbox': {
+        'task': 'backend.tasks.relay_outbox_task',
+        'schedule': OUTBOX_RELAY_INTERVAL,
+    },
+    'purge-outbox': {
+        'task': 'backend.tasks.purge_outbox_task',
+        'schedule': 60 * 60 * 24,
+    },
+    'send-seller-digests': {
+        'task': 'backend.tasks.send_seller_digests_task',
+        'schedule': DIGEST_CHECK_INTERVAL,
+    },
+    'cleanup-auth': {
+        'task': 'backend.tasks.cleanup_auth_task',
+        'schedule': AUTH_CLEANUP_INTERVAL,
+    },
+}
@@ -1,8 +1,8 @@
 from django.contrib import admin
 from django.urls import path, include
-from backend.views import ShopUpload, RegisterAccount, ConfirmAccount, LoginAccount, CategoryViewSet, ShopViewSet, \
-    ProductViewSet, ShopProductViewSet, ProductInfViewSet, UserContact, AccountDetails, BasketViewSet, OrderViewSet, \
-    SellerOrderViewSet
+from backend.views import ShopUpload, RegisterAccount, ConfirmAccount, LoginAccount, LogoutAccount, CategoryViewSet, \
+    ShopViewSet, ProductViewSet, ShopProductViewSet, ProductInfViewSet, UserContact, AccountDetails, BasketViewSet, \
+    OrderViewSet, SellerOrderViewSet, SellerAnalytics
 from rest_framework.routers import DefaultRouter
 from drf_spectacular.views import SpectacularAPIView, SpectacularRedocView, SpectacularSwaggerView
 
@@ -25,8 +25,10 @@ urlpatterns += [path('shop/upload', ShopUpload.as_view(), name='shop-upload')]
 urlpatterns += [path('user/register', RegisterAccount.as_view(), name='user-register')]
 urlpatterns += [path('user/register/confirm', ConfirmAccount.as_view(), name='user-register-confirm')]
 urlpatterns += [path('user/login', LoginAccount.as_view(), name='user-login')]
+urlpatterns += [path('user/logout', LogoutAccount.as_view(), name='user-logout')]
 urlpatterns += [path('user/contact', UserContact.as_view(), name='user-contact')]
 urlpatterns += [path('user/info', AccountDetails.as_view(), name='user-info')]
+urlpatterns += [path('analytics/seller', SellerAnalytics.as_view(), name='seller-analytics')]
 urlpatterns += [path('accounts/', include('allauth.urls'), name='social-accounts')]
 urlpatterns += [path('api/schema/', SpectacularAPIView.as_view(), name='schema')]
 urlpatterns += [path('api/schema/swagger-ui/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui')]
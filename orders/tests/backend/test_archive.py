@@ -0,0 +1,77 @@
+import gzip
+import os
+import pytest
+from datetime import timedelta
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from backend.archive import archive_orders, find_archived_order
+from backend.models import *
+
+
+@pytest.fixture
+def archive_root(settings, tmp_path):
+    """
+    Фикстура для размещения файлов архива во временном каталоге
+    """
+    settings.ORDER_ARCHIVE_ROOT = str(tmp_path)
+    return tmp_path
+
+
+@pytest.mark.django_db
+class TestArchive:
+    """
+    Класс для тестирования переноса заказов в архив
+    """
+    url = 'http://127.0.0.1:8000/order/customer/'
+
+    def test_archive_orders(self, client, buyer_token, basket_create, archive_root):
+        """
+        Тест на перенос старых доставленных заказов в архив и получение их по id
+        Ожидаемый результат - старые заказы удалены из таблиц заказов и доступны из файлов архива, новые заказы и
+        корзина не перенесены
+        """
+        Order.objects.filter(id=basket_create[2]).update(status='delivered', dt=timezone.now() - timedelta(days=400))
+        Order.objects.filter(id=basket_create[2]).snapshot_prices()
+        previous_month = Order.objects.create(user_id=basket_create[3], status='canceled')
+        OrderItem.objects.create(order=previous_month, product_info_id=basket_create[0], quantity=2)
+        Order.objects.filter(id=previous_month.id).update(dt=timezone.now() - timedelta(days=450))
+        recent = Order.objects.create(user_id=basket_create[3], status='delivered')
+        basket = Order.objects.create(user_id=basket_create[3], status='basket')
+        assert archive_orders(days=30, batch_size=1) == 2
+        assert set(Order.objects.values_list('id', flat=True)) == {recent.id, basket.id}
+        assert not OrderItem.objects.filter(order_id__in=[basket_create[2], previous_month.id]).exists()
+        assert len(os.listdir(archive_root)) == 2
+        record = find_archived_order(basket_create[2])
+        assert (record['status'], record['total_sum']) == ('delivered', 400000)
+        assert record['ordered_items'][0]['quantity'] == 4
+        assert record['ordered_items'][0]['price'] == 100000
+        response = client.get(f'{self.url}{previous_month.id}/')
+        assert response.status_code == 200
+        assert response.json()['archived'] is True
+        assert response.json()['ordered_items'][0]['quantity'] == 2
+
+    def test_archive_file_is_gzip(self, basket_create, archive_root):
+        """
+        Тест на чтение файла архива, дописанного несколькими блоками, стандартными средствами gzip
+        Ожидаемый результат - все заказы месяца прочитаны из файла
+        """
+        old = timezone.now() - timedelta(days=400)
+        for _ in range(3):
+            Order.objects.create(user_id=basket_create[3], status='canceled')
+        Order.objects.exclude(status='basket').update(dt=old)
+        assert archive_orders(days=30, batch_size=2) == 3
+        with gzip.open(archive_root / f'orders-{old:%Y-%m}.jsonl.gz', 'rt') as file:
+            assert len(file.readlines()) == 3
+        assert ArchivedOrder.objects.values('offset').distinct().count() == 2
+
+    def test_archived_order_of_other_user(self, client, user_info, basket_create, archive_root):
+        """
+        Тест на получение заказа из архива другим пользователем
+        Ожидаемый результат - ошибка 404
+        """
+        Order.objects.filter(id=basket_create[2]).update(status='delivered', dt=timezone.now() - timedelta(days=400))
+        archive_orders(days=30)
+        other = User.objects.create_user(email='other@example.com', username='other', password=user_info['password'],
+                                         is_active=True)
+        client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=other).key}')
+        assert client.get(f'{self.url}{basket_create[2]}/').status_code == 404
@@ -0,0 +1,129 @@
+import pytest
+from datetime import timedelta
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from backend.authentication import token_cache_key
+from backend.cleanup import cleanup_auth
+from backend.models import User, ConfirmEmailToken
+from backend.redis_store import get_redis
+
+
+@pytest.mark.django_db
+class TestCachedTokenAuthentication:
+    """
+    Класс для тестирования CachedTokenAuthentication, LogoutAccount и смены токена в LoginAccount
+    """
+    url = 'http://127.0.0.1:8000/user/info'
+    logout_url = 'http://127.0.0.1:8000/user/logout'
+    login_url = 'http://127.0.0.1:8000/user/login'
+
+    def test_cached_user(self, client, user_create, django_assert_num_queries):
+        """
+        Тест на повторный запрос с тем же токеном
+        Ожидаемый результат - пользователь загружается из кеша без запросов к базе данных
+        """
+        token = Token.objects.create(user=user_create)
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        assert client.get(self.url).status_code == 200
+        assert get_redis().get(token_cache_key(token.key)) is not None
+        with django_assert_num_queries(0):
+            response = client.get(self.url)
+        assert response.status_code == 200
+        assert response.json()['email'] == user_create.email
+
+    def test_logout(self, client, user_create):
+        """
+        Тест на выход из аккаунта
+        Ожидаемый результат - токен удален из базы данных и кеша, запрос с ним отклонен
+        """
+        token = Token.objects.create(user=user_create)
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        assert client.get(self.url).status_code == 200
+        response = client.post(self.logout_url)
+        assert response.status_code == 200
+        assert response.json()['Status'] is True
+        assert not Token.objects.filter(key=token.key).exists()
+        assert get_redis().get(token_cache_key(token.key)) is None
+        assert client.get(self.url).status_code == 401
+
+    def test_deactivated_user(self, client, user_create):
+        """
+        Тест на запрос после деактивации пользователя
+        Ожидаемый результат - кеш пользователя удален, запрос отклонен
+        """
+        token = Token.objects.create(user=user_create)
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        assert client.get(self.url).status_code == 200
+        user_create.is_active = False
+        user_create.save()
+        assert get_redis().get(token_cache_key(token.key)) is None
+        assert client.get(self.url).status_code == 401
+
+    def test_password_change(self, client, seller_token):
+        """
+        Тест на запрос после смены пароля
+        Ожидаемый результат - кеш пользователя удален, следующий запрос получает пользователя с новым паролем
+        """
+        key = Token.objects.get().key
+        assert client.post(self.url, data={'password': '!Q@W#E$R%T^T12'}).status_code == 201
+        assert get_redis().get(token_cache_key(key)) is None
+        assert client.get(self.url).status_code == 200
+
+    def test_expired_token(self, client, user_create, settings):
+        """
+        Тест на запрос с токеном старше AUTH_TOKEN_TTL
+        Ожидаемый результат - запрос отклонен, в том числе при токене в кеше
+        """
+        token = Token.objects.create(user=user_create)
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        assert client.get(self.url).status_code == 200
+        Token.objects.filter(key=token.key).update(created=timezone.now() - timedelta(days=8))
+        assert client.get(self.url).status_code == 200
+        get_redis().delete(token_cache_key(token.key))
+        assert client.get(self.url).status_code == 401
+        settings.AUTH_TOKEN_TTL = 60 * 60 * 24 * 30
+        assert client.get(self.url).status_code == 200
+        settings.AUTH_TOKEN_TTL = 60
+        response = client.get(self.url)
+        assert response.status_code == 401
+        assert response.json()['detail'] == 'Token has expired.'
+
+    def test_login_rotates_token(self, client, user_create, user_info):
+        """
+        Тест на авторизацию пользователя со старым токеном
+        Ожидаемый результат - свежий токен возвращается повторно, токен старше AUTH_TOKEN_ROTATE_AFTER заменяется новым
+        """
+        data = {'email': user_create.email, 'password': user_info['password']}
+        key = client.post(self.login_url, data=data).json()['Token']
+        assert client.post(self.login_url, data=data).json()['Token'] == key
+        Token.objects.filter(key=key).update(created=timezone.now() - timedelta(days=2))
+        response = client.post(self.login_url, data=data).json()
+        assert response['Token'] != key
+        assert list(Token.objects.values_list('key', flat=True)) == [response['Token']]
+        assert response['Expires'] > timezone.now().isoformat()
+
+
+@pytest.mark.django_db
+def test_cleanup_auth(user_factory):
+    """
+    Тест на очистку устаревших данных аутентификации пакетами
+    Ожидаемый результат - удалены устаревшие токены, неподтвержденные пользователи и токены подтверждения email,
+    действующие токены и пользователи, деактивированные администратором, сохранены
+    """
+    old = timezone.now() - timedelta(days=10)
+    active = user_factory(is_active=True)
+    expired = [Token.objects.create(user=user_factory(is_active=True)) for _ in range(3)]
+    Token.objects.filter(key__in=[token.key for token in expired]).update(created=old)
+    fresh = Token.objects.create(user=active)
+    unconfirmed = [user_factory(is_active=False) for _ in range(3)]
+    for user in unconfirmed:
+        ConfirmEmailToken.objects.create(user=user)
+    ConfirmEmailToken.objects.filter(user__in=unconfirmed[:2]).update(created_at=old)
+    deactivated = user_factory(is_active=False, date_joined=old)
+    stale = ConfirmEmailToken.objects.create(user=active)
+    ConfirmEmailToken.objects.filter(id=stale.id).update(created_at=old)
+    assert cleanup_auth(batch_size=2) == {'tokens': 3, 'users': 2, 'confirm_email_tokens': 1}
+    assert list(Token.objects.values_list('key', flat=True)) == [fresh.key]
+    assert set(User.objects.values_list('id', flat=True)) == {user.id for user in [active, deactivated, unconfirmed[2],
+                                                                                   *[token.user for token in expired]]}
+    assert list(ConfirmEmailToken.objects.values_list('user_id', flat=True)) == [unconfirmed[2].id]
@@ -0,0 +1,136 @@
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from django.db import connection, transaction
+from django.test.client import encode_multipart
+from backend.basket import RedisBasketStore
+from backend.models import *
+
+
+@pytest.fixture
+def redis_basket(settings):
+    """
+    Фикстура для переключения хранилища корзины на RedisBasketStore
+    """
+    settings.BASKET_STORE = 'backend.basket.RedisBasketStore'
+
+
+@pytest.mark.django_db
+class TestRedisBasket:
+    """
+    Класс для тестирования корзины, хранящейся в Redis
+    """
+    url = 'http://127.0.0.1:8000/basket/'
+    order_url = 'http://127.0.0.1:8000/order/customer/'
+    content_type = 'multipart/form-data; boundary=BoUnDaRyStRiNg'
+
+    def test_basket_post_and_get(self, client, buyer_token, shops_create, redis_basket):
+        """
+        Тест на добавление товара в корзину и получение ее содержимого
+        Ожидаемый результат - товар в корзине, объекты Order и OrderItem не создаются
+        """
+        data = [{"product_info": shops_create, "quantity": 4}]
+        response = client.post(self.url, data=data)
+        assert response.status_code == 201
+        assert Order.objects.count() == 0
+        assert OrderItem.objects.count() == 0
+        response = client.get(self.url)
+        assert response.status_code == 200
+        assert response.json()[0]['total_sum'] == 400000
+        assert response.json()[0]['ordered_items'][0]['quantity'] == 4
+
+    def test_basket_ignores_database_basket(self, client, buyer_token, shops_create, redis_basket):
+        """
+        Тест на получение корзины при наличии корзины пользователя в базе данных
+        Ожидаемый результат - корзина в базе данных не возвращается, товары добавлены в корзину в Redis
+        """
+        basket = Order.objects.create(user=User.objects.get(type='buyer'), status='basket')
+        client.post(self.url, data=[{"product_info": shops_create, "quantity": 4}])
+        assert client.get(f'{self.url}{basket.id}/').status_code == 404
+        assert client.get(self.url).json()[0]['ordered_items'][0]['quantity'] == 4
+        assert not basket.ordered_items.exists()
+
+    def test_basket_put_and_delete(self, client, buyer_token, shops_create, redis_basket):
+        """
+        Тест на изменение количества и удаление товара из корзины
+        Ожидаемый результат - подтверждение изменения и удаления товара
+        """
+        client.post(self.url, data=[{"product_info": shops_create, "quantity": 4}])
+        response = client.put(self.url, data=[{"product_info": shops_create, "quantity": 7}])
+        assert response.json()['Обновлено объектов'] == 1
+        assert client.get(self.url).json()[0]['ordered_items'][0]['quantity'] == 7
+        content = encode_multipart('BoUnDaRyStRiNg', {'items': shops_create})
+        response = client.delete(self.url, content, content_type=self.content_type)
+        assert response.status_code == 200
+        assert client.get(self.url).json()[0]['ordered_items'] == []
+
+    def test_basket_checkout(self, client, buyer_token, shops_create, redis_basket,
+                             django_capture_on_commit_callbacks):
+        """
+        Тест на оформление заказа из корзины
+        Ожидаемый результат - корзина записана в объекты Order и OrderItem и удалена из Redis после фиксации
+        транзакции
+        """
+        client.post(self.url, data=[{"product_info": shops_create, "quantity": 4}])
+        basket_id = client.get(self.url).json()[0]['id']
+        content = encode_multipart('BoUnDaRyStRiNg', {'id': basket_id})
+        with django_capture_on_commit_callbacks(execute=True):
+            response = client.post(self.order_url, content, content_type=self.content_type)
+        assert response.status_code == 201
+        order = Order.objects.get()
+        assert order.status == 'new'
+        item = order.ordered_items.get()
+        assert (item.quantity, item.price, item.shop_id) == (4, 100000, order.shop_id)
+        assert client.get(self.url).json() == []
+
+
+@pytest.fixture
+def redis_store_basket(buyer_token, shops_create):
+    """
+    Фикстура для создания корзины покупателя в Redis. Возвращает хранилище, id покупателя, id корзины и id товара
+    """
+    store = RedisBasketStore()
+    user_id = User.objects.get(type='buyer').id
+    store.add(user_id, [(shops_create, 4)])
+    return store, user_id, store.get(user_id)[0]['id'], shops_create
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_checkout(redis_store_basket):
+    """
+    Тест на одновременное оформление одной корзины в Redis несколькими запросами
+    Ожидаемый результат - корзина оформлена один раз, товар зарезервирован один раз, корзина удалена
+    """
+    store, user_id, basket_id, product_id = redis_store_basket
+    quantity = ShopProduct.objects.get(id=product_id).quantity
+
+    def checkout(_):
+        try:
+            return store.checkout(user_id, basket_id)
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(checkout, range(4)))
+    assert len([result for result in results if result]) == 1
+    assert Order.objects.count() == 1
+    assert ShopProduct.objects.get(id=product_id).quantity == quantity - 4
+    assert store.get(user_id) == []
+
+
+@pytest.mark.django_db(transaction=True)
+def test_checkout_rollback_keeps_basket(redis_store_basket):
+    """
+    Тест на откат транзакции, в которой оформлялась корзина в Redis
+    Ожидаемый результат - корзина сохранена и оформляется повторно, оформленная корзина не оформляется еще раз
+    """
+    store, user_id, basket_id, product_id = redis_store_basket
+    with pytest.raises(RuntimeError):
+        with transaction.atomic():
+            assert store.checkout(user_id, basket_id)
+            raise RuntimeError
+    assert not Order.objects.exists()
+    assert store.get(user_id)[0]['ordered_items'][0]['quantity'] == 4
+    assert store.checkout(user_id, basket_id)
+    assert store.get(user_id) == []
+    assert store.checkout(user_id, basket_id) is None
+    assert Order.objects.count() == 1
@@ -0,0 +1,93 @@
+import pytest
+from backend.models import *
+
+
+@pytest.mark.django_db
+class TestBulkOrders:
+    """
+    Класс для тестирования оптового оформления заказов
+    """
+    url = 'http://127.0.0.1:8000/order/customer/bulk/'
+
+    @pytest.fixture
+    def payload(self, buyer_token, shops_create):
+        """
+        Фикстура возвращающая данные двух заказов: первый - товары обоих магазинов, второй - товар одного магазина
+        """
+        contact = Contact.objects.get(user__type='buyer')
+        products = list(ShopProduct.objects.order_by('id').values_list('id', flat=True))
+        return {'orders': [
+            {'contact': contact.id, 'items': [{'product_info': products[0], 'quantity': 2},
+                                              {'product_info': products[1], 'quantity': 3}]},
+            {'contact': contact.id, 'items': [{'product_info': products[1], 'quantity': 1}]},
+        ]}
+
+    def test_bulk_create(self, client, payload):
+        """
+        Тест на оптовое оформление заказов
+        Ожидаемый результат - заказы по магазинам для каждого заказа, товар списан со склада, оповещения записаны
+        """
+        response = client.post(self.url, payload)
+        assert response.status_code == 201
+        results = response.json()['Заказы']
+        assert [len(result['Заказы']) for result in results] == [2, 1]
+        orders = Order.objects.filter(status='new')
+        assert orders.count() == 3
+        assert set(orders.values_list('contact_id', flat=True)) == {payload['orders'][0]['contact']}
+        order = Order.objects.get(id=results[1]['Заказы'][0])
+        assert (order.items_count, order.total_sum) == (1, 100000)
+        assert order.ordered_items.get().product_name
+        products = payload['orders'][0]['items']
+        assert ShopProduct.objects.get(id=products[0]['product_info']).quantity == 98
+        assert ShopProduct.objects.get(id=products[1]['product_info']).quantity == 96
+        assert OutboxEvent.objects.filter(task='backend.tasks.new_order_task').count() == 1
+        assert OutboxEvent.objects.filter(task='backend.tasks.new_order_for_seller_task').count() == 3
+
+    def test_bulk_invalid_order(self, client, payload):
+        """
+        Тест на оптовое оформление заказов с ошибкой в одном из заказов
+        Ожидаемый результат - ошибка с результатом проверки каждого заказа, ни один заказ не создан
+        """
+        payload['orders'][1]['items'][0]['quantity'] = 0
+        payload['orders'][0]['contact'] = Contact.objects.order_by('-id').first().id + 1
+        response = client.post(self.url, payload)
+        assert response.status_code == 400
+        results = response.json()['Заказы']
+        assert [result['Status'] for result in results] == [False, False]
+        assert 'quantity' in results[1]['Errors']['items'][0]
+        assert not Order.objects.exclude(status='basket').exists()
+
+    def test_bulk_unknown_contact(self, client, payload, user_factory, contact_factory):
+        """
+        Тест на оптовое оформление заказа с контактом другого пользователя
+        Ожидаемый результат - ошибка только у заказа с чужим контактом, ни один заказ не создан
+        """
+        other = contact_factory(user=user_factory())
+        payload['orders'][1]['contact'] = other.id
+        response = client.post(self.url, payload)
+        assert response.status_code == 400
+        assert [result['Status'] for result in response.json()['Заказы']] == [True, False]
+        assert not Order.objects.exclude(status='basket').exists()
+
+    def test_bulk_out_of_stock(self, client, payload):
+        """
+        Тест на оптовое оформление заказов при нехватке товара с учетом всех заказов запроса
+        Ожидаемый результат - ошибка, ни один заказ не создан, склад не изменен
+        """
+        product_id = payload['orders'][1]['items'][0]['product_info']
+        ShopProduct.objects.filter(id=product_id).update(quantity=3)
+        response = client.post(self.url, payload)
+        assert response.status_code == 409
+        assert response.json()['Товары'] == [product_id]
+        assert not Order.objects.exclude(status='basket').exists()
+        assert ShopProduct.objects.get(id=product_id).quantity == 3
+
+    def test_bulk_limit(self, client, payload, settings):
+        """
+        Тест на превышение количества заказов в одном запросе
+        Ожидаемый результат - ошибка
+        """
+        settings.BULK_ORDERS_MAX = 1
+        response = client.post(self.url, payload)
+        assert response.status_code == 400
+        assert not Order.objects.exists()
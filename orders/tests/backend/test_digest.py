@@ -0,0 +1,122 @@
+import smtplib
+import pytest
+from datetime import timedelta
+from django.core import mail
+from django.utils import timezone
+from mock import patch
+from backend.digest import send_digests
+from backend.models import *
+from backend.tasks import new_order_for_seller_task, orders_status_change_task, send_email_task
+
+
+@pytest.mark.django_db
+class TestSellerDigest:
+    """
+    Класс для тестирования сводок оповещений продавцов
+    """
+    url = 'http://127.0.0.1:8000/order/seller/digest/'
+
+    def test_digest_buffers_and_sends(self, order_create, django_assert_num_queries):
+        """
+        Тест на накопление оповещений продавца и отправку сводки
+        Ожидаемый результат - письма продавцу не отправляются, сводка с новым заказом и изменением статуса отправлена
+        одним письмом, накопленные оповещения удалены
+        """
+        order = Order.objects.select_related('shop__seller').get(id=order_create[1])
+        Shop.objects.filter(id=order.shop_id).update(digest_window=15,
+                                                     digest_sent_at=timezone.now() - timedelta(minutes=16))
+        new_order_for_seller_task(order.shop.seller_id, order.id)
+        Order.objects.filter(id=order.id).update(status='confirmed')
+        orders_status_change_task(order.shop.seller_id, [order.id])
+        assert [message.to for message in mail.outbox] == [[order.user.email]]
+        assert DigestEvent.objects.filter(shop_id=order.shop_id).count() == 2
+        mail.outbox.clear()
+        # магазины со сводкой, блокировка магазина, оповещения с заказами, удаление, отметка времени и
+        # точка сохранения транзакции
+        with django_assert_num_queries(7):
+            assert send_digests() == 1
+        assert len(mail.outbox) == 1
+        assert mail.outbox[0].to == [order.shop.seller.email]
+        assert f'Заказ {order.id}: Подтвержден' in mail.outbox[0].body
+        assert not DigestEvent.objects.exists()
+
+    def test_digest_window(self, order_create):
+        """
+        Тест на отправку сводки не чаще раза в интервал сводки
+        Ожидаемый результат - сводка не отправлена, пока интервал с предыдущей сводки не истек
+        """
+        order = Order.objects.get(id=order_create[1])
+        Shop.objects.filter(id=order.shop_id).update(digest_window=15, digest_sent_at=timezone.now())
+        DigestEvent.objects.create(shop_id=order.shop_id, order=order, status='new')
+        assert send_digests() == 0
+        Shop.objects.filter(id=order.shop_id).update(digest_sent_at=timezone.now() - timedelta(minutes=16))
+        assert send_digests() == 1
+        assert send_digests() == 0
+
+    def test_first_digest_window(self, order_create):
+        """
+        Тест на отправку первой сводки магазина
+        Ожидаемый результат - сводка не отправлена, пока интервал с первого накопленного оповещения не истек
+        """
+        order = Order.objects.get(id=order_create[1])
+        Shop.objects.filter(id=order.shop_id).update(digest_window=15)
+        event = DigestEvent.objects.create(shop_id=order.shop_id, order=order, status='new')
+        assert send_digests() == 0
+        DigestEvent.objects.filter(id=event.id).update(created_at=timezone.now() - timedelta(minutes=16))
+        assert send_digests() == 1
+        assert Shop.objects.get(id=order.shop_id).digest_sent_at is not None
+
+    def test_digest_flushed_when_disabled(self, order_create):
+        """
+        Тест на отключение сводок при накопленных оповещениях
+        Ожидаемый результат - накопленные оповещения отправлены сводкой при ближайшей проверке и удалены
+        """
+        order = Order.objects.get(id=order_create[1])
+        Shop.objects.filter(id=order.shop_id).update(digest_window=0, digest_sent_at=timezone.now())
+        DigestEvent.objects.create(shop_id=order.shop_id, order=order, status='new')
+        assert send_digests() == 1
+        assert len(mail.outbox) == 1
+        assert not DigestEvent.objects.exists()
+
+    def test_digest_server_error(self, order_create, django_capture_on_commit_callbacks):
+        """
+        Тест на ошибку почтового сервера при отправке сводки
+        Ожидаемый результат - письмо отправляется после удаления накопленных оповещений, при ошибке сводка
+        отложена в send_email_task
+        """
+        order = Order.objects.select_related('shop__seller').get(id=order_create[1])
+        Shop.objects.filter(id=order.shop_id).update(digest_window=15,
+                                                     digest_sent_at=timezone.now() - timedelta(minutes=16))
+        DigestEvent.objects.create(shop_id=order.shop_id, order=order, status='new')
+
+        def send(messages):
+            assert not DigestEvent.objects.exists()
+            raise smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+
+        with patch('backend.digest.send_messages', side_effect=send), \
+                patch.object(send_email_task, 'apply_async') as deferred, \
+                django_capture_on_commit_callbacks(execute=True):
+            assert send_digests() == 1
+        (payload,), = deferred.call_args.args
+        assert [message['to'] for message in payload] == [[order.shop.seller.email]]
+
+    def test_digest_disabled(self, order_create):
+        """
+        Тест на оповещение продавца без сводок
+        Ожидаемый результат - письмо отправлено сразу, оповещение не накоплено
+        """
+        order = Order.objects.select_related('shop').get(id=order_create[1])
+        new_order_for_seller_task(order.shop.seller_id, order.id)
+        assert len(mail.outbox) == 1
+        assert not DigestEvent.objects.exists()
+
+    def test_digest_settings(self, client, order_create):
+        """
+        Тест на включение сводок оповещений продавцом
+        Ожидаемый результат - интервал сводки магазина продавца обновлен
+        """
+        response = client.put(self.url, {'digest_window': 30})
+        assert response.status_code == 200
+        assert response.json()['digest_window'] == 30
+        assert Order.objects.get(id=order_create[1]).shop.digest_window == 30
+        assert client.put(self.url, {'digest_window': 'often'}).status_code == 400
@@ -0,0 +1,118 @@
+import asyncio
+import json
+import time
+import pytest
+from asgiref.sync import sync_to_async
+from rest_framework.authtoken.models import Token
+from orders.asgi import application
+from backend.events import get_channel_layer
+from backend.models import *
+
+
+def events_scope(token=None, query_string=b''):
+    """
+    Функция для получения ASGI scope запроса к потоку событий
+    """
+    headers = [(b'authorization', f'Token {token}'.encode())] if token else []
+    return {'type': 'http', 'method': 'GET', 'path': '/events/orders', 'query_string': query_string,
+            'headers': headers}
+
+
+async def stream(scope, action, events=1):
+    """
+    Функция для получения сообщений потока событий. После открытия потока выполняется синхронная функция action,
+    поток закрывается после получения events событий
+    """
+    sent = []
+    connected = asyncio.Event()
+    disconnected = asyncio.Event()
+
+    async def receive():
+        await disconnected.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+        body = message.get('body', b'')
+        if body == b': connected\n\n':
+            connected.set()
+        if len([message for message in sent if message.get('body', b'').startswith(b'event:')]) == events:
+            disconnected.set()
+
+    task = asyncio.create_task(application(scope, receive, send))
+    await asyncio.wait_for(connected.wait(), 5)
+    await sync_to_async(action)()
+    await asyncio.wait_for(task, 5)
+    return sent
+
+
+def parse_events(sent):
+    """
+    Функция для получения данных событий из сообщений потока
+    """
+    return [json.loads(message['body'].decode().split('data: ')[1]) for message in sent
+            if message.get('body', b'').startswith(b'event:')]
+
+
+def test_events_without_token():
+    """
+    Тест на подключение к потоку событий без токена аутентификации
+    Ожидаемый результат - ошибка 401
+    """
+    sent = []
+
+    async def receive():
+        return {'type': 'http.request'}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(application(events_scope(), receive, send))
+    assert sent[0]['status'] == 401
+
+
+@pytest.mark.django_db(transaction=True)
+class TestOrderEvents:
+    """
+    Класс для тестирования потока событий об изменении статуса заказов
+    """
+
+    def test_seller_and_buyer_receive_status_change(self, order_create):
+        """
+        Тест на получение события об изменении статуса заказа продавцом и покупателем
+        Ожидаемый результат - оба пользователя получили событие с новым статусом заказа
+        """
+        order = Order.objects.select_related('shop').get(id=order_create[1])
+        seller_token = Token.objects.get(user_id=order.shop.seller_id).key
+
+        def confirm():
+            Order.objects.filter(id=order.id).transition('confirmed')
+
+        sent = asyncio.run(stream(events_scope(seller_token), confirm))
+        assert sent[0]['status'] == 200
+        assert dict(sent[0]['headers'])[b'content-type'] == b'text/event-stream'
+        assert parse_events(sent) == [{'event': 'order_status', 'order_id': order.id, 'status': 'confirmed'}]
+
+        def assemble():
+            Order.objects.filter(id=order.id).transition('assembled')
+
+        sent = asyncio.run(stream(events_scope(query_string=f'token={order_create[2]}'.encode()), assemble))
+        assert parse_events(sent)[0]['status'] == 'assembled'
+
+    def test_rejected_transition_sends_nothing(self, order_create, settings):
+        """
+        Тест на недопустимое изменение статуса заказа и поддержание соединения при отсутствии событий
+        Ожидаемый результат - событие отправлено только о допустимом изменении статуса, при отсутствии событий
+        передаются комментарии keepalive, после закрытия потока подписка удалена
+        """
+        settings.EVENTS_KEEPALIVE = 0.05
+
+        def change_status():
+            Order.objects.filter(id=order_create[1]).transition('delivered')
+            time.sleep(0.2)
+            Order.objects.filter(id=order_create[1]).transition('canceled')
+
+        sent = asyncio.run(stream(events_scope(order_create[2]), change_status))
+        assert [event['status'] for event in parse_events(sent)] == ['canceled']
+        assert {'type': 'http.response.body', 'body': b': keepalive\n\n', 'more_body': True} in sent
+        assert get_channel_layer()._groups == {}
@@ -0,0 +1,50 @@
+import pytest
+from django.test.client import encode_multipart
+from backend.models import *
+
+
+@pytest.mark.django_db
+class TestIdempotency:
+    """
+    Класс для тестирования повторных запросов с заголовком Idempotency-Key
+    """
+    basket_url = 'http://127.0.0.1:8000/basket/'
+    order_url = 'http://127.0.0.1:8000/order/customer/'
+    content_type = 'multipart/form-data; boundary=BoUnDaRyStRiNg'
+
+    def test_basket_post_retry(self, client, buyer_token, shops_create):
+        """
+        Тест на повторное добавление товара в корзину с тем же ключом идемпотентности
+        Ожидаемый результат - сохраненный ответ, товар добавлен один раз
+        """
+        data = [{"product_info": shops_create, "quantity": 4}]
+        first = client.post(self.basket_url, data=data, HTTP_IDEMPOTENCY_KEY='basket-1')
+        second = client.post(self.basket_url, data=data, HTTP_IDEMPOTENCY_KEY='basket-1')
+        assert first.status_code == second.status_code == 201
+        assert second.json() == first.json()
+        assert second['Idempotent-Replayed'] == 'true'
+        assert OrderItem.objects.count() == 1
+
+    def test_basket_post_key_reuse(self, client, buyer_token, shops_create):
+        """
+        Тест на использование ключа идемпотентности с другими данными запроса
+        Ожидаемый результат - ошибка
+        """
+        client.post(self.basket_url, data=[{"product_info": shops_create, "quantity": 4}],
+                    HTTP_IDEMPOTENCY_KEY='basket-1')
+        response = client.post(self.basket_url, data=[{"product_info": shops_create, "quantity": 5}],
+                               HTTP_IDEMPOTENCY_KEY='basket-1')
+        assert response.status_code == 422
+
+    def test_order_create_retry(self, client, buyer_token, basket_create):
+        """
+        Тест на повторное оформление заказа с тем же ключом идемпотентности
+        Ожидаемый результат - уведомления поставлены в очередь один раз
+        """
+        content = encode_multipart('BoUnDaRyStRiNg', {'id': basket_create[2]})
+        for _ in range(2):
+            response = client.post(self.order_url, content, content_type=self.content_type,
+                                   HTTP_IDEMPOTENCY_KEY='order-1')
+            assert response.status_code == 201
+        assert OutboxEvent.objects.filter(task='backend.tasks.new_order_task').count() == 1
+        assert OutboxEvent.objects.filter(task='backend.tasks.new_order_for_seller_task').count() == 1
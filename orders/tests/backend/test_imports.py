@@ -0,0 +1,93 @@
+import os
+import threading
+import pytest
+from celery.exceptions import Retry
+from django.db import connection, transaction
+from mock import patch
+from orders.settings import BASE_DIR
+from backend.imports import enqueue_import, acquire_import_lock
+from backend.models import Shop, ShopProduct
+from backend.tasks import handle_uploaded_file_task
+
+SHOP_FILE = os.path.join(BASE_DIR, 'data', 'shop1.yaml')
+
+
+@pytest.mark.django_db
+def test_superseded_imports_skipped(user_factory):
+    """
+    Тест на несколько загрузок прайса продавца, поставленных в очередь подряд
+    Ожидаемый результат - загрузки, замененные более новой, пропущены, прайс обновлен только последней загрузкой
+    """
+    seller = user_factory(type='seller', is_active=True)
+    with patch.object(handle_uploaded_file_task, 'delay') as delay:
+        for _ in range(3):
+            enqueue_import(SHOP_FILE, seller.id)
+    assert [call.args[2] for call in delay.call_args_list] == [1, 2, 3]
+    with patch('backend.tasks.Shop.objects.update_or_create', wraps=Shop.objects.update_or_create) as update:
+        for call in delay.call_args_list:
+            assert handle_uploaded_file_task.apply(args=call.args).successful()
+    assert update.call_count == 1
+    assert Shop.objects.get().seller == seller
+    assert ShopProduct.objects.exists()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_import_waits_for_lock(user_factory):
+    """
+    Тест на загрузку прайса во время выполнения другой загрузки того же продавца
+    Ожидаемый результат - task повторяется позже без изменения прайса, после снятия блокировки прайс обновлен
+    """
+    seller = user_factory(type='seller', is_active=True)
+    locked, release = threading.Event(), threading.Event()
+
+    def hold_lock():
+        try:
+            with transaction.atomic():
+                acquire_import_lock(seller.id)
+                locked.set()
+                release.wait(10)
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=hold_lock)
+    thread.start()
+    locked.wait(10)
+    try:
+        with patch.object(handle_uploaded_file_task, 'retry', side_effect=Retry) as retry:
+            assert handle_uploaded_file_task.apply(args=(SHOP_FILE, seller.id)).state == 'RETRY'
+        assert retry.call_args.kwargs['countdown'] == 5
+        assert not Shop.objects.exists()
+    finally:
+        release.set()
+        thread.join()
+    assert handle_uploaded_file_task.apply(args=(SHOP_FILE, seller.id)).successful()
+    assert Shop.objects.get().seller == seller
+
+
+@pytest.mark.django_db
+def test_import_foreign_shop_rejected(user_factory, shop_factory):
+    """
+    Тест на загрузку прайса с названием магазина другого продавца
+    Ожидаемый результат - загрузка отклонена, магазин и его товары не изменены
+    """
+    owner = user_factory(type='seller', is_active=True)
+    shop = shop_factory(name='Связной', seller=owner)
+    intruder = user_factory(type='seller', is_active=True)
+    result = handle_uploaded_file_task.apply(args=(SHOP_FILE, intruder.id)).result
+    assert result['Status'] is False
+    assert Shop.objects.get().seller == owner
+    assert not ShopProduct.objects.filter(shop=shop).exists()
+    assert not Shop.objects.filter(seller=intruder).exists()
+
+
+@pytest.mark.django_db
+def test_import_renames_own_shop(user_factory, shop_factory):
+    """
+    Тест на загрузку прайса продавцом, магазин которого назван иначе, чем в файле
+    Ожидаемый результат - магазин продавца переименован, новый магазин не создан
+    """
+    seller = user_factory(type='seller', is_active=True)
+    shop = shop_factory(name='Старое название', seller=seller)
+    assert handle_uploaded_file_task.apply(args=(SHOP_FILE, seller.id)).successful()
+    assert list(Shop.objects.values_list('id', 'name')) == [(shop.id, 'Связной')]
+    assert ShopProduct.objects.filter(shop=shop).exists()
@@ -0,0 +1,81 @@
+import os
+import pytest
+from django.db import connection
+from backend.basket import DatabaseBasketStore
+from backend.models import *
+from backend.tasks import handle_uploaded_file_task
+from orders.settings import BASE_DIR
+
+
+def plan(queryset):
+    """
+    Функция для получения плана выполнения запроса. Последовательное и bitmap сканирование отключаются, чтобы на
+    небольших тестовых таблицах и при статистике, собранной autovacuum во время предыдущих тестов, планировщик
+    выбирал индексы так же, как на рабочих объемах данных
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('SET LOCAL enable_seqscan = off')
+        cursor.execute('SET LOCAL enable_bitmapscan = off')
+    return queryset.explain()
+
+
+@pytest.mark.django_db
+class TestQueryPlans:
+    """
+    Класс для проверки использования индексов основными запросами представлений и загрузки прайса
+    """
+
+    def test_basket_and_orders_use_user_status_index(self, basket_create):
+        """
+        Тест на использование индекса (user, status) запросами корзины и заказов покупателя
+        Ожидаемый результат - индекс order_user_status_idx в плане запроса
+        """
+        assert 'order_user_status_idx' in plan(DatabaseBasketStore.queryset(basket_create[3]))
+        assert 'order_user_status_idx' in plan(Order.objects.filter(user_id=basket_create[3]).exclude(status='basket'))
+
+    def test_seller_orders_use_shop_status_index(self, order_create):
+        """
+        Тест на использование индекса (shop, status) запросом заказов продавца
+        Ожидаемый результат - индекс order_shop_status_idx в плане запроса
+        """
+        shop = Order.objects.get(id=order_create[1]).shop
+        queryset = Order.objects.filter(shop_id=shop.id).exclude(status='basket')
+        assert 'order_shop_status_idx' in plan(queryset)
+
+    def test_basket_item_lookup_uses_unique_index(self, basket_create):
+        """
+        Тест на использование ограничения уникальности (order, product_info) при поиске позиции корзины
+        Ожидаемый результат - индекс unique_order_item в плане запроса
+        """
+        queryset = OrderItem.objects.filter(order_id=basket_create[2], product_info_id=basket_create[0])
+        assert 'unique_order_item' in plan(queryset)
+
+    def test_importer_lookups_use_indexes(self, shops_create):
+        """
+        Тест на использование индексов запросами загрузки прайса
+        Ожидаемый результат - индексы товара магазина, товара и информации о товаре в планах запросов
+        """
+        shop_product = ShopProduct.objects.get(id=shops_create)
+        assert 'unique_shop_product_ext_id' in plan(ShopProduct.objects.filter(shop=shop_product.shop,
+                                                                               ext_id=shop_product.ext_id))
+        product = shop_product.product
+        assert 'product_name_model_idx' in plan(Product.objects.filter(name=product.name, model=product.model))
+        parameter = Parameter.objects.first()
+        assert 'unique_product_parameter' in plan(ProductInf.objects.filter(product=product, parameter=parameter))
+        assert 'backend_parameter_name' in plan(Parameter.objects.filter(name=parameter.name))
+
+
+@pytest.mark.django_db
+def test_repeated_import_updates_price(user_create):
+    """
+    Тест на повторную загрузку прайса магазина с измененной ценой
+    Ожидаемый результат - товары магазина обновлены без создания дубликатов
+    """
+    shop_file = os.path.join(BASE_DIR, 'data', 'shop1.yaml')
+    handle_uploaded_file_task(shop_file, user_create.id)
+    count = ShopProduct.objects.count()
+    ShopProduct.objects.update(price=1)
+    handle_uploaded_file_task(shop_file, user_create.id)
+    assert ShopProduct.objects.count() == count
+    assert not ShopProduct.objects.filter(price=1).exists()
+    assert ProductInf.objects.count() == ProductInf.objects.values('product', 'parameter').distinct().count()
@@ -0,0 +1,204 @@
+import socketserver
+import threading
+import time
+import pytest
+from types import SimpleNamespace
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.template import Context, Engine
+from django.template.loaders.filesystem import Loader
+from mock import patch
+from backend.mail import MailDispatcher, TEMPLATES_DIR, render_message, render_for_users
+
+SMTP_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    """
+    Класс обработчика соединения локального заменителя SMTP-сервера. Поддерживает команды EHLO, HELO, MAIL, RCPT,
+    DATA, RSET, NOOP, QUIT. Приветствие отправляется с задержкой handshake_delay, имитирующей установку соединения
+    и рукопожатие TLS
+    """
+
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        time.sleep(server.handshake_delay)
+        self.reply('220 localhost')
+        received = 0
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode().strip().upper()
+            if command.startswith(('EHLO', 'HELO')):
+                self.reply('250 localhost')
+            elif command.startswith('DATA'):
+                self.reply('354 end with .')
+                while self.rfile.readline() not in (b'.\r\n', b''):
+                    pass
+                server.messages += 1
+                received += 1
+                self.reply('250 OK')
+                if server.drop_after and received >= server.drop_after:
+                    return
+            elif command.startswith('QUIT'):
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('250 OK')
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    """
+    Класс локального заменителя SMTP-сервера для тестов. Считает открытые соединения и принятые письма, при
+    drop_after закрывает соединение после указанного количества писем
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, handshake_delay=0.0, drop_after=None):
+        super().__init__(('127.0.0.1', 0), SMTPHandler)
+        self.handshake_delay = handshake_delay
+        self.drop_after = drop_after
+        self.connections = 0
+        self.messages = 0
+
+
+@pytest.fixture
+def smtp_server():
+    """
+    Фикстура для запуска локального заменителя SMTP-сервера. Возвращает фабрику серверов
+    """
+    servers = []
+
+    def factory(**kwargs):
+        server = SMTPStandIn(**kwargs)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+    yield factory
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def connection_kwargs(server):
+    return {'host': '127.0.0.1', 'port': server.server_address[1], 'username': '', 'password': '',
+            'use_tls': False, 'use_ssl': False, 'timeout': 5}
+
+
+def build_messages(count):
+    return [EmailMultiAlternatives(f'Заказ {number}', 'Статус заказа изменен', 'shop@example.com',
+                                   ['buyer@example.com']) for number in range(count)]
+
+
+def test_dispatcher_benchmark(smtp_server, record_property):
+    """
+    Тест производительности отправки писем: отдельное соединение на каждое письмо против постоянного соединения
+    MailDispatcher. Задержка приветствия сервера имитирует рукопожатие TLS. Количество писем в секунду записывается
+    в отчет теста (свойства per_message_per_second и pooled_per_second, см. --junitxml)
+    Ожидаемый результат - одно соединение вместо соединения на письмо
+    """
+    count = 30
+    server = smtp_server(handshake_delay=0.01)
+    started = time.perf_counter()
+    for message in build_messages(count):
+        message.connection = get_connection(SMTP_BACKEND, **connection_kwargs(server))
+        message.send()
+    per_message = count / (time.perf_counter() - started)
+    assert (server.connections, server.messages) == (count, count)
+
+    server = smtp_server(handshake_delay=0.01)
+    dispatcher = MailDispatcher(SMTP_BACKEND, **connection_kwargs(server))
+    started = time.perf_counter()
+    assert dispatcher.send(build_messages(count)) == count
+    pooled = count / (time.perf_counter() - started)
+    dispatcher.close()
+    assert (server.connections, server.messages) == (1, count)
+    record_property('per_message_per_second', round(per_message))
+    record_property('pooled_per_second', round(pooled))
+
+
+def test_dispatcher_reconnects(smtp_server):
+    """
+    Тест на отправку писем при разрыве соединения сервером
+    Ожидаемый результат - соединение переоткрыто, все письма отправлены по одному разу
+    """
+    server = smtp_server(drop_after=2)
+    dispatcher = MailDispatcher(SMTP_BACKEND, **connection_kwargs(server))
+    assert dispatcher.send(build_messages(5)) == 5
+    dispatcher.close()
+    assert (server.connections, server.messages) == (3, 5)
+
+
+def test_dispatcher_rotates_connection(smtp_server, settings):
+    """
+    Тест на переоткрытие соединения после MAIL_CONNECTION_MAX_MESSAGES писем
+    Ожидаемый результат - новое соединение на каждые MAIL_CONNECTION_MAX_MESSAGES писем
+    """
+    settings.MAIL_CONNECTION_MAX_MESSAGES = 2
+    server = smtp_server()
+    dispatcher = MailDispatcher(SMTP_BACKEND, **connection_kwargs(server))
+    assert dispatcher.send(build_messages(5)) == 5
+    dispatcher.close()
+    assert (server.connections, server.messages) == (3, 5)
+
+
+def seller_email_context():
+    order = SimpleNamespace(id=5, shop=SimpleNamespace(name='Магазин'),
+                            user=SimpleNamespace(first_name='Иван', last_name='Петров'))
+    items = [SimpleNamespace(product_name='Кабель <USB>', quantity=2, price=100)] * 10
+    contact = SimpleNamespace(phone='+79000000000', country='Russia', region='Moscow', zip=628000, city='Moscow',
+                              street='Lenin', house='21', building='', apartment='')
+    return {'order': order, 'items': items, 'contact': contact}
+
+
+def test_render_message_languages():
+    """
+    Тест на формирование письма по шаблону на языке получателя
+    Ожидаемый результат - тема и текст на языке получателя, HTML-версия экранирована, текстовая - нет
+    """
+    message = render_message('new_order_for_seller', seller_email_context(), ['seller@example.com'])
+    assert message.subject == 'Новый заказ 5'
+    assert 'Кабель <USB> - 2 шт. по цене 100' in message.body
+    html, mimetype = message.alternatives[0]
+    assert mimetype == 'text/html' and 'Кабель &lt;USB&gt;' in html
+    users = [SimpleNamespace(email='seller@example.com', language='en'),
+             SimpleNamespace(email='buyer@example.com', language='ru'),
+             SimpleNamespace(email='other@example.com', language='de')]
+    messages = render_for_users('new_order', {'order_ids': [1, 2]}, users)
+    assert [(message.subject, message.to) for message in messages] == [
+        ('Thank you for your order', ['seller@example.com']),
+        ('Cпасибо за заказ', ['buyer@example.com', 'other@example.com'])]
+
+
+def test_render_benchmark(record_property):
+    """
+    Тест производительности формирования писем: шаблоны, компилируемые при каждом письме, против скомпилированных
+    шаблонов, кешируемых в процессе. Время формирования письма записывается в отчет теста (свойства
+    uncached_render_us и cached_render_us, см. --junitxml)
+    Ожидаемый результат - без кеша шаблоны читаются при каждом письме, кешированные шаблоны повторно не читаются
+    """
+    count = 300
+    context = seller_email_context()
+    engine = Engine(dirs=[TEMPLATES_DIR], loaders=['django.template.loaders.filesystem.Loader'])
+    loads = patch.object(Loader, 'get_contents', autospec=True, side_effect=Loader.get_contents)
+    with loads as get_contents:
+        started = time.perf_counter()
+        for _ in range(count):
+            for suffix in ('txt', 'html'):
+                engine.get_template(f'backend/email/ru/new_order_for_seller.{suffix}').render(Context(context))
+        uncached = (time.perf_counter() - started) / count
+    assert get_contents.call_count >= 2 * count
+    render_message('new_order_for_seller', context, ['seller@example.com'])
+    with loads as get_contents:
+        started = time.perf_counter()
+        for _ in range(count):
+            render_message('new_order_for_seller', context, ['seller@example.com'])
+        cached = (time.perf_counter() - started) / count
+    assert get_contents.call_count == 0
+    record_property('uncached_render_us', round(uncached * 1e6))
+    record_property('cached_render_us', round(cached * 1e6))
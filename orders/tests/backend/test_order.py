@@ -47,4 +47,55 @@ class TestOrderViewSet:
             with patch('backend.tasks.new_order_for_seller_task') as mock_task2:
                 response = client.post(self.url,)
                 assert response.status_code == 403
-                assert response.json()['Error'] == 'Не указаны все необходимые аргументы'
\ No newline at end of file
+                assert response.json()['Error'] == 'Не указаны все необходимые аргументы'
+
+    def test_order_create_multiple_shops(self, client, buyer_token, basket_create):
+        """
+        Тест на оформление корзины с товарами из нескольких магазинов
+        Ожидаемый результат - отдельный заказ с контактом покупателя и одно оповещение продавца с id заказа для
+        каждого магазина
+        """
+        other_product = ShopProduct.objects.exclude(id=basket_create[0]).first()
+        OrderItem.objects.create(order_id=basket_create[2], product_info=other_product, quantity=2)
+        content = encode_multipart('BoUnDaRyStRiNg', {'id': basket_create[2]})
+        response = client.post(self.url, content, content_type=self.content_type)
+        assert response.status_code == 201
+        orders = Order.objects.filter(user_id=basket_create[3], status='new')
+        assert sorted(response.json()['Заказы']) == sorted(orders.values_list('id', flat=True))
+        assert {order.shop_id for order in orders} == set(Shop.objects.values_list('id', flat=True))
+        assert all(order.items_count == 1 for order in orders)
+        assert OutboxEvent.objects.filter(task='backend.tasks.new_order_task').count() == 1
+        seller_events = OutboxEvent.objects.filter(task='backend.tasks.new_order_for_seller_task')
+        assert seller_events.count() == 2
+        for event in seller_events:
+            order = Order.objects.get(id=event.kwargs['order_id'])
+            assert event.kwargs == {'user_id': order.shop.seller_id, 'order_id': order.id}
+            assert order.contact.user_id == basket_create[3]
+
+    def test_order_list_summary(self, client, buyer_token, basket_create):
+        """
+        Тест на получение списка заказов пользователя в кратком виде
+        Ожидаемый результат - заказы без позиций с суммой и количеством позиций
+        """
+        Order.objects.filter(id=basket_create[2]).update(status='new')
+        response = client.get(self.url)
+        assert response.status_code == 200
+        assert response.json() == [{'id': basket_create[2], 'dt': response.json()[0]['dt'], 'status': 'new',
+                                    'total_sum': 400000, 'items_count': 1, 'version': 0}]
+
+    def test_order_list_expand_items(self, client, buyer_token, basket_create, django_assert_max_num_queries):
+        """
+        Тест на получение списка заказов с позициями по параметру expand=items и на получение конкретного заказа
+        Ожидаемый результат - позиции заказов в ответе, число запросов не зависит от количества заказов
+        """
+        Order.objects.filter(id=basket_create[2]).update(status='new')
+        for _ in range(5):
+            order = Order.objects.create(user_id=basket_create[3], status='new')
+            OrderItem.objects.create(order=order, product_info_id=basket_create[0], quantity=1)
+        with django_assert_max_num_queries(8):
+            response = client.get(self.url, {'expand': 'items'})
+        assert response.status_code == 200
+        assert len(response.json()) == 6
+        assert all(len(order['ordered_items']) == 1 for order in response.json())
+        response = client.get(f'{self.url}{basket_create[2]}/')
+        assert response.json()['ordered_items'][0]['quantity'] == 4
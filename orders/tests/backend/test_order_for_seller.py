@@ -1,5 +1,6 @@
 import pytest
 from mock import patch
+from backend.models import *
 
 
 @pytest.mark.django_db
@@ -54,4 +55,51 @@ class TestSellerOrderViewSet:
             client.credentials(HTTP_AUTHORIZATION=f'Token {order_create[2]}')
             response = client.put(self.url, data,)
             assert response.status_code == 403
-            assert response.json()['Error'] == 'Только для магазинов'
\ No newline at end of file
+            assert response.json()['Error'] == 'Только для магазинов'
+
+    def test_order_put_invalid_transition(self, client, order_create):
+        """
+        Тест на недопустимое изменение статуса заказа (из нового сразу в доставленный)
+        Ожидаемый результат - ошибка, статус заказа не изменен
+        """
+        response = client.put(self.url, {"id": order_create[1], "status": "delivered"})
+        assert response.status_code == 409
+        assert Order.objects.get(id=order_create[1]).status == 'new'
+        assert not OutboxEvent.objects.exists()
+
+    def test_order_put_basket_to_new(self, client, order_create):
+        """
+        Тест на перевод корзины в новый заказ продавцом
+        Ожидаемый результат - ошибка, корзина переходит в новый заказ только при оформлении покупателем
+        """
+        Order.objects.filter(id=order_create[1]).update(status='basket')
+        response = client.put(self.url, {"id": order_create[1], "status": "new"})
+        assert response.status_code == 409
+        assert Order.objects.get(id=order_create[1]).status == 'basket'
+
+    def test_order_put_foreign_order(self, client, order_create):
+        """
+        Тест на изменение статуса заказа другого магазина
+        Ожидаемый результат - ошибка, статус заказа не изменен
+        """
+        Order.objects.filter(id=order_create[1]).update(shop=Shop.objects.exclude(orders__id=order_create[1])[0])
+        response = client.put(self.url, {"id": order_create[1], "status": "confirmed"})
+        assert response.status_code == 409
+        assert Order.objects.get(id=order_create[1]).status == 'new'
+
+    def test_order_bulk_put(self, client, order_create):
+        """
+        Тест на массовое изменение статуса заказов продавцом
+        Ожидаемый результат - статус изменен у заказов магазина с допустимым переходом, одно оповещение
+        """
+        order = Order.objects.get(id=order_create[1])
+        delivered = Order.objects.create(user=order.user, shop=order.shop, status='delivered')
+        data = {"ids": [order.id, delivered.id], "status": "confirmed"}
+        response = client.put(self.url + 'bulk/', data)
+        assert response.status_code == 200
+        assert response.json()['Заказы'] == [order.id]
+        assert response.json()['Пропущено'] == [delivered.id]
+        assert Order.objects.get(id=order.id).status == 'confirmed'
+        event = OutboxEvent.objects.get()
+        assert (event.task, event.kwargs) == ('backend.tasks.orders_status_change_task',
+                                              {'user_id': order.shop.seller_id, 'order_ids': [order.id]})
@@ -0,0 +1,62 @@
+import pytest
+from django.test.client import encode_multipart
+from backend.models import *
+
+
+@pytest.mark.django_db
+class TestOrderTotals:
+    """
+    Класс для тестирования пересчета общей суммы и количества позиций заказа
+    """
+    url = 'http://127.0.0.1:8000/basket/'
+    order_url = 'http://127.0.0.1:8000/order/customer/'
+    content_type = 'multipart/form-data; boundary=BoUnDaRyStRiNg'
+
+    def test_totals_on_basket_change(self, client, buyer_token, basket_create):
+        """
+        Тест на пересчет суммы корзины при изменении количества товара
+        Ожидаемый результат - новая сумма корзины
+        """
+        client.put(self.url, data=[{"product_info": basket_create[0], "quantity": 7}])
+        order = Order.objects.get(id=basket_create[2])
+        assert order.total_sum == 700000
+        assert order.items_count == 1
+
+    def test_totals_on_price_change(self, basket_create):
+        """
+        Тест на пересчет суммы заказа при изменении цены товара
+        Ожидаемый результат - сумма заказа рассчитана по новой цене
+        """
+        product_info = ShopProduct.objects.get(id=basket_create[0])
+        product_info.price = 50
+        product_info.save()
+        assert Order.objects.get(id=basket_create[2]).total_sum == 200
+
+    def test_totals_on_item_delete(self, basket_create):
+        """
+        Тест на пересчет суммы заказа при удалении позиции
+        Ожидаемый результат - нулевая сумма и количество позиций
+        """
+        OrderItem.objects.filter(id=basket_create[1]).delete()
+        order = Order.objects.get(id=basket_create[2])
+        assert order.total_sum == 0
+        assert order.items_count == 0
+
+    def test_price_snapshot_on_checkout(self, client, buyer_token, basket_create):
+        """
+        Тест на копирование цены, названия товара и магазина в позицию заказа при оформлении и на неизменность суммы
+        оформленного заказа при изменении цены товара
+        Ожидаемый результат - позиция заказа содержит цену на момент заказа, сумма заказа не изменилась
+        """
+        content = encode_multipart('BoUnDaRyStRiNg', {'id': basket_create[2]})
+        response = client.post(self.order_url, content, content_type=self.content_type)
+        assert response.status_code == 201
+        product_info = ShopProduct.objects.select_related('product').get(id=basket_create[0])
+        item = OrderItem.objects.get(id=basket_create[1])
+        assert (item.price, item.product_name, item.shop_id) == (product_info.price, product_info.product.name,
+                                                                 product_info.shop_id)
+        product_info.price = 50
+        product_info.save()
+        OrderItem.objects.filter(id=item.id).update(quantity=5)
+        Order.objects.filter(id=basket_create[2]).recalculate_totals()
+        assert Order.objects.get(id=basket_create[2]).total_sum == 500000
@@ -0,0 +1,116 @@
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from django.db import connection
+from backend.models import *
+
+
+@pytest.mark.django_db
+class TestOrderVersion:
+    """
+    Класс для тестирования изменения статуса заказа с проверкой версии
+    """
+    url = 'http://127.0.0.1:8000/order/seller/'
+    admin_url = 'http://127.0.0.1:8000/admin/backend/order/'
+
+    def test_put_with_version(self, client, order_create):
+        """
+        Тест на изменение статуса заказа продавцом с указанием актуальной версии заказа
+        Ожидаемый результат - статус изменен, версия заказа увеличена
+        """
+        response = client.put(self.url, {"id": order_create[1], "status": "confirmed", "version": 0})
+        assert response.status_code == 201
+        assert response.json()['Версия'] == 1
+        assert Order.objects.get(id=order_create[1]).version == 1
+
+    def test_put_with_stale_version(self, client, order_create):
+        """
+        Тест на изменение статуса заказа продавцом по устаревшей версии заказа
+        Ожидаемый результат - ошибка 409 с текущими статусом и версией заказа, статус не изменен
+        """
+        Order.objects.filter(id=order_create[1]).transition('confirmed')
+        response = client.put(self.url, {"id": order_create[1], "status": "canceled", "version": 0})
+        assert response.status_code == 409
+        assert response.json()['Error'] == 'Заказ был изменен другим пользователем'
+        assert (response.json()['Статус'], response.json()['Версия']) == ('confirmed', 1)
+        assert Order.objects.get(id=order_create[1]).status == 'confirmed'
+
+    def test_admin_change_with_stale_version(self, client, order_create):
+        """
+        Тест на изменение статуса заказа в админке django после изменения заказа другим пользователем
+        Ожидаемый результат - сообщение о конфликте, статус не изменен
+        """
+        admin_user = User.objects.create_superuser(email='admin@example.com', username='admin', password='admin',
+                                               is_active=True)
+        client.force_login(admin_user)
+        order = Order.objects.get(id=order_create[1])
+        data = {'user': order.user_id, 'shop': order.shop_id, 'status': 'canceled', 'total_sum': order.total_sum,
+                'items_count': order.items_count, 'version': order.version}
+        Order.objects.filter(id=order.id).transition('confirmed')
+        response = client.post(f'{self.admin_url}{order.id}/change/', data, format='multipart', follow=True)
+        assert 'был изменен другим пользователем' in response.content.decode()
+        assert Order.objects.get(id=order.id).status == 'confirmed'
+        data['version'] = 1
+        client.post(f'{self.admin_url}{order.id}/change/', data, format='multipart')
+        assert Order.objects.get(id=order.id).status == 'canceled'
+
+    def test_admin_changelist_status(self, client, order_create):
+        """
+        Тест на изменение статуса заказа в списке заказов админки django
+        Ожидаемый результат - статус изменен без проверки версии, версия заказа увеличена, недопустимый переход
+        отклонен
+        """
+        admin_user = User.objects.create_superuser(email='admin@example.com', username='admin', password='admin',
+                                                   is_active=True)
+        client.force_login(admin_user)
+        data = {'form-TOTAL_FORMS': 1, 'form-INITIAL_FORMS': 1, 'form-0-id': order_create[1],
+                'form-0-status': 'confirmed', '_save': 'Save'}
+        response = client.post(self.admin_url, data, format='multipart')
+        assert response.status_code == 302
+        order = Order.objects.get(id=order_create[1])
+        assert (order.status, order.version) == ('confirmed', 1)
+        data['form-0-status'] = 'new'
+        response = client.post(self.admin_url, data, format='multipart', follow=True)
+        assert 'Недопустимое изменение статуса заказа' in response.content.decode()
+        assert Order.objects.get(id=order_create[1]).status == 'confirmed'
+
+    def test_transition_single_update(self, order_create, django_assert_num_queries):
+        """
+        Тест на изменение статуса нескольких заказов с проверкой версий
+        Ожидаемый результат - статус изменен одним запросом UPDATE независимо от количества заказов, заказ с
+        устаревшей версией пропущен
+        """
+        order = Order.objects.get(id=order_create[1])
+        order_ids = [order.id] + [Order.objects.create(user_id=order.user_id, shop_id=order.shop_id, status='new').id
+                                  for _ in range(4)]
+        versions = dict.fromkeys(order_ids, 0)
+        Order.objects.filter(id=order_ids[-1]).update(version=1)
+        # точка сохранения транзакции, блокировка заказов, изменение статуса
+        with django_assert_num_queries(4):
+            assert Order.objects.filter(id__in=order_ids).transition('confirmed', versions) == order_ids[:-1]
+        assert list(Order.objects.filter(id__in=order_ids).order_by('id').values_list('status', 'version')) == \
+            [('confirmed', 1)] * 4 + [('new', 1)]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_status_changes(order_create):
+    """
+    Тест на одновременное изменение статуса одного заказа несколькими операторами
+    Ожидаемый результат - статус изменен ровно одним оператором, товары при отмене возвращены на склад один раз
+    """
+    order = Order.objects.get(id=order_create[1])
+    product_info = order.ordered_items.get().product_info
+    quantity = product_info.quantity
+
+    def change(status):
+        try:
+            return Order.objects.filter(id=order.id).transition(status)
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(change, ['canceled'] * 4))
+    assert len([result for result in results if result]) == 1
+    order.refresh_from_db()
+    assert (order.status, order.version) == ('canceled', 1)
+    product_info.refresh_from_db()
+    assert product_info.quantity == quantity + 4
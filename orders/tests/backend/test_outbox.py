@@ -0,0 +1,100 @@
+import pytest
+from django.core import mail
+from datetime import timedelta
+from django.db import transaction
+from django.utils import timezone
+from mock import patch
+from backend.models import *
+from backend.outbox import enqueue, relay, process, purge
+from backend.tasks import new_order_task, orders_status_change_task, process_outbox_event_task
+
+
+@pytest.mark.django_db
+class TestOutbox:
+    """
+    Класс для тестирования таблицы исходящих событий
+    """
+
+    def test_relay_and_process(self, order_create):
+        """
+        Тест на передачу исходящего события в celery и его выполнение
+        Ожидаемый результат - письмо об изменении статуса отправлено один раз, событие помечено выполненным
+        """
+        order = Order.objects.select_related('shop').get(id=order_create[1])
+        event = enqueue(orders_status_change_task, user_id=order.shop.seller_id, order_ids=[order.id])
+        assert len(mail.outbox) == 0
+        with patch.object(process_outbox_event_task, 'delay') as delay:
+            assert relay() == 1
+        delay.assert_called_once_with(event.id)
+        assert process(event.id) is True
+        assert len(mail.outbox) == 1
+        event.refresh_from_db()
+        assert event.sent_at is not None and event.processed_at is not None
+        assert process(event.id) is False
+        assert relay() == 0
+        assert len(mail.outbox) == 1
+
+    def test_relay_batches(self, buyer_token, basket_create):
+        """
+        Тест на передачу исходящих событий пакетами
+        Ожидаемый результат - все события переданы и выполнены по одному разу
+        """
+        for _ in range(5):
+            enqueue(new_order_task, user_id=basket_create[3], order_ids=[basket_create[2]])
+        with patch.object(process_outbox_event_task, 'delay') as delay:
+            assert relay(batch_size=2) == 5
+        event_ids = [call.args[0] for call in delay.call_args_list]
+        assert sorted(event_ids) == list(OutboxEvent.objects.values_list('id', flat=True))
+        with patch.object(new_order_task, 'run') as mock_run:
+            assert all(process(event_id) for event_id in event_ids)
+        assert mock_run.call_count == 5
+        assert not OutboxEvent.objects.filter(processed_at=None).exists()
+
+    def test_failed_event_relayed_again(self, basket_create, settings):
+        """
+        Тест на исходящее событие, celery task которого завершился ошибкой
+        Ожидаемый результат - событие не помечено выполненным и после OUTBOX_VISIBILITY_TIMEOUT передается повторно,
+        но не более OUTBOX_MAX_ATTEMPTS раз
+        """
+        settings.OUTBOX_MAX_ATTEMPTS = 2
+        event = enqueue(new_order_task, user_id=basket_create[3], order_ids=[basket_create[2]])
+        with patch.object(process_outbox_event_task, 'delay'):
+            assert relay() == 1
+        with patch.object(new_order_task, 'run', side_effect=RuntimeError), pytest.raises(RuntimeError):
+            process(event.id)
+        event.refresh_from_db()
+        assert event.processed_at is None
+        with patch.object(process_outbox_event_task, 'delay') as delay:
+            assert relay() == 0
+            OutboxEvent.objects.filter(id=event.id).update(sent_at=timezone.now() - timedelta(hours=2))
+            assert relay() == 1
+            delay.assert_called_once_with(event.id)
+            OutboxEvent.objects.filter(id=event.id).update(sent_at=timezone.now() - timedelta(hours=2))
+            assert relay() == 0
+        with patch.object(new_order_task, 'run') as mock_run:
+            assert process(event.id) is True
+        mock_run.assert_called_once()
+        event.refresh_from_db()
+        assert event.attempts == 2 and event.processed_at is not None
+
+    def test_rollback_discards_event(self, basket_create):
+        """
+        Тест на откат транзакции, в которой записано исходящее событие
+        Ожидаемый результат - событие не сохранено
+        """
+        with pytest.raises(RuntimeError):
+            with transaction.atomic():
+                enqueue(new_order_task, user_id=basket_create[3], order_ids=[basket_create[2]])
+                raise RuntimeError
+        assert not OutboxEvent.objects.exists()
+
+    def test_purge(self, basket_create):
+        """
+        Тест на удаление выполненных исходящих событий
+        Ожидаемый результат - удалены только выполненные события старше срока хранения
+        """
+        processed = enqueue(new_order_task, user_id=basket_create[3], order_ids=[basket_create[2]])
+        pending = enqueue(new_order_task, user_id=basket_create[3], order_ids=[basket_create[2]])
+        OutboxEvent.objects.filter(id=processed.id).update(processed_at=timezone.now() - timedelta(days=30))
+        assert purge() == 1
+        assert list(OutboxEvent.objects.values_list('id', flat=True)) == [pending.id]
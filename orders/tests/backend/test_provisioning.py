@@ -0,0 +1,109 @@
+import pytest
+from django.contrib.auth.hashers import check_password
+from django.core import mail
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from mock import patch
+from backend.models import User, Shop, Contact, ConfirmEmailToken
+from backend.provisioning import hash_passwords
+from backend.tasks import new_users_registered_task
+
+HEADER = 'email,password,first_name,last_name,type,language,shop,shop_url,country,region,zip,city,street,house,phone\n'
+ROWS = [
+    'seller1@example.com,!Q@W#E$R%T^T12,Иван,Петров,seller,ru,Магазин 1,https://shop1.example.com,Russia,Moscow,'
+    '101000,Moscow,Lenin,1,+79000000001\n',
+    'seller2@example.com,!Q@W#E$R%T^T12,John,Smith,seller,en,Магазин 2,,,,,,,,\n',
+    'buyer@example.com,!Q@W#E$R%T^T12,Анна,Сидорова,buyer,ru,,,Russia,Tver,170000,Tver,Sovetskaya,,+79000000002\n',
+]
+
+
+@pytest.fixture
+def accounts_file(tmp_path):
+    """
+    Фикстура для создания CSV-файла аккаунтов. Возвращает фабрику файлов из строк rows
+    """
+    def factory(rows):
+        path = tmp_path / 'accounts.csv'
+        path.write_text(HEADER + ''.join(rows), encoding='utf-8')
+        return str(path)
+    return factory
+
+
+@pytest.mark.django_db
+def test_provision_accounts(accounts_file, django_capture_on_commit_callbacks):
+    """
+    Тест на создание аккаунтов командой provision_accounts
+    Ожидаемый результат - пользователи, магазины и контакты созданы одной вставкой на таблицу, пользователи
+    неактивны, токены подтверждения переданы одним celery task
+    """
+    with CaptureQueriesContext(connection) as queries, django_capture_on_commit_callbacks(execute=True), \
+            patch.object(new_users_registered_task, 'delay') as delay:
+        call_command('provision_accounts', accounts_file(ROWS), workers=2)
+    assert len([query for query in queries if query['sql'].startswith('INSERT')]) == 4
+    users = {user.email: user for user in User.objects.all()}
+    assert set(users) == {'seller1@example.com', 'seller2@example.com', 'buyer@example.com'}
+    assert not any(user.is_active for user in users.values())
+    assert check_password('!Q@W#E$R%T^T12', users['seller1@example.com'].password)
+    assert dict(Shop.objects.values_list('name', 'seller__email')) == {'Магазин 1': 'seller1@example.com',
+                                                                       'Магазин 2': 'seller2@example.com'}
+    assert sorted(Contact.objects.values_list('user__email', 'zip')) == [('buyer@example.com', 170000),
+                                                                         ('seller1@example.com', 101000)]
+    (user_ids,), = [call.args for call in delay.call_args_list]
+    assert sorted(user_ids) == sorted(user.id for user in users.values())
+    new_users_registered_task(user_ids)
+    tokens = dict(ConfirmEmailToken.objects.values_list('user__email', 'key'))
+    assert sorted((message.to[0], tokens[message.to[0]] in message.body) for message in mail.outbox) == [
+        ('buyer@example.com', True), ('seller1@example.com', True), ('seller2@example.com', True)]
+
+
+@pytest.mark.django_db
+def test_provision_accounts_errors(accounts_file, user_factory):
+    """
+    Тест на загрузку файла с ошибками
+    Ожидаемый результат - ошибки выведены по строкам файла, аккаунты не созданы
+    """
+    user_factory(email='seller2@example.com')
+    rows = ROWS + ['buyer@example.com,123,Анна,Сидорова,buyer,ru,Магазин 3,,Russia,Tver,индекс,Tver,Lenin,,+7900\n']
+    with pytest.raises(CommandError) as error:
+        call_command('provision_accounts', accounts_file(rows))
+    message = str(error.value)
+    assert 'Строка 3: email: пользователь seller2@example.com уже существует' in message
+    assert 'Строка 5: email: пользователь buyer@example.com повторяется в файле' in message
+    assert 'Строка 5: shop: магазин можно указать только для продавца' in message
+    assert 'Строка 5: zip:' in message and 'Строка 5: password:' in message
+    assert 'Строка 2' not in message
+    assert User.objects.count() == 1
+    assert not Shop.objects.exists()
+
+
+def test_hash_passwords():
+    """
+    Тест на хеширование паролей в нескольких процессах
+    Ожидаемый результат - хеши возвращены в порядке паролей
+    """
+    passwords = [f'password{number}' for number in range(4)]
+    hashes = hash_passwords(passwords, workers=2)
+    assert [check_password(password, hashed) for password, hashed in zip(passwords, hashes)] == [True] * 4
+    assert not check_password(passwords[0], hashes[1])
+
+
+@pytest.mark.django_db
+def test_admin_provision_accounts(admin_client, django_capture_on_commit_callbacks):
+    """
+    Тест на загрузку аккаунтов через админку django
+    Ожидаемый результат - аккаунты созданы, токены подтверждения переданы одним celery task, выполнен переход
+    к списку магазинов
+    """
+    url = '/admin/backend/shop/provision/'
+    assert url in admin_client.get('/admin/backend/shop/').content.decode()
+    assert admin_client.get(url).status_code == 200
+    file = SimpleUploadedFile('accounts.csv', (HEADER + ''.join(ROWS)).encode('utf-8-sig'))
+    with django_capture_on_commit_callbacks(execute=True), patch.object(new_users_registered_task, 'delay') as delay:
+        response = admin_client.post(url, {'file': file})
+    assert response.status_code == 302
+    assert response.url == '/admin/backend/shop/'
+    assert Shop.objects.count() == 2
+    user_ids = User.objects.filter(is_superuser=False).order_by('id').values_list('id', flat=True)
+    delay.assert_called_once_with(list(user_ids))
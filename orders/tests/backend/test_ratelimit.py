@@ -0,0 +1,133 @@
+import smtplib
+import pytest
+from django.core import mail
+from django.core.mail import EmailMultiAlternatives
+from mock import patch
+from backend.mail import MailDispatcher, send_messages, message_from_dict
+from backend.ratelimit import InMemoryTokenBucket, mail_buckets
+from backend.tasks import new_order_task, send_email_task
+
+
+class Clock:
+    """
+    Класс управляемых часов для тестов ограничителя частоты отправки
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def build_messages(*recipients):
+    return [EmailMultiAlternatives('Заказ', 'Статус заказа изменен', 'shop@example.com', [recipient])
+            for recipient in recipients]
+
+
+def test_token_bucket():
+    """
+    Тест на списание и пополнение токенов корзины
+    Ожидаемый результат - после исчерпания емкости возвращается время ожидания, токены пополняются со временем,
+    при нехватке токена в одной корзине токены других корзин не списываются
+    """
+    clock = Clock()
+    limiter = InMemoryTokenBucket(clock)
+    provider, recipient = ('provider', 3, 10), ('recipient', 2, 0.5)
+    assert limiter.acquire([provider, recipient]) == 0
+    assert limiter.acquire([provider, recipient]) == 0
+    assert limiter.acquire([provider, recipient]) == pytest.approx(2)
+    assert limiter.acquire([provider]) == 0
+    assert limiter.acquire([provider]) == pytest.approx(0.1)
+    clock.now += 2
+    assert limiter.acquire([provider, recipient]) == 0
+
+
+def test_mail_buckets(settings):
+    """
+    Тест на корзины токенов письма
+    Ожидаемый результат - корзина провайдера и по одной корзине на каждого получателя
+    """
+    settings.EMAIL_HOST = 'smtp.example.com'
+    message = EmailMultiAlternatives('Заказ', '', 'shop@example.com', ['Buyer@example.com'], cc=['seller@example.com'])
+    assert [key for key, _, _ in mail_buckets(message)] == ['ratelimit:mail:smtp.example.com',
+                                                            'ratelimit:mail:smtp.example.com:buyer@example.com',
+                                                            'ratelimit:mail:smtp.example.com:seller@example.com']
+
+
+def test_rate_limited_messages_deferred(settings):
+    """
+    Тест на отправку писем одному получателю сверх лимита
+    Ожидаемый результат - письма в пределах лимита отправлены, остальные отложены в send_email_task
+    """
+    settings.MAIL_RECIPIENT_RATE_LIMIT = {'capacity': 2, 'per_second': 0.01}
+    messages = build_messages(*['buyer@example.com'] * 3, 'other@example.com')
+    with patch.object(send_email_task, 'apply_async') as deferred:
+        assert send_messages(messages) == 2
+    assert len(mail.outbox) == 2
+    (payload,), = deferred.call_args.args
+    assert [message_from_dict(message).to for message in payload] == [['buyer@example.com'], ['other@example.com']]
+    assert deferred.call_args.kwargs['countdown'] == 100
+
+
+@pytest.mark.django_db
+def test_rate_limited_messages_deferred_in_transaction(settings, django_capture_on_commit_callbacks):
+    """
+    Тест на отправку писем сверх лимита в транзакции
+    Ожидаемый результат - отправка не ждет появления токена, оставшиеся письма отложены в send_email_task после
+    фиксации транзакции
+    """
+    settings.MAIL_RECIPIENT_RATE_LIMIT = {'capacity': 1, 'per_second': 1}
+    messages = build_messages('buyer@example.com', 'buyer@example.com')
+    with patch('backend.mail.time.sleep') as sleep, patch.object(send_email_task, 'apply_async') as deferred:
+        with django_capture_on_commit_callbacks() as callbacks:
+            assert send_messages(messages) == 1
+        assert not deferred.called
+        for callback in callbacks:
+            callback()
+    assert not sleep.called
+    (payload,), = deferred.call_args.args
+    assert [message['to'] for message in payload] == [['buyer@example.com']]
+    assert deferred.call_args.kwargs['countdown'] == 1
+
+
+def test_server_error_defers_rest():
+    """
+    Тест на ошибку почтового сервера после отправки части писем
+    Ожидаемый результат - оставшиеся письма отложены в send_email_task, ошибка на первом письме передается вызывающему
+    """
+    calls = []
+
+    def send(dispatcher, messages):
+        calls.append(messages)
+        if len(calls) >= 2:
+            raise smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+        return 1
+
+    with patch.object(MailDispatcher, 'send', send), patch.object(send_email_task, 'apply_async') as deferred:
+        assert send_messages(build_messages('a@example.com', 'b@example.com', 'c@example.com')) == 1
+        (payload,), = deferred.call_args.args
+        assert [message['to'] for message in payload] == [['b@example.com'], ['c@example.com']]
+        with pytest.raises(smtplib.SMTPServerDisconnected):
+            send_messages(build_messages('d@example.com'))
+
+
+@pytest.mark.django_db
+def test_mail_task_retries(user_factory):
+    """
+    Тест на повтор celery task оповещения при ошибке почтового сервера
+    Ожидаемый результат - после ошибки task повторен, письмо отправлено
+    """
+    user = user_factory()
+    original = MailDispatcher.send
+    failures = [smtplib.SMTPServerDisconnected('Connection unexpectedly closed')]
+
+    def send(dispatcher, messages):
+        if failures:
+            raise failures.pop()
+        return original(dispatcher, messages)
+
+    with patch.object(MailDispatcher, 'send', send):
+        result = new_order_task.apply(args=(user.id,), kwargs={'order_ids': [1]})
+    assert result.successful()
+    assert mail.outbox[0].to == [user.email]
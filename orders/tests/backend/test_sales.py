@@ -0,0 +1,66 @@
+import pytest
+from django.core.management import call_command
+from django.test.client import encode_multipart
+from backend.models import *
+
+
+@pytest.mark.django_db
+class TestSales:
+    """
+    Класс для тестирования сводных таблиц продаж и статистики продаж продавца
+    """
+    order_url = 'http://127.0.0.1:8000/order/customer/'
+    url = 'http://127.0.0.1:8000/analytics/seller'
+    content_type = 'multipart/form-data; boundary=BoUnDaRyStRiNg'
+
+    def test_sales_on_checkout_and_cancel(self, client, buyer_token, basket_create):
+        """
+        Тест на обновление сводных таблиц продаж при оформлении и отмене заказа
+        Ожидаемый результат - продажи добавлены при оформлении и вычтены при отмене заказа
+        """
+        content = encode_multipart('BoUnDaRyStRiNg', {'id': basket_create[2]})
+        client.post(self.order_url, content, content_type=self.content_type)
+        shop_sales = ShopSales.objects.get()
+        assert (shop_sales.orders_count, shop_sales.units, shop_sales.revenue) == (1, 4, 400000)
+        product_sales = ProductSales.objects.get()
+        assert (product_sales.product_info_id, product_sales.units, product_sales.revenue) == (basket_create[0], 4,
+                                                                                               400000)
+        Order.objects.filter(id=basket_create[2]).cancel()
+        shop_sales.refresh_from_db()
+        assert (shop_sales.orders_count, shop_sales.units, shop_sales.revenue) == (0, 0, 0)
+
+    def test_rebuild_sales(self, order_create):
+        """
+        Тест на пересчет сводных таблиц продаж командой rebuild_sales
+        Ожидаемый результат - сводные таблицы совпадают с инкрементально обновленными
+        """
+        call_command('rebuild_sales')
+        rebuilt = list(ShopSales.objects.values('shop_id', 'day', 'orders_count', 'units', 'revenue'))
+        ShopSales.objects.all().delete()
+        ProductSales.objects.all().delete()
+        Order.objects.filter(id=order_create[1]).update_sales()
+        assert list(ShopSales.objects.values('shop_id', 'day', 'orders_count', 'units', 'revenue')) == rebuilt
+        assert rebuilt[0]['revenue'] == 400000
+
+    def test_seller_analytics(self, client, order_create, django_assert_max_num_queries):
+        """
+        Тест на получение продавцом статистики продаж
+        Ожидаемый результат - продажи по дням и список товаров, прочитанные только из сводных таблиц
+        """
+        call_command('rebuild_sales')
+        with django_assert_max_num_queries(5):
+            response = client.get(self.url, {'top': 5})
+        assert response.status_code == 200
+        assert response.json()['Продажи по дням'][0]['revenue'] == 400000
+        product = response.json()['Топ товаров'][0]
+        assert (product['units'], product['revenue']) == (4, 400000)
+        assert client.get(self.url, {'date_from': 'вчера'}).status_code == 400
+        assert [client.get(self.url, {'top': top}).status_code for top in (-1, 0)] == [400, 400]
+
+    def test_seller_analytics_for_buyer(self, client, buyer_token):
+        """
+        Тест на получение статистики продаж покупателем
+        Ожидаемый результат - ошибка
+        """
+        response = client.get(self.url)
+        assert response.status_code == 403
@@ -0,0 +1,91 @@
+import time
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from django.db import connection
+from django.test.client import encode_multipart
+from model_bakery import baker
+from backend.basket import DatabaseBasketStore
+from backend.models import *
+
+
+@pytest.mark.django_db
+class TestStockReservation:
+    """
+    Класс для тестирования резервирования товаров при оформлении заказа
+    """
+    url = 'http://127.0.0.1:8000/order/customer/'
+    content_type = 'multipart/form-data; boundary=BoUnDaRyStRiNg'
+
+    def checkout(self, client, order_id):
+        content = encode_multipart('BoUnDaRyStRiNg', {'id': order_id})
+        return client.post(self.url, content, content_type=self.content_type)
+
+    def test_checkout_reserves_stock(self, client, buyer_token, basket_create):
+        """
+        Тест на списание товара со склада при оформлении заказа
+        Ожидаемый результат - количество товара уменьшено на количество в заказе
+        """
+        response = self.checkout(client, basket_create[2])
+        assert response.status_code == 201
+        assert ShopProduct.objects.get(id=basket_create[0]).quantity == 96
+
+    def test_checkout_out_of_stock(self, client, buyer_token, basket_create):
+        """
+        Тест на оформление заказа при нехватке товара на складе
+        Ожидаемый результат - ошибка, заказ остается в корзине
+        """
+        ShopProduct.objects.filter(id=basket_create[0]).update(quantity=3)
+        response = self.checkout(client, basket_create[2])
+        assert response.status_code == 409
+        assert response.json()['Товары'] == [basket_create[0]]
+        assert Order.objects.get(id=basket_create[2]).status == 'basket'
+        assert ShopProduct.objects.get(id=basket_create[0]).quantity == 3
+
+    def test_cancel_releases_stock(self, client, buyer_token, basket_create):
+        """
+        Тест на возврат товара на склад при отмене заказа
+        Ожидаемый результат - товар возвращен на склад один раз при повторной отмене
+        """
+        self.checkout(client, basket_create[2])
+        assert Order.objects.filter(id=basket_create[2]).cancel() == 1
+        assert Order.objects.filter(id=basket_create[2]).cancel() == 0
+        assert ShopProduct.objects.get(id=basket_create[0]).quantity == 100
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_checkout_no_overselling(record_property):
+    """
+    Нагрузочный тест на параллельное оформление заказов с одними и теми же товарами. Товаров на складе хватает только
+    на часть корзин. Пропускная способность оформления заказов при конкуренции за строки товаров записывается в
+    отчет теста (свойство checkouts_per_second, см. --junitxml)
+    Ожидаемый результат - продано ровно столько товара, сколько было на складе
+    """
+    stock, baskets, workers = 20, 60, 16
+    shop = baker.make(Shop, seller=baker.make(User, type='seller'))
+    products = [baker.make(ShopProduct, shop=shop, product=baker.make(Product), price=100, quantity=stock)
+                for _ in range(2)]
+    basket_ids = []
+    for number in range(baskets):
+        buyer = baker.make(User, type='buyer')
+        basket = Order.objects.create(user=buyer, status='basket')
+        # товары добавляются в корзины в разном порядке
+        for product in (products if number % 2 else products[::-1]):
+            OrderItem.objects.create(order=basket, product_info=product, quantity=1)
+        basket_ids.append((buyer.id, basket.id))
+
+    def checkout(args):
+        try:
+            return DatabaseBasketStore().checkout(*args) is not None
+        except OutOfStock:
+            return False
+        finally:
+            connection.close()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(checkout, basket_ids))
+    record_property('checkouts_per_second', round(baskets / (time.perf_counter() - started), 1))
+
+    assert sum(results) == stock
+    assert Order.objects.filter(status='new').count() == stock
+    assert list(ShopProduct.objects.values_list('quantity', flat=True)) == [0, 0]
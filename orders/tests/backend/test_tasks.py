@@ -0,0 +1,58 @@
+import json
+import pytest
+from django.core import mail
+from backend.models import *
+from backend.tasks import new_user_registered_task, new_order_task, new_order_for_seller_task, \
+    order_status_change_task, orders_status_change_task
+
+
+@pytest.mark.django_db
+class TestNotificationTasks:
+    """
+    Класс для проверки аргументов и количества запросов celery task оповещений
+    """
+
+    @pytest.fixture
+    def order(self, order_create):
+        """
+        Фикстура возвращающая оформленный заказ с контактом покупателя
+        """
+        Order.objects.filter(id=order_create[1]).update(contact=Contact.objects.get(user__type='buyer'))
+        return Order.objects.select_related('shop__seller', 'user', 'contact').get(id=order_create[1])
+
+    def test_new_order_for_seller_task(self, order, django_assert_num_queries):
+        """
+        Тест на оповещение продавца о новом заказе по id заказа
+        Ожидаемый результат - один запрос, письмо продавцу с позициями заказа и контактом покупателя
+        """
+        kwargs = {'user_id': order.shop.seller_id, 'order_id': order.id}
+        assert json.loads(json.dumps(kwargs)) == kwargs
+        with django_assert_num_queries(1):
+            new_order_for_seller_task(**kwargs)
+        assert mail.outbox[0].to == [order.shop.seller.email]
+        item = order.ordered_items.get()
+        assert f'{item.product_name} - {item.quantity} шт.' in mail.outbox[0].body
+        assert order.contact.phone in mail.outbox[0].body
+
+    def test_status_change_tasks(self, order, django_assert_num_queries):
+        """
+        Тест на оповещение об изменении статуса заказов
+        Ожидаемый результат - один запрос на task, письмо продавцу и покупателю
+        """
+        with django_assert_num_queries(1):
+            order_status_change_task(order.shop.seller_id, order.id)
+        with django_assert_num_queries(1):
+            orders_status_change_task(order.shop.seller_id, [order.id])
+        assert [message.to for message in mail.outbox] == [[order.shop.seller.email, order.user.email]] * 2
+
+    def test_buyer_tasks(self, order, django_assert_num_queries):
+        """
+        Тест на оповещения покупателя о новом заказе и токене подтверждения почты
+        Ожидаемый результат - один запрос на task
+        """
+        ConfirmEmailToken.objects.create(user=order.user)
+        with django_assert_num_queries(1):
+            new_order_task(order.user_id, order_ids=[order.id])
+        with django_assert_num_queries(1):
+            new_user_registered_task(order.user_id)
+        assert [message.to for message in mail.outbox] == [[order.user.email]] * 2
@@ -0,0 +1,49 @@
+import pytest
+from mock import patch
+from backend.throttling import InMemorySlidingWindow, SlidingWindowAnonRateThrottle
+
+
+class Clock:
+    """
+    Класс управляемых часов для тестов счетчиков скользящего окна
+    """
+
+    def __init__(self):
+        self.now = 6000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_sliding_window():
+    """
+    Тест на учет запросов в скользящем окне
+    Ожидаемый результат - после исчерпания лимита возвращается время ожидания, запросы предыдущего окна учитываются
+    пропорционально его доле в скользящем окне, после двух окон без запросов лимит восстанавливается полностью
+    """
+    clock = Clock()
+    window = InMemorySlidingWindow(clock)
+    assert [window.hit('throttle_user_1', 4, 60) for _ in range(4)] == [0, 0, 0, 0]
+    assert window.hit('throttle_user_1', 4, 60) == pytest.approx(60)
+    assert window.hit('throttle_user_2', 4, 60) == 0
+    clock.now += 90
+    assert [window.hit('throttle_user_1', 4, 60) for _ in range(2)] == [0, 0]
+    assert window.hit('throttle_user_1', 4, 60) == pytest.approx(15)
+    clock.now += 15
+    assert window.hit('throttle_user_1', 4, 60) == 0
+    clock.now += 120
+    assert [window.hit('throttle_user_1', 4, 60) for _ in range(4)] == [0, 0, 0, 0]
+
+
+@pytest.mark.django_db
+def test_anon_throttle(client):
+    """
+    Тест на ограничение частоты запросов анонимного пользователя
+    Ожидаемый результат - после исчерпания лимита запросы отклоняются с кодом 429 и заголовком Retry-After
+    """
+    url = 'http://127.0.0.1:8000/categories/'
+    with patch.object(SlidingWindowAnonRateThrottle, 'THROTTLE_RATES', {'anon': '3/minute'}):
+        assert [client.get(url).status_code for _ in range(3)] == [200, 200, 200]
+        response = client.get(url)
+        assert response.status_code == 429
+        assert 0 < int(response['Retry-After']) <= 60
@@ -3,6 +3,7 @@ from model_bakery import baker
 from backend.models import *
 from rest_framework.test import APIClient
 from rest_framework.authtoken.models import Token
+from backend.redis_store import get_redis
 
 
 @pytest.fixture
@@ -13,6 +14,25 @@ def client():
     return APIClient()
 
 
+@pytest.fixture(autouse=True)
+def in_memory_redis(settings):
+    """
+    Фикстура для замены Redis хранилищем в памяти процесса. Перед каждым тестом хранилище очищается
+    """
+    settings.REDIS_URL = 'memory://'
+    redis = get_redis()
+    redis.flushdb()
+    return redis
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    """
+    Фикстура для сохранения загруженных в тестах файлов во временный каталог вместо каталога uploaded_data проекта
+    """
+    settings.MEDIA_ROOT = str(tmp_path)
+
+
 @pytest.fixture
 def user_factory():
     """
@@ -181,9 +201,9 @@ def shops_create(products_create, user_factory, shop_factory, shop_product_facto
     for s in seller:
         shop = shop_factory(seller=s)
         if len(products_create) > 5:
-            shop_product = shop_product_factory(product=products_create.pop(0), shop=shop, price=100000)
+            shop_product = shop_product_factory(product=products_create.pop(0), shop=shop, price=100000, quantity=100)
         else:
-            shop_product = shop_product_factory(product=products_create.pop(0), shop=shop, price=100000)
+            shop_product = shop_product_factory(product=products_create.pop(0), shop=shop, price=100000, quantity=100)
     return shop_product.id
 
 
@@ -206,11 +226,13 @@ def order_create(basket_create, user_info, client):
     Фикстура для создания заказа
     Возвращает список аргументов - API client с токеном авторизации продавца, id заказа, токен авторизации покупателя
     """
-    seller = User.objects.filter(type='seller').first()
+    shop = ShopProduct.objects.get(id=basket_create[0]).shop
+    seller = shop.seller
     seller.set_password(user_info['password'])
     seller.save()
     token = Token.objects.create(user=seller)
     buyer = User.objects.filter(type='buyer').first()
-    order = Order.objects.filter(user=buyer).update(status='new')
+    order = Order.objects.filter(user=buyer).update(status='new', shop=shop)
+    Order.objects.filter(user=buyer).snapshot_prices()
     buyer_token = Token.objects.filter(user=buyer).first()
     return client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}'), basket_create[2], buyer_token.key